@@ -1,82 +1,453 @@
+import asyncio
 import json
-from fastapi import APIRouter, Depends, HTTPException, Request
+import time
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.podcast import PodcastListResponse, PodcastDetailResponse
 from app.db.database import get_db
-from app.services.podcast_service import get_podcast_detail
-from fastapi.responses import StreamingResponse
-from app.schemas.podcast import ScriptGenerateRequest
-from app.services.podcast_service import generate_script_stream
+from app.services.podcast_service import get_podcast_detail_cached
+from app.services.search import search_podcasts
+from app.schemas.podcast import PodcastSearchResponse
+from fastapi.responses import Response, StreamingResponse
+from app.schemas.podcast import ScriptGenerateRequest, ScriptBatchGenerateRequest
+from app.services.podcast_service import generate_script_batch, open_script_session, resume_script_session
+from app.services.podcast_service import reuse_threshold_for
+from app.services.singleflight import EventsEvicted
 from app.schemas.podcast import PodcastGeneratedListResponse
 from app.services.podcast_service import list_generated_podcasts
+from app.schemas.podcast import PodcastGenerateResponse, PodcastJobStatusResponse
+from app.tasks.jobs import job_manager, QueueFullError
+from app.llm_providers.limiter import check_admission, RateLimitExceeded
+from app.core import metrics
+from app.core.config import settings
 
 router = APIRouter()
 
+sse_ttfb_seconds = metrics.histogram(
+    "podcast_sse_ttfb_seconds",
+    "SSE请求从进入处理函数到发出首个事件的时间",
+    ["endpoint"]
+)
+sse_first_text_seconds = metrics.histogram(
+    "podcast_sse_first_text_seconds",
+    "SSE请求从进入处理函数到发出首段脚本文本的时间",
+    ["endpoint"]
+)
+sse_duration_seconds = metrics.histogram(
+    "podcast_sse_duration_seconds",
+    "SSE流的总时长",
+    ["endpoint"]
+)
+sse_disconnects_total = metrics.counter(
+    "podcast_sse_disconnects_total",
+    "流式响应结束前客户端断开的次数",
+    ["endpoint"]
+)
+sse_bytes_sent = metrics.histogram(
+    "podcast_sse_bytes_sent",
+    "每个SSE流发送的字节数",
+    ["endpoint"],
+    buckets=metrics.BYTES_BUCKETS
+)
 
 
+def format_sse(event: dict) -> str:
+    """
+    将生成事件格式化为SSE消息。
+    文本片段使用默认的message事件以兼容只读取 ``text`` 字段的客户端，
+    其余事件（stage/saved/error等）带上 ``event:`` 类型行；带编号 ``id`` 的事件输出 ``id:`` 行，
+    客户端重连时以 ``Last-Event-ID`` 请求头带回。
+    """
+    payload = dict(event)
+    event_type = payload.pop("event", "text")
+    event_id = payload.pop("id", None)
+    json_data = json.dumps(payload, ensure_ascii=False)
+    message = f"data: {json_data}\n\n"
+    if event_type != "text":
+        message = f"event: {event_type}\n" + message
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+
+def trace_id_for(request: Optional[Request]) -> Optional[str]:
+    """请求的追踪ID：优先使用客户端的X-Trace-Id请求头，否则按配置生成"""
+    trace_id = request.headers.get("x-trace-id") if request is not None else None
+    if trace_id:
+        return trace_id[:64]
+    return uuid.uuid4().hex if settings.trace_ids else None
+
+
+def deadline_for(req: ScriptGenerateRequest, request: Optional[Request]) -> Optional[float]:
+    """请求的整体截止时间（秒）：优先使用请求体的deadlineSeconds，其次是X-Deadline-Seconds请求头"""
+    if req.deadlineSeconds is not None or request is None:
+        return req.deadlineSeconds
+    header = request.headers.get("x-deadline-seconds")
+    if not header:
+        return None
+    try:
+        seconds = float(header)
+    except ValueError:
+        seconds = 0.0
+    if not seconds > 0:
+        raise HTTPException(status_code=400, detail="X-Deadline-Seconds须为正数")
+    return seconds
+
+
+async def instrumented_sse(
+    events: AsyncIterator[Dict[str, Any]],
+    endpoint: str,
+    started: float,
+    trace_id: Optional[str] = None,
+    session_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    将事件格式化为SSE消息，并记录TTFB、首段文本时间、总时长与发送字节数。
+    有追踪ID时先发出trace事件，并附加到error事件上便于排查；
+    有会话ID时发出session事件（不带编号），供断线后续传。
+    """
+    sent = 0
+    first_event = first_text = True
+    try:
+        prelude = []
+        if trace_id:
+            prelude.append({"event": "trace", "trace_id": trace_id})
+        if session_id:
+            prelude.append({"event": "session", "session_id": session_id})
+        for event in prelude:
+            message = format_sse(event)
+            sent += len(message.encode())
+            yield message
+        async for event in events:
+            if trace_id and event.get("event") == "error":
+                event = {**event, "trace_id": trace_id}
+            message = format_sse(event)
+            if first_event:
+                first_event = False
+                sse_ttfb_seconds.observe(time.monotonic() - started, endpoint=endpoint)
+            if first_text and event.get("event") == "text":
+                first_text = False
+                sse_first_text_seconds.observe(time.monotonic() - started, endpoint=endpoint)
+            sent += len(message.encode())
+            yield message
+    finally:
+        sse_duration_seconds.observe(time.monotonic() - started, endpoint=endpoint)
+        sse_bytes_sent.observe(sent, endpoint=endpoint)
+
+
+async def until_disconnected(
+    events: AsyncGenerator[Dict[str, Any], None],
+    request: Optional[Request],
+    endpoint: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    读取事件直到流结束或客户端断开。
+
+    等待下一个事件期间每隔 ``SSE_DISCONNECT_POLL_INTERVAL`` 秒检查一次连接（生成的各阶段之间
+    可能长时间没有事件，不能依赖写入失败来发现断开）；断开时取消正在等待的读取并关闭事件流，
+    取消沿事件流传递到生成流程。
+    """
+    if request is None or settings.sse_disconnect_poll_interval <= 0:
+        async for event in events:
+            yield event
+        return
+
+    async def watch() -> None:
+        while not await request.is_disconnected():
+            await asyncio.sleep(settings.sse_disconnect_poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait({pending, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                sse_disconnects_total.inc(endpoint=endpoint)
+                return
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield event
+    except (asyncio.CancelledError, GeneratorExit):
+        # 服务器在写入失败或收到断开消息时取消了响应
+        sse_disconnects_total.inc(endpoint=endpoint)
+        raise
+    finally:
+        watcher.cancel()
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
+
+
+def format_ndjson(event: dict) -> str:
+    """将事件格式化为一行JSON"""
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+async def ndjson_stream(events: AsyncIterator[Dict[str, Any]], trace_id: Optional[str] = None) -> AsyncIterator[str]:
+    """逐行输出事件；有追踪ID时先输出trace行，并附加到error与失败的done行上"""
+    if trace_id:
+        yield format_ndjson({"event": "trace", "trace_id": trace_id})
+    async for event in events:
+        if trace_id and (event.get("event") == "error" or event.get("status") == "failed"):
+            event = {**event, "trace_id": trace_id}
+        yield format_ndjson(event)
+
 
 @router.post("/generate_script")
 async def generate_script(
     req: ScriptGenerateRequest,
-    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     """
     使用SSE流式返回生成的播客脚本，并将生成的内容保存到数据库
+    （经批量写入队列保存，生成期间不占用数据库连接）
+
+    事件带从1开始的编号（``id:`` 行），会话ID在 ``X-Session-Id`` 响应头与首个session事件中返回。
+    连接中断后生成继续运行 ``SSE_RESUME_GRACE_SECONDS`` 秒，客户端可用 ``GET /generate_script/{session_id}`` 续传；
+    期间无人重连则取消生成流程并丢弃未完成的脚本（``SSE_DISCONNECT_MODE=finish`` 时在后台生成完毕并保存）。
+
+    可通过 ``deadlineSeconds`` 字段或 ``X-Deadline-Seconds`` 请求头指定整体截止时间，
+    超时或LLM服务熔断时以带 ``reason`` 的error事件结束。
+    ``reuseSimilar=true`` 时内容与已保存的记录近似重复则复用其脚本，流中先返回reuse事件。
     """
+    started = time.monotonic()
+    # LLM调用排队已满时直接拒绝，而不是建立SSE连接后再排队失败
+    try:
+        check_admission()
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
 
-    
-    async def event_generator():
-        async for text_chunk in generate_script_stream(
-            req.content, 
-            req.contentType, 
-            req.voices,
-            db=db,
-            language=req.language
-        ):
-            # 格式化为SSE事件
-            json_data = json.dumps({"text": text_chunk}, ensure_ascii=False)
-            yield f"data: {json_data}\n\n"
+    trace_id = trace_id_for(request)
+    session_id, events = open_script_session(
+        req.content, 
+        req.contentType, 
+        req.voices,
+        persist=True,
+        language=req.language,
+        use_cache=not req.bypassCache,
+        deadline=deadline_for(req, request),
+        reuse_threshold=reuse_threshold_for(req)
+    )
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Methods": "POST",
+        "Access-Control-Allow-Headers": "Content-Type, X-Deadline-Seconds",
+        "X-Session-Id": session_id
+    }
+    if trace_id:
+        headers["X-Trace-Id"] = trace_id
     
     return StreamingResponse(
-        event_generator(),
+        instrumented_sse(
+            until_disconnected(events, request, "generate_script"), "generate_script", started, trace_id, session_id
+        ),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "POST",
-            "Access-Control-Allow-Headers": "Content-Type"
-        }
+        headers=headers
     )
 
 
+@router.get("/generate_script/{session_id}")
+async def resume_script(
+    session_id: str,
+    last_event_id: Optional[int] = Query(None, ge=0, description="最后收到的事件编号，默认取Last-Event-ID请求头"),
+    request: Request = None
+):
+    """
+    续传 ``/generate_script`` 的SSE流：回放编号大于 ``Last-Event-ID`` 的事件，
+    生成仍在运行时继续跟随，不会再次调用LLM。两者都未提供时从头回放。
+
+    会话不存在或已过期返回404，要续传的事件已移出回放缓冲返回410（需重新发起生成）。
+    """
+    started = time.monotonic()
+    if last_event_id is None:
+        header = request.headers.get("last-event-id") if request is not None else None
+        try:
+            last_event_id = int(header) if header else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail="无效的Last-Event-ID")
+    try:
+        events = await resume_script_session(session_id, last_event_id)
+    except EventsEvicted as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if events is None:
+        raise HTTPException(status_code=404, detail="会话不存在或已过期")
+
+    trace_id = trace_id_for(request)
+    headers = {"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Session-Id": session_id}
+    if trace_id:
+        headers["X-Trace-Id"] = trace_id
+    return StreamingResponse(
+        instrumented_sse(until_disconnected(events, request, "resume_script"), "resume_script", started, trace_id),
+        media_type="text/event-stream",
+        headers=headers
+    )
+
+
+
+
+@router.post("/generate_batch")
+async def generate_batch(
+    req: ScriptBatchGenerateRequest,
+    request: Request = None
+):
+    """
+    批量生成播客脚本，以NDJSON流式返回各条目的事件。
+
+    每行一个JSON对象，``index`` 为条目在 ``items`` 中的下标，其余字段与 ``/generate_script``
+    的SSE事件相同（``event`` 为事件类型，文本片段为 ``text``）；各条目的事件交错输出，
+    条目结束时输出 ``done`` 行，最后输出 ``batch`` 汇总行。
+    """
+    if len(req.items) > settings.batch_max_items:
+        raise HTTPException(status_code=400, detail=f"每批最多{settings.batch_max_items}条")
+    try:
+        check_admission()
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+
+    concurrency = min(req.concurrency or settings.batch_concurrency, settings.batch_max_concurrency)
+    trace_id = trace_id_for(request)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if trace_id:
+        headers["X-Trace-Id"] = trace_id
+    return StreamingResponse(
+        ndjson_stream(
+            until_disconnected(generate_script_batch(req.items, concurrency), request, "generate_batch"), trace_id
+        ),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
 
 
 @router.get("/list", response_model=PodcastGeneratedListResponse)
 async def get_podcast_list(
+    limit: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    fields: Literal["full", "summary"] = Query("full", description="summary模式不返回content/transcript"),
+    excerpt_length: int = Query(0, ge=0, le=500, description="返回脚本开头的字符数，0表示不返回"),
     db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
-    return await list_generated_podcasts(db)
+    try:
+        return await list_generated_podcasts(
+            db, limit=limit, cursor=cursor, fields=fields, excerpt_length=excerpt_length
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+
+
 
+@router.get("/search", response_model=PodcastSearchResponse)
+async def search_podcast_api(
+    q: str = Query(..., min_length=1, max_length=100, description="搜索关键词"),
+    limit: int = Query(20, ge=1, le=50, description="每页条数"),
+    offset: int = Query(0, ge=0, le=1000, description="结果偏移量，取上一页返回的next_offset"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    按标题、内容与脚本全文搜索播客，按相关度排序，返回带高亮的脚本片段
+    """
+    try:
+        return await search_podcasts(db, q, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match是否包含当前ETag（忽略弱校验前缀W/）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
 
 
 @router.get("/detail", response_model=PodcastDetailResponse)
 async def get_podcast_detail_api(
     podcast_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
-    detail = await get_podcast_detail(db, podcast_id)
-    if not detail:
+    """
+    播客详情，命中进程内缓存时直接返回预先序列化的JSON；
+    支持ETag条件请求，内容未变化时返回304
+    """
+    cached = await get_podcast_detail_cached(db, podcast_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="播客不存在")
-    return detail
-
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"private, max-age={settings.detail_cache_max_age}"
+    }
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 
+@router.post("/generate_job", response_model=PodcastGenerateResponse)
+async def submit_generate_job(req: ScriptGenerateRequest):
+    """
+    提交异步生成任务，立即返回任务ID
+    """
+    try:
+        task_id = await job_manager.submit(req)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return PodcastGenerateResponse(task_id=task_id, status="queued", message="任务已提交")
 
 
+@router.get("/job_status", response_model=PodcastJobStatusResponse)
+async def get_job_status(task_id: int):
+    job = await job_manager.get(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return PodcastJobStatusResponse(
+        task_id=job.id,
+        status=job.status,
+        podcast_id=job.podcast_id,
+        error=job.error,
+        created_at=job.created_at.strftime("%Y-%m-%d %H:%M:%S") if job.created_at else None,
+        finished_at=job.finished_at.strftime("%Y-%m-%d %H:%M:%S") if job.finished_at else None
+    )
 
 
+@router.get("/job_stream")
+async def stream_job(task_id: int, request: Request = None):
+    """
+    使用SSE回放并跟随任务进度，任务已结束时直接返回结果
+    """
+    started = time.monotonic()
+    job = await job_manager.get(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    trace_id = trace_id_for(request)
+    headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    if trace_id:
+        headers["X-Trace-Id"] = trace_id
+    
+    return StreamingResponse(
+        instrumented_sse(
+            until_disconnected(job_manager.stream(task_id), request, "job_stream"), "job_stream", started, trace_id
+        ),
+        media_type="text/event-stream",
+        headers=headers
+    )
@@ -0,0 +1,189 @@
+from typing import Any, Dict, List
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """全局配置，均可通过同名（大写）环境变量覆盖"""
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # LLM HTTP连接池
+    llm_http2: bool = True
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_connect_timeout: float = 10.0
+    llm_read_timeout: float = 120.0
+    # 启动时预先建立到LLM服务商的连接
+    llm_warmup: bool = True
+
+    # LLM调用限流（每个endpoint+模型独立计数）
+    llm_max_concurrency: int = 16
+    llm_rpm: float = 600
+    llm_tpm: float = 1_000_000
+    llm_max_queue: int = 200
+    llm_max_queue_wait: float = 30.0
+    # 按模型名覆盖上述默认值，JSON格式，如 {"qwen-plus": {"rpm": 1200, "max_concurrency": 32}}
+    llm_rate_limits: Dict[str, Dict[str, float]] = {}
+
+    # 模型分档：档位名 -> {"model": ..., 可选"base_url"、"api_key"、"temperature"、"max_tokens"}，
+    # 未指定base_url时使用llm_base_url，未指定api_key时使用OPENAI_API_KEY环境变量
+    llm_base_url: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+    llm_tiers: Dict[str, Dict[str, Any]] = {"small": {"model": "qwen-turbo"}, "large": {"model": "qwen-plus"}}
+    # 各阶段使用的档位：内容分析与语言检查（翻译）用小模型，详细内容与脚本用大模型
+    llm_stage_tiers: Dict[str, str] = {
+        "analyzer": "small", "content_generator": "large", "script_generator": "large", "translator": "small"
+    }
+    # 各阶段输出的token上限（max_tokens），未列出或为0的阶段不限制
+    llm_stage_max_tokens: Dict[str, int] = {
+        "analyzer": 16, "content_generator": 2048, "script_generator": 4096, "translator": 4096
+    }
+    # 按输入长度选择档位：阶段的输入（不含系统提示词）不超过max_input_tokens时改用tier，如
+    # {"script_generator": {"max_input_tokens": 500, "tier": "small"}}；只作用于使用上述配置档位的阶段
+    llm_short_input_tiers: Dict[str, Dict[str, Any]] = {}
+
+    # 按阶段配置多个OpenAI兼容endpoint，JSON格式，如
+    # {"analyzer": [{"base_url": "https://a/v1", "model": "qwen-turbo", "weight": 2, "api_key": "..."}]}
+    # 未配置的阶段使用LLMConfig对应的单个endpoint
+    llm_endpoints: Dict[str, List[Dict[str, Any]]] = {}
+    # 启用对冲请求的阶段，只适合输出不直接流式返回给客户端的短阶段
+    llm_hedge_roles: List[str] = ["analyzer"]
+    # 样本不足以计算p90时的对冲等待时间（秒）
+    llm_hedge_default_delay: float = 2.0
+    # 延迟与错误率EWMA的平滑系数
+    llm_ewma_alpha: float = 0.2
+
+    # 超时、重试与熔断（见 app/llm_providers/resilience.py）。
+    # 各阶段单次LLM调用的超时上限（秒），未列出的阶段使用llm_read_timeout
+    llm_stage_timeouts: Dict[str, float] = {
+        "analyzer": 15, "content_generator": 60, "script_generator": 90, "translator": 90
+    }
+    # 请求带整体截止时间时，剩余时间在本阶段与之后各阶段之间分配的权重（未列出的为1）
+    llm_stage_budget_shares: Dict[str, float] = {
+        "analyzer": 1, "content_generator": 3, "script_generator": 4, "translator": 3
+    }
+    # 可重试错误的重试次数、退避基数与上限（秒）；退避后本阶段剩余时间不足llm_retry_min_seconds时不再重试
+    llm_max_retries: int = 2
+    llm_retry_backoff_base: float = 0.5
+    llm_retry_backoff_max: float = 8.0
+    llm_retry_min_seconds: float = 2.0
+    # 熔断：统计的最近调用数、开始判断所需的最少调用数、打开熔断的错误率、打开持续的秒数
+    llm_breaker_window: int = 20
+    llm_breaker_min_calls: int = 10
+    llm_breaker_error_rate: float = 0.5
+    llm_breaker_open_seconds: float = 30.0
+    # 阶段的endpoint全部熔断时改用的备用endpoint，格式同llm_endpoints；未配置的阶段直接失败
+    llm_fallback_endpoints: Dict[str, List[Dict[str, Any]]] = {}
+    # 请求整体截止时间（秒）：未指定时的默认值（0表示不限）与客户端可指定的上限
+    request_deadline_default: float = 0
+    request_deadline_max: float = 600
+
+    # 本地语言识别置信度达到该值且与目标语言一致时跳过翻译LLM
+    language_skip_confidence: float = 0.75
+    # 脚本流式生成达到该字数时先用本地识别预判：已是目标语言时逐token转发脚本，否则缓存到确认是否翻译
+    language_probe_chars: int = 200
+
+    # 投机执行：分析内容的同时生成详细内容。off关闭、on总是、auto按内容长度与形态判断
+    speculation_mode: str = "auto"
+    speculation_max_chars: int = 200
+
+    # 翻译模式：single整篇翻译（逐token流式）、parallel分段并行翻译、auto按脚本长度选择
+    translation_mode: str = "auto"
+    translation_parallel_min_chars: int = 600
+    # 分段的目标长度（字符）与并发翻译的段数上限
+    translation_chunk_chars: int = 200
+    translation_concurrency: int = 4
+
+    # 长输入：超过阈值（token）时分块提炼要点再合并，每块的token数、并发数与浓缩后的目标token数；
+    # 计算token数使用的tiktoken编码（留空或编码文件不可用时按字数估算）
+    long_input_threshold_tokens: int = 6000
+    long_input_chunk_tokens: int = 3000
+    long_input_concurrency: int = 4
+    long_input_summary_tokens: int = 4000
+    tokenizer_encoding: str = "cl100k_base"
+
+    # 各阶段输入（不含系统提示词）的token上限，超出时内容分析阶段抽样、其他阶段截断；
+    # 脚本超出翻译上限时改为分段翻译
+    analyzer_input_tokens: int = 1500
+    content_generator_input_tokens: int = 8000
+    script_generator_input_tokens: int = 8000
+    translator_input_tokens: int = 8000
+
+    # 生成结果缓存：内存LRU条目数、有效期（秒）、是否写入数据库持久层，
+    # 以及写入持久层时删除过期记录的最短间隔（秒）
+    generation_cache_size: int = 1024
+    generation_cache_ttl: float = 7 * 24 * 3600
+    generation_cache_persist: bool = True
+    generation_cache_purge_interval: float = 3600
+
+    # 异步任务：并发执行的worker数、排队任务上限，
+    # 以及任务心跳的刷新间隔与过期时间（秒），心跳过期的任务由其他进程认领后重新执行
+    job_workers: int = 4
+    job_queue_size: int = 100
+    job_heartbeat_interval: float = 10
+    job_stale_seconds: float = 60
+
+    # 批量生成：每批条目数上限、默认并发数与客户端可指定的并发上限
+    batch_max_items: int = 500
+    batch_concurrency: int = 4
+    batch_max_concurrency: int = 16
+
+    # 数据库连接池（仅对队列连接池生效，如MySQL）：常驻连接数、可额外创建的连接数、
+    # 获取连接的超时（秒）、连接回收周期（秒，应小于MySQL的wait_timeout），以及是否打印SQL
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 3600
+    db_echo: bool = False
+
+    # 生成结果的批量写入：攒够batch_size条或距第一条等待flush_interval秒后一次写入
+    podcast_write_batch_size: int = 50
+    podcast_write_flush_interval: float = 0.05
+
+    # 播客详情缓存：序列化后响应体的总字节数上限；客户端缓存有效期（秒），过期后用ETag重新验证
+    detail_cache_max_bytes: int = 64 * 1024 * 1024
+    detail_cache_max_age: int = 300
+
+    # 脚本压缩存储：zlib，或安装了zstandard时可选zstd；压缩级别
+    transcript_codec: str = "zlib"
+    transcript_compression_level: int = 9
+
+    # 搜索后端：mysql使用podcast_search_text表上的FULLTEXT ngram索引（含脚本明文），
+    # memory使用进程内字符二元组倒排索引（只适合单进程部署），auto在MySQL上为mysql、其他数据库为memory；
+    # 摘要片段的字符数
+    search_backend: str = "auto"
+    search_snippet_chars: int = 120
+    # mysql后端在podcast_search_text中保存的脚本开头字数（明文不压缩，0表示只检索标题与内容摘要）
+    search_transcript_chars: int = 500
+
+    # 近似重复检测：对已保存记录的内容摘要（可选同时对脚本）建立MinHash LSH索引；
+    # 签名长度与LSH段数（每段长度为二者之商，段越多召回越高、候选越多）
+    near_duplicate_index: bool = True
+    near_duplicate_fields: List[str] = ["content"]
+    near_duplicate_num_perm: int = 64
+    near_duplicate_bands: int = 16
+    # 请求开启reuseSimilar时复用已有脚本的最低相似度（估计的Jaccard相似度），客户端可在请求中指定
+    near_duplicate_threshold: float = 0.7
+    # 查询时需要计算签名的文本超过该字数（如对脚本建立索引时的完整内容）时，在线程池中计算签名
+    near_duplicate_offload_chars: int = 4000
+
+    # 为每个SSE请求分配追踪ID（客户端也可通过X-Trace-Id请求头指定），
+    # 在响应头与流的首个trace事件中返回
+    trace_ids: bool = True
+
+    # 可续传的SSE：每次生成的回放缓冲保留的事件数；结束的会话在内存中保留的时间（秒）与数量；
+    # 客户端全部断开后继续生成、等待重连的时间（秒，0表示立即取消）
+    sse_replay_max_events: int = 10000
+    sse_replay_ttl: float = 300
+    sse_replay_max_sessions: int = 256
+    sse_resume_grace_seconds: float = 10
+    # 客户端断开后的处理：cancel在等待重连超时后取消生成流程（含正在进行的LLM请求），丢弃未完成的脚本；
+    # finish在后台生成完毕并保存（仍可续传）。检查客户端是否断开的间隔（秒，0表示不主动检查）
+    sse_disconnect_mode: str = "cancel"
+    sse_disconnect_poll_interval: float = 0.5
+    # 是否把正常结束的会话写入数据库（generation_session表）及其有效期（秒）
+    sse_replay_persist: bool = False
+    sse_replay_persist_ttl: float = 24 * 3600
+
+
+settings = Settings()
@@ -0,0 +1,179 @@
+"""
+进程内的轻量指标，仅使用标准库。
+
+指标以 ``(名称, 标签取值)`` 为键累加，``counter()`` / ``gauge()`` / ``histogram()`` 按名称返回同一个实例，
+各模块在导入时声明自己的指标。``render()`` 输出Prometheus文本格式，由 ``/metrics`` 暴露。
+每次记录只是一次加锁的字典更新（直方图另加一次二分查找），可以在生产环境常开。
+"""
+import bisect
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple, Union
+
+# 耗时类直方图的默认桶（秒），覆盖毫秒级的DB操作到分钟级的LLM生成
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# token数的桶
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+# 字节数的桶
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """返回所有 ``(标签, 取值)``"""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge(Counter):
+    """可增可减、可直接设置的当前值"""
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """累积分桶的直方图，同时记录样本总和与个数"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签取值 -> [各桶计数（最后一个为+Inf）, 总和]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._label_values(labels))
+        return sum(state[0]) if state else 0
+
+    def samples(self) -> List[Tuple[Dict[str, str], List[int], float]]:
+        """返回所有 ``(标签, 各桶的累积计数, 总和)``，累积计数的最后一项为+Inf桶即样本数"""
+        with self._lock:
+            items = [(key, list(state[0]), state[1]) for key, state in self._values.items()]
+        result = []
+        for key, counts, total in items:
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            result.append((dict(zip(self.labelnames, key)), cumulative, total))
+        return result
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+_registry: Dict[str, Metric] = {}
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """获取或注册计数器"""
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = Counter(name, documentation, labelnames)
+    return metric
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """获取或注册仪表"""
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = Gauge(name, documentation, labelnames)
+    return metric
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    """获取或注册直方图"""
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = Histogram(name, documentation, labelnames, buckets)
+    return metric
+
+
+def registry() -> Dict[str, Metric]:
+    return dict(_registry)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """以Prometheus文本格式（0.0.4）输出所有指标"""
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        if isinstance(metric, Counter):
+            kind = "gauge" if isinstance(metric, Gauge) else "counter"
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+        lines.append(f"# TYPE {name} histogram")
+        for labels, cumulative, total in metric.samples():
+            for bound, count in zip(metric.buckets + (math.inf,), cumulative):
+                bucket_labels = {**labels, "le": _format_value(bound)}
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative[-1]}")
+    return "\n".join(lines) + "\n"
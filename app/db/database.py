@@ -1,6 +1,12 @@
 import os
+import time
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core import metrics
+from app.core.config import settings
 
 DATABASE_DSN = os.getenv("DATABASE_DSN")
 # if DATABASE_DSN:
@@ -16,7 +22,42 @@ DATABASE_DSN = os.getenv("DATABASE_DSN")
 #         f"@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
 #     )
 
-engine = create_async_engine(DATABASE_DSN, echo=True, future=True)
+db_pool_checkout_seconds = metrics.histogram(
+    "podcast_db_pool_checkout_seconds",
+    "从数据库连接池获取连接的等待时间（含新建连接）",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """记录连接签出等待时间的连接池"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - start)
+
+
+def _engine_options(dsn: str) -> dict:
+    """
+    方言默认使用队列连接池时换成带统计的子类，并应用连接池配置；
+    SQLite内存库等仍用方言默认的连接池。
+    """
+    url = make_url(dsn)
+    if issubclass(url.get_dialect(_is_async=True).get_pool_class(url), AsyncAdaptedQueuePool):
+        return {
+            "poolclass": InstrumentedAsyncPool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle
+        }
+    return {}
+
+
+engine = create_async_engine(DATABASE_DSN, echo=settings.db_echo, future=True, **_engine_options(DATABASE_DSN))
 AsyncSessionLocal = sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
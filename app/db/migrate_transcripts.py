@@ -0,0 +1,164 @@
+"""
+把内联在 ``podcast.transcript`` 中的旧脚本迁移为压缩存储。
+
+    python -m app.db.migrate_transcripts [--batch-size 200] [--samples 500] [--retrain]
+
+- 缺少 ``transcript_blob`` / ``transcript_dictionary`` 表或 ``podcast.transcript_hash`` /
+  ``podcast.content_signature`` 列时自动补建；
+- 还没有当前编码的字典（或指定 ``--retrain``）时，抽样已有脚本训练字典；
+- 按ID分批压缩脚本、写入哈希并清空内联原文，每批单独提交，中断后重新运行会从未迁移的记录继续；
+- 使用MySQL全文检索时，为还没有 ``podcast_search_text`` 的记录补建检索明文（同样分批、可重复执行）。
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import inspect, select, text, update
+
+from app.db.database import engine, AsyncSessionLocal
+from app.models.podcast import Base, Podcast
+from app.models.search import PodcastSearchText
+from app.models.transcript import TranscriptBlob, TranscriptDictionary
+from app.services.search import search_backend, search_body
+from app.services.transcripts import (
+    decode_transcripts, join_transcript, store_transcripts, transcript_codec, transcript_columns
+)
+
+
+def _ensure_schema(connection) -> None:
+    Base.metadata.create_all(
+        connection, tables=[TranscriptBlob.__table__, TranscriptDictionary.__table__, PodcastSearchText.__table__]
+    )
+    inspector = inspect(connection)
+    columns = {column["name"] for column in inspector.get_columns("podcast")}
+    if "transcript_hash" not in columns:
+        connection.execute(text("ALTER TABLE podcast ADD COLUMN transcript_hash CHAR(64) NULL"))
+        print("已添加列 podcast.transcript_hash")
+    if "content_signature" not in columns:
+        column_type = "VARBINARY(2048)" if connection.dialect.name == "mysql" else "BLOB"
+        connection.execute(text(f"ALTER TABLE podcast ADD COLUMN content_signature {column_type} NULL"))
+        print("已添加列 podcast.content_signature")
+    if inspector.has_table("podcast_job"):
+        job_columns = {column["name"] for column in inspector.get_columns("podcast_job")}
+        if "owner" not in job_columns:
+            connection.execute(text("ALTER TABLE podcast_job ADD COLUMN owner VARCHAR(64) NULL"))
+            connection.execute(text("ALTER TABLE podcast_job ADD COLUMN heartbeat_at DATETIME NULL"))
+            print("已添加列 podcast_job.owner、podcast_job.heartbeat_at")
+    if connection.dialect.name == "mysql":
+        indexes = {index["name"] for index in inspector.get_indexes("podcast_search_text")}
+        if "ft_podcast_search_text" not in indexes:
+            connection.execute(text(
+                "ALTER TABLE podcast_search_text ADD FULLTEXT INDEX ft_podcast_search_text (body) WITH PARSER ngram"
+            ))
+            print("已添加全文索引 podcast_search_text.ft_podcast_search_text")
+
+
+async def train_dictionary(samples: int) -> None:
+    """抽样最近的脚本（含已迁移的）训练字典并保存，之后的压缩使用新字典"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Podcast.transcript).where(Podcast.transcript.isnot(None)).order_by(Podcast.id.desc()).limit(samples)
+        )
+        texts = list(result.scalars())
+        if len(texts) < samples:
+            blobs = await db.execute(
+                select(TranscriptBlob.hash).order_by(TranscriptBlob.created_at.desc()).limit(samples - len(texts))
+            )
+            texts.extend(filter(None, [await _load_blob(db, digest) for digest in blobs.scalars()]))
+        if not texts:
+            print("没有可用于训练字典的脚本，按无字典压缩")
+            return
+        data = transcript_codec.train(texts)
+        dictionary = TranscriptDictionary(codec=transcript_codec.codec, data=data)
+        db.add(dictionary)
+        await db.commit()
+        transcript_codec.add_dictionary(dictionary.id, dictionary.codec, dictionary.data)
+        print(f"已用{len(texts)}条脚本训练{dictionary.codec}字典 #{dictionary.id}（{len(data)}字节）")
+
+
+async def _load_blob(db, digest: str):
+    blob = await db.get(TranscriptBlob, digest)
+    if blob is None:
+        return None
+    await transcript_codec.ensure(db, [blob.dictionary_id])
+    return transcript_codec.decompress(blob.codec, blob.dictionary_id, blob.data)
+
+
+async def migrate(batch_size: int = 200, samples: int = 500, retrain: bool = False) -> int:
+    """迁移所有未迁移的记录，返回迁移条数"""
+    async with engine.begin() as connection:
+        await connection.run_sync(_ensure_schema)
+    await transcript_codec.load()
+    if retrain or transcript_codec.active is None:
+        await train_dictionary(samples)
+
+    migrated = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Podcast.id, Podcast.transcript)
+                .where(Podcast.id > last_id, Podcast.transcript_hash.is_(None), Podcast.transcript.isnot(None))
+                .order_by(Podcast.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            hashes = await store_transcripts(db, [row.transcript for row in rows])
+            for row, digest in zip(rows, hashes):
+                await db.execute(
+                    update(Podcast).where(Podcast.id == row.id).values(transcript_hash=digest, transcript=None)
+                )
+            await db.commit()
+        migrated += len(rows)
+        last_id = rows[-1].id
+        print(f"已迁移{migrated}条（至ID {last_id}）")
+    return migrated
+
+
+async def backfill_search_text(batch_size: int = 200) -> int:
+    """为没有检索明文的记录补建 ``podcast_search_text``，返回补建条数"""
+    filled = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(join_transcript(
+                select(Podcast.id, Podcast.title, Podcast.content, *transcript_columns())
+                .outerjoin(PodcastSearchText, PodcastSearchText.podcast_id == Podcast.id)
+                .where(Podcast.id > last_id, PodcastSearchText.podcast_id.is_(None))
+                .order_by(Podcast.id)
+                .limit(batch_size)
+            ))
+            rows = result.mappings().all()
+            if not rows:
+                break
+            transcripts = await decode_transcripts(db, rows)
+            db.add_all([
+                PodcastSearchText(podcast_id=row["id"], body=search_body(row["title"], row["content"], transcript))
+                for row, transcript in zip(rows, transcripts)
+            ])
+            await db.commit()
+        filled += len(rows)
+        last_id = rows[-1]["id"]
+        print(f"已补建检索明文{filled}条（至ID {last_id}）")
+    return filled
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="把podcast.transcript迁移为压缩存储")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批迁移的记录数")
+    parser.add_argument("--samples", type=int, default=500, help="训练字典使用的脚本数")
+    parser.add_argument("--retrain", action="store_true", help="即使已有字典也重新训练")
+    args = parser.parse_args()
+    try:
+        migrated = await migrate(args.batch_size, args.samples, args.retrain)
+        print(f"迁移完成，共{migrated}条")
+        if search_backend() == "mysql":
+            filled = await backfill_search_text(args.batch_size)
+            print(f"检索明文补建完成，共{filled}条")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
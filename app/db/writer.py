@@ -0,0 +1,171 @@
+"""
+批量写入（write-behind）。
+
+生成流程结束后不再各自持有数据库会话做一次 add/commit/refresh，而是把记录交给写入队列：
+- 队列攒够 ``batch_size`` 条，或距第一条排队等待了 ``flush_interval`` 秒，就在一个事务中批量插入；
+- 每条记录对应一个future，提交后以插入得到的主键完成，调用方await即可拿到记录ID；
+- 只有写入的这几毫秒才从连接池签出连接。
+
+支持RETURNING的数据库（SQLite、MariaDB、PostgreSQL）由SQLAlchemy合并为多行INSERT；
+MySQL需要逐行获取自增ID，仍会逐条执行INSERT，但同一批共享一个连接与一次提交。
+
+整批写入失败时逐条重试，只有出错的记录（如严格模式下超长的字段）的调用方收到异常。
+停止时等待正在进行的写入完成，并写入仍在排队的记录。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.podcast import Podcast
+from app.services.transcripts import prepare_podcast_rows
+
+Records = List[Dict[str, Any]]
+
+write_batch_size = metrics.histogram(
+    "podcast_db_write_batch_size",
+    "每次批量写入的记录数",
+    ["table"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+)
+write_seconds = metrics.histogram(
+    "podcast_db_write_seconds",
+    "每次批量写入（含获取连接与提交）的耗时",
+    ["table"]
+)
+
+
+class BatchWriter:
+    """按批次插入某个ORM模型的记录"""
+
+    def __init__(
+        self,
+        model: Any,
+        batch_size: int,
+        flush_interval: float,
+        prepare: Optional[Callable[[AsyncSession, Records], Awaitable[Records]]] = None
+    ):
+        """``prepare`` 在同一事务中把排队的记录转换为模型字段（如压缩并另存大字段）"""
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.prepare = prepare
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._listeners: List[Callable[[Records], None]] = []
+        self._hooks: List[Callable[[AsyncSession, Records], Awaitable[None]]] = []
+
+    def add_listener(self, listener: Callable[[Records], None]) -> None:
+        """注册写入成功后的回调，参数为本批排队时的记录并附带 ``id``（如用于增量更新搜索索引）"""
+        self._listeners.append(listener)
+
+    def add_insert_hook(self, hook: Callable[[AsyncSession, Records], Awaitable[None]]) -> None:
+        """注册在同一事务中、插入之后执行的回调，参数同 ``add_listener``（如写入关联表）"""
+        self._hooks.append(hook)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务：不中断正在进行的写入，写完仍在排队的记录后退出"""
+        if self._task is not None:
+            self._stopping = True
+            self._ready.set()
+            self._full.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def insert(self, values: Dict[str, Any]) -> int:
+        """排队插入一条记录，写入后返回其主键"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((values, future))
+        self._ready.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        # 首次使用时（如未经过应用生命周期的脚本调用）自动启动
+        self.start()
+        # 调用方被取消时记录仍会写入，只是不再等待结果
+        return await future
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if len(self._pending) < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._ready.clear()
+            self._full.clear()
+            await self.flush()
+            if self._stopping and not self._pending:
+                return
+
+    async def flush(self) -> None:
+        """立即写入所有排队的记录"""
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            self._pending = self._pending[self.batch_size:]
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        table = self.model.__tablename__
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            async with AsyncSessionLocal() as db:
+                records = [values for values, _ in batch]
+                if self.prepare is not None:
+                    records = await self.prepare(db, records)
+                rows = [self.model(**values) for values in records]
+                db.add_all(rows)
+                if self._hooks:
+                    # 先取得主键，再在同一事务中执行回调
+                    await db.flush()
+                    inserted = [{**values, "id": row.id} for row, (values, _) in zip(rows, batch)]
+                    for hook in self._hooks:
+                        await hook(db, inserted)
+                await db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # 逐条重试，只让出错的记录失败
+                print(f"警告：批量写入{table}失败（{len(batch)}条），逐条重试: {e}")
+                for item in batch:
+                    await self._write([item])
+                return
+            print(f"警告：写入{table}失败: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        write_batch_size.observe(len(batch), table=table)
+        write_seconds.observe(loop.time() - start, table=table)
+        inserted = [{**values, "id": row.id} for row, (values, _) in zip(rows, batch)]
+        for listener in self._listeners:
+            try:
+                listener(inserted)
+            except Exception as e:
+                print(f"警告：{table}写入回调执行失败: {e}")
+        for row, (_, future) in zip(rows, batch):
+            if not future.done():
+                future.set_result(row.id)
+
+
+podcast_writer = BatchWriter(
+    Podcast,
+    batch_size=settings.podcast_write_batch_size,
+    flush_interval=settings.podcast_write_flush_interval,
+    prepare=prepare_podcast_rows
+)
@@ -1,15 +1,29 @@
 import asyncio
-from typing import AsyncGenerator, List, Dict, Any, Optional
+import re
+import time
+from typing import AsyncGenerator, Awaitable, List, Dict, Any, Optional, Tuple
 from typing_extensions import TypedDict
 import os
-from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core import metrics
+from app.db.writer import podcast_writer
+from app.llm_providers import http_pool
+from app.llm_providers.cache import cache_key, generation_cache
+from app.llm_providers import limiter
+from app.llm_providers import long_input
+from app.llm_providers import prompts
+from app.llm_providers import resilience
+from app.llm_providers.routing import Endpoint, EndpointPool
+from app.llm_providers.language_detect import detect_language, normalize_language
+from app.llm_providers.script_chunks import split_script, speaker_names
+from app.services.near_duplicate import content_signature
 
 try:
-    from langchain_core.messages import HumanMessage, SystemMessage
-    from langchain_core.prompts import ChatPromptTemplate
     from langchain_openai import ChatOpenAI
     from langgraph.graph import StateGraph, END
     from langgraph.graph.message import add_messages
+    from langgraph.types import StreamWriter
 except ImportError:
     # 如果依赖未安装，提供占位实现
     class ChatOpenAI:
@@ -21,53 +35,209 @@ except ImportError:
                 content = "模拟响应：依赖未安装"
             return Response()
     
-    class ChatPromptTemplate:
-        @staticmethod
-        def from_messages(messages):
-            return ChatPromptTemplateStub(messages)
-    
-    class ChatPromptTemplateStub:
-        def __init__(self, messages):
-            self.messages = messages
-        
-        def format_messages(self, **kwargs):
-            return []
-    
     def add_messages(messages, new_messages):
         return messages
     
     END = "end"
     StateGraph = None
+    StreamWriter = Any
 
 class LLMConfig:
-    """LLM配置类"""
-    def __init__(self, model: str, base_url: Optional[str] = None, api_key: Optional[str] = None, temperature: float = 0.7):
-        self.model = "qwen-plus"
-        self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        self.api_key = os.getenv("OPENAI_API_KEY")
+    """
+    LLM配置类。未指定base_url时使用 ``LLM_BASE_URL``，未指定api_key时使用OPENAI_API_KEY环境变量；
+    未指定max_tokens时使用阶段的上限（``LLM_STAGE_MAX_TOKENS``）
+    """
+    def __init__(
+        self,
+        model: str,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ):
+        self.model = model
+        self.base_url = base_url or settings.llm_base_url
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.temperature = temperature
+        self.max_tokens = max_tokens
     
-    def create_llm(self) -> ChatOpenAI:
-        """创建LLM实例"""
-        kwargs = {
-            "model": self.model,
-            "temperature": self.temperature
-        }
-        if self.base_url:
-            kwargs["base_url"] = self.base_url   
-        if self.api_key:
-            kwargs["api_key"] = self.api_key
-        return ChatOpenAI(**kwargs)
+    @classmethod
+    def for_tier(cls, tier: str) -> "LLMConfig":
+        """按 ``LLM_TIERS`` 中的档位创建配置"""
+        spec = settings.llm_tiers.get(tier)
+        if spec is None:
+            raise ValueError(f"未配置的模型档位：{tier}")
+        return cls(
+            spec["model"],
+            spec.get("base_url"),
+            spec.get("api_key"),
+            float(spec.get("temperature", 0.7)),
+            spec.get("max_tokens")
+        )
+    
+    def key(self) -> Tuple:
+        """配置的有效取值，用作生成器注册表的键"""
+        return (self.model, self.base_url, self.api_key, self.temperature, self.max_tokens)
+    
+    def create_llm(self, max_tokens: Optional[int] = None) -> ChatOpenAI:
+        """创建LLM实例，同一endpoint的实例共享HTTP连接池"""
+        return create_chat_llm(
+            self.model, self.base_url, self.api_key, self.temperature, self.max_tokens or max_tokens
+        )
+
+
+def content_summary(content: str) -> str:
+    """保存为记录内容与标题的摘要（前100个字符）"""
+    return content[:100] + "..." if len(content) > 100 else content
+
+
+def stage_llm_config(role: str, tier: Optional[str] = None) -> LLMConfig:
+    """阶段使用的LLM配置：指定的档位，默认为 ``LLM_STAGE_TIERS`` 中该阶段的档位"""
+    return LLMConfig.for_tier(tier or settings.llm_stage_tiers.get(role, "large"))
+
+
+def create_chat_llm(
+    model: str,
+    base_url: Optional[str],
+    api_key: Optional[str],
+    temperature: float,
+    max_tokens: Optional[int] = None
+) -> ChatOpenAI:
+    """创建ChatOpenAI实例，同一endpoint的实例共享HTTP连接池"""
+    kwargs = {
+        "model": model,
+        "temperature": temperature,
+        "http_async_client": http_pool.get_async_client(base_url),
+        # 重试由endpoint池按阶段的截止时间统一处理（见resilience），客户端自身不重试
+        "max_retries": 0
+    }
+    if base_url:
+        kwargs["base_url"] = base_url   
+    if api_key:
+        kwargs["api_key"] = api_key
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    return ChatOpenAI(**kwargs)
+
+
+def build_endpoint_pool(role: str, config: LLMConfig, use_endpoint_specs: bool = True) -> EndpointPool:
+    """
+    构建阶段的endpoint池。
+    settings.llm_endpoints 中配置了该阶段（且use_endpoint_specs为True）时使用配置的多个endpoint，
+    否则只有config对应的一个；settings.llm_fallback_endpoints 中的endpoint在其他endpoint全部熔断时使用。
+    """
+    max_tokens = config.max_tokens or settings.llm_stage_max_tokens.get(role) or None
+    specs = settings.llm_endpoints.get(role) if use_endpoint_specs else None
+    if specs:
+        endpoints = _endpoints_from_specs(specs, config.temperature, max_tokens)
+    else:
+        endpoints = [Endpoint(config.base_url, config.model, config.create_llm(max_tokens))]
+    fallbacks = _endpoints_from_specs(settings.llm_fallback_endpoints.get(role, []), config.temperature, max_tokens)
+    return EndpointPool(role, endpoints, hedge=role in settings.llm_hedge_roles, fallbacks=fallbacks)
+
+
+def _endpoints_from_specs(
+    specs: List[Dict[str, Any]], temperature: float, max_tokens: Optional[int]
+) -> List[Endpoint]:
+    return [
+        Endpoint(
+            spec.get("base_url"),
+            spec["model"],
+            create_chat_llm(
+                spec["model"],
+                spec.get("base_url"),
+                spec.get("api_key") or os.getenv("OPENAI_API_KEY"),
+                temperature,
+                spec.get("max_tokens", max_tokens)
+            ),
+            weight=float(spec.get("weight", 1.0))
+        )
+        for spec in specs
+    ]
+
+language_check_total = metrics.counter(
+    "podcast_language_check_total",
+    "脚本语言检查次数，outcome=skipped表示本地识别命中、跳过了翻译LLM",
+    ["outcome"]
+)
+
+short_input_routed_total = metrics.counter(
+    "podcast_llm_short_input_routed_total",
+    "输入较短、按LLM_SHORT_INPUT_TIERS改用其他档位的LLM调用数",
+    ["role"]
+)
+
+generation_cache_total = metrics.counter(
+    "podcast_generation_cache_total",
+    "生成缓存查询次数，result为hit/partial/miss/bypass",
+    ["result"]
+)
+
+speculation_total = metrics.counter(
+    "podcast_speculation_total",
+    "投机生成详细内容的次数，outcome=used表示被采用，wasted表示被取消",
+    ["outcome"]
+)
+speculation_wasted_tokens_total = metrics.counter(
+    "podcast_speculation_wasted_tokens_total",
+    "被取消的投机生成消耗的token数（未完成时按提示词估算）"
+)
+speculation_saved_seconds_total = metrics.counter(
+    "podcast_speculation_saved_seconds_total",
+    "投机生成节省的时间（秒）"
+)
+
+node_duration_seconds = metrics.histogram(
+    "podcast_node_duration_seconds",
+    "生成图各节点的执行时间（含节点内LLM调用的排队），outcome为ok/error",
+    ["node", "outcome"]
+)
+generation_duration_seconds = metrics.histogram(
+    "podcast_generation_duration_seconds",
+    "一次脚本生成的总耗时，cache为生成缓存查询结果",
+    ["cache"]
+)
+
+# 以“发言人：内容”开头的行，出现多行时内容大概率已是精确脚本
+_SCRIPT_LINE = re.compile(r"^[^\n:：]{1,20}[:：].+$", re.MULTILINE)
+
+
+def should_speculate(content: str) -> bool:
+    """
+    投机执行策略：是否在分析的同时生成详细内容。
+    auto模式下只对较短且不像对话脚本的内容投机，这类内容多为模糊主题，投机的命中率高。
+    """
+    mode = settings.speculation_mode
+    if mode == "on":
+        return True
+    if mode != "auto":
+        return False
+    if len(content) > settings.speculation_max_chars:
+        return False
+    return len(_SCRIPT_LINE.findall(content)) < 2
+
+
+def _total_tokens(response: Any, messages: List[Any]) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    return limiter.estimate_tokens(messages) + limiter.estimate_tokens([response])
+
 
 class PodcastState(TypedDict):
     """播客生成状态"""
     content: str
     content_type: Optional[str]
     voices: List[str]
+    # 输入内容的token数（短输入为上界），超过阈值时先浓缩
+    content_tokens: Optional[int]
+    condensed_content: Optional[str]
     is_precise: Optional[bool]
     detailed_content: Optional[str]
     script: Optional[str]
     target_language: str
+    detected_language: Optional[str]
+    language_confidence: Optional[float]
     final_script: Optional[str]
     messages: List[Any]
 
@@ -77,13 +247,36 @@ class PodcastScriptGenerator:
         analyzer_llm_config: LLMConfig,
         content_generator_llm_config: LLMConfig,
         script_generator_llm_config: LLMConfig,
-        translator_llm_config: LLMConfig
+        translator_llm_config: LLMConfig,
+        short_input_configs: Optional[Dict[str, Tuple[int, LLMConfig]]] = None
     ):
-        # 为每个步骤创建不同的LLM
-        self.analyzer_llm = analyzer_llm_config.create_llm()
-        self.content_generator_llm = content_generator_llm_config.create_llm()
-        self.script_generator_llm = script_generator_llm_config.create_llm()
-        self.translator_llm = translator_llm_config.create_llm()
+        configs = {
+            "analyzer": analyzer_llm_config,
+            "content_generator": content_generator_llm_config,
+            "script_generator": script_generator_llm_config,
+            "translator": translator_llm_config
+        }
+        
+        # 为每个步骤创建不同的LLM（endpoint池）
+        self.pools = {role: build_endpoint_pool(role, config) for role, config in configs.items()}
+        # 按输入长度路由：阶段 -> (输入token上限, 短输入使用的endpoint池)
+        self.short_input_pools = {
+            role: (max_input_tokens, build_endpoint_pool(role, config, use_endpoint_specs=False))
+            for role, (max_input_tokens, config) in (short_input_configs or {}).items()
+        }
+        
+        # 各阶段影响输出的配置（模型、温度与输出上限，及按输入长度路由的档位），参与缓存键计算
+        self.stage_configs = {}
+        for role, pool in self.pools.items():
+            models = sorted({endpoint.model for endpoint in pool.endpoints})
+            self.stage_configs[role] = (
+                models[0] if len(models) == 1 else models,
+                configs[role].temperature,
+                configs[role].max_tokens or settings.llm_stage_max_tokens.get(role) or None
+            )
+            if role in self.short_input_pools:
+                max_input_tokens, short_pool = self.short_input_pools[role]
+                self.stage_configs[role] += (max_input_tokens, short_pool.endpoints[0].model)
         
         self.graph = self._build_graph()
     
@@ -94,6 +287,72 @@ class PodcastScriptGenerator:
             return voices[:5]
         return voices
     
+    async def _ainvoke(self, role: str, messages: List[Any], streamed: bool = False) -> Any:
+        """
+        通过对应角色的endpoint池（路由、限流、重试、熔断、对冲）调用LLM。
+        输出会逐token转发给客户端的调用须传入 ``streamed=True``，避免重试造成重复输出
+        """
+        return await self._pool_for(role, messages).ainvoke(messages, streamed=streamed)
+    
+    def _pool_for(self, role: str, messages: List[Any]) -> EndpointPool:
+        """阶段的输入（不含系统提示词）不超过短输入上限时使用短输入档位的endpoint池"""
+        short = self.short_input_pools.get(role)
+        if short is not None:
+            max_input_tokens, pool = short
+            inputs = [m for m in messages if getattr(m, "type", None) != "system"]
+            if limiter.estimate_tokens(inputs) <= max_input_tokens:
+                short_input_routed_total.inc(role=role)
+                return pool
+        return self.pools[role]
+    
+    def stage_cache_keys(
+        self,
+        content: str,
+        content_type: Optional[str],
+        voices: List[str],
+        target_language: str
+    ) -> Dict[str, str]:
+        """
+        计算各阶段输出的缓存键。
+        每个阶段的键只包含影响该阶段输出的输入，因此不同语言的请求可以复用同一份脚本。
+        """
+        voices = [v.strip() for v in voices if v and v.strip()][:5]
+        configs = self.stage_configs
+        # 各阶段用到的提示词版本参与缓存键，修改某个提示词只使依赖它的阶段失效
+        analyze = (prompts.prompt_versions("analyze_content"), content, configs["analyzer"])
+        detailed = (prompts.prompt_versions("detailed_content"), content, content_type, voices, configs["content_generator"])
+        script = (
+            *analyze, *detailed,
+            prompts.prompt_versions("script_single", "script_dialogue"), configs["script_generator"]
+        )
+        language = normalize_language(target_language) or target_language
+        translate = prompts.prompt_versions("translate", "translate_chunk")
+        condense = (
+            prompts.prompt_versions("summarize_chunk", "merge_summaries"), content,
+            settings.long_input_chunk_tokens, settings.long_input_summary_tokens, configs["content_generator"]
+        )
+        return {
+            "condense_content": cache_key("condense_content", *condense),
+            "analyze_content": cache_key("analyze_content", *analyze),
+            "generate_detailed_content": cache_key("generate_detailed_content", *detailed),
+            "generate_script": cache_key("generate_script", *script),
+            "final_script": cache_key("final_script", *script, translate, language, configs["translator"])
+        }
+    
+    def _route_entry(self, state: PodcastState) -> str:
+        """根据已有（缓存命中或复用）的阶段输出决定从哪个节点开始"""
+        if state.get("script"):
+            return "detect_language"
+        if state.get("detailed_content"):
+            return "generate_script"
+        if state.get("condensed_content") is None and long_input.is_long(state.get("content_tokens")):
+            return "condense_content"
+        if state.get("is_precise") is None:
+            return "analyze_content"
+        if state["is_precise"] or state.get("detailed_content"):
+            return "generate_script"
+        return "generate_detailed_content"
+    
     def _build_graph(self) -> StateGraph:
         """构建LangChain Graph"""
         if StateGraph is None:
@@ -105,18 +364,35 @@ class PodcastScriptGenerator:
                     state["script"] = f"模拟脚本内容：{state['content']}"
                     state["final_script"] = state["script"]
                     return state
+
+                async def astream(self, state, stream_mode=None):
+                    yield "values", await self.ainvoke(state)
             return GraphStub()
         
         workflow = StateGraph(PodcastState)
         
         # 添加节点
+        workflow.add_node("condense_content", self._condense_content)
         workflow.add_node("analyze_content", self._analyze_content_precision)
         workflow.add_node("generate_detailed_content", self._generate_detailed_content)
         workflow.add_node("generate_script", self._generate_podcast_script)
+        workflow.add_node("detect_language", self._detect_script_language)
         workflow.add_node("check_language", self._check_and_translate_language)
+        workflow.add_node("translate_chunks", self._translate_in_chunks)
         
-        # 设置入口点
-        workflow.set_entry_point("analyze_content")
+        # 设置入口点，缓存部分命中时跳过已有输出的阶段
+        entries = {
+            "analyze_content": "analyze_content",
+            "generate_detailed_content": "generate_detailed_content",
+            "generate_script": "generate_script",
+            "detect_language": "detect_language"
+        }
+        workflow.set_conditional_entry_point(
+            self._route_entry,
+            {**entries, "condense_content": "condense_content"}
+        )
+        # 长输入浓缩后按同样的规则继续（浓缩结果已在状态中，不会再次进入）
+        workflow.add_conditional_edges("condense_content", self._route_entry, entries)
         
         # 添加条件边
         workflow.add_conditional_edges(
@@ -129,113 +405,121 @@ class PodcastScriptGenerator:
         )
         
         workflow.add_edge("generate_detailed_content", "generate_script")
-        workflow.add_edge("generate_script", "check_language")
+        workflow.add_edge("generate_script", "detect_language")
+        
+        # 本地识别已确认是目标语言时直接结束，跳过翻译LLM
+        workflow.add_conditional_edges(
+            "detect_language",
+            self._should_translate,
+            {
+                "translate": "check_language",
+                "translate_chunks": "translate_chunks",
+                "skip_translation": END
+            }
+        )
         workflow.add_edge("check_language", END)
+        workflow.add_edge("translate_chunks", END)
         
         return workflow.compile()
     
-    async def _analyze_content_precision(self, state: PodcastState) -> PodcastState:
-        """使用专门的分析LLM分析内容是否精确"""
+    async def _condense_content(self, state: PodcastState, writer: StreamWriter) -> PodcastState:
+        """长输入：分块并发提炼要点再合并，之后的阶段使用浓缩后的内容"""
+        condensed, stats, responses = await long_input.condense(
+            state["content"],
+            lambda messages: self._ainvoke("content_generator", messages)
+        )
+        writer({"event": "condense", "input_tokens": state.get("content_tokens"), **stats})
+        
+        return {
+            **state,
+            "condensed_content": condensed,
+            "messages": add_messages(state.get("messages", []), responses)
+        }
+    
+    async def _analyze_content_precision(self, state: PodcastState, writer: StreamWriter) -> PodcastState:
+        """
+        使用专门的分析LLM分析内容是否精确。
+        投机策略允许时，同时启动详细内容生成，分析结果为模糊描述时直接复用。
+        """
         # 验证声音数量
         validated_voices = self._validate_voices(state["voices"])
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """你是一个专业的内容分析专家。请判断给定的内容是精确的播客脚本还是模糊的主题描述。
-
-精确脚本的特征：
-- 包含具体的朗读文本内容
-- 有明确的发言人和对话（如果是多人）
-- 内容详细完整，可以直接朗读
-- 有具体的播客结构和内容
-
-模糊描述的特征：
-- 只是主题、概念或想法
-- 缺乏具体的文本内容
-- 需要进一步展开成完整的朗读稿
-- 只是大纲或提纲
-
-请仔细分析内容，只回答 "precise" 或 "vague"，不要添加其他解释。"""),
-            ("human", "请分析以下内容：\n{content}")
-        ])
+        # 长输入只给分析阶段看开头、中间、结尾的抽样
+        sampled = await asyncio.to_thread(long_input.sample, state["content"], settings.analyzer_input_tokens)
+        analyzer_messages = prompts.ANALYZE_CONTENT.format_messages(content=sampled)
         
-        response = await self.analyzer_llm.ainvoke(
-            prompt.format_messages(content=state["content"])
-        )
+        if not should_speculate(state["content"]):
+            response = await self._ainvoke("analyzer", analyzer_messages)
+            return {
+                **state,
+                "voices": validated_voices,
+                "is_precise": "precise" in response.content.lower(),
+                "messages": add_messages(state.get("messages", []), [response])
+            }
         
+        # 投机执行：分析的同时生成详细内容，判定为精确时取消
+        detailed_messages = self._detailed_content_messages({**state, "voices": validated_voices})
+        started = time.monotonic()
+        speculative = asyncio.create_task(self._timed(self._ainvoke("content_generator", detailed_messages)))
+        try:
+            response = await self._ainvoke("analyzer", analyzer_messages)
+        except BaseException:
+            speculative.cancel()
+            raise
+        analyzer_seconds = time.monotonic() - started
         is_precise = "precise" in response.content.lower()
+        new_messages = [response]
+        
+        if is_precise:
+            speculative.cancel()
+            if speculative.done() and not speculative.cancelled() and not speculative.exception():
+                wasted_tokens = _total_tokens(speculative.result()[0], detailed_messages)
+            else:
+                # 已发出的请求至少消耗了提示词token
+                wasted_tokens = limiter.estimate_tokens(detailed_messages)
+            speculation = {"outcome": "wasted", "wasted_tokens": wasted_tokens, "saved_seconds": 0.0}
+            detailed_content = None
+        else:
+            detailed_response, detailed_seconds = await speculative
+            # 串行执行需要 分析 + 详细内容 各自的耗时，投机执行的实际耗时为二者并行的总时间
+            wall_seconds = time.monotonic() - started
+            speculation = {
+                "outcome": "used",
+                "wasted_tokens": 0,
+                "saved_seconds": round(max(0.0, analyzer_seconds + detailed_seconds - wall_seconds), 3)
+            }
+            detailed_content = detailed_response.content
+            new_messages.append(detailed_response)
+        
+        speculation_total.inc(outcome=speculation["outcome"])
+        speculation_wasted_tokens_total.inc(speculation["wasted_tokens"])
+        speculation_saved_seconds_total.inc(speculation["saved_seconds"])
+        writer({"event": "speculation", **speculation})
         
         return {
             **state,
             "voices": validated_voices,
             "is_precise": is_precise,
-            "messages": add_messages(state.get("messages", []), [response])
+            "detailed_content": detailed_content,
+            "messages": add_messages(state.get("messages", []), new_messages)
         }
     
+    @staticmethod
+    async def _timed(coroutine: Awaitable[Any]) -> Tuple[Any, float]:
+        """返回协程的结果及其自身的耗时（秒）"""
+        started = time.monotonic()
+        result = await coroutine
+        return result, time.monotonic() - started
+    
     def _should_generate_detailed_content(self, state: PodcastState) -> str:
-        """决定是否需要生成详细内容"""
-        return "direct_script" if state["is_precise"] else "generate_detailed"
+        """决定是否需要生成详细内容（投机执行已生成时直接生成脚本）"""
+        if state["is_precise"] or state.get("detailed_content"):
+            return "direct_script"
+        return "generate_detailed"
     
     async def _generate_detailed_content(self, state: PodcastState) -> PodcastState:
         """使用专门的内容生成LLM根据模糊描述生成详细内容"""
-        voices_count = len(state["voices"])
-        content_type = state.get("content_type", "通用")
-        
-        # 根据voices数量动态调整prompt
-        if voices_count == 0:
-            voice_instruction = """
-生成单人朗读内容大纲（5分钟）：
-- 单人朗读形式
-- 直入主题，无需介绍
-- 内容要简洁精炼"""
-            
-        elif voices_count == 1:
-            voice_instruction = f"""
-生成单人朗读内容大纲（5分钟）：
-- 朗读者：{state['voices'][0]}
-- 直入主题，无需自我介绍
-- 内容要有重点，简洁明了"""
-            
-        else:
-            voices_list = "、".join(state["voices"])
-            voice_instruction = f"""
-生成多人对话内容大纲（5分钟）：
-- 参与者：{voices_list}
-- 直接开始讨论，无需介绍环节
-- 对话要简洁高效"""
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""你是一个专业的内容策划师。根据给定的主题描述，生成5分钟朗读内容的详细大纲。
-
-内容类型：{content_type}
-{voice_instruction}
-
-请生成包含以下要素的内容大纲：
-
-1. 核心内容（4-4.5分钟）
-   - 2-3个核心要点
-   - 每个要点要精炼有力
-   - 包含具体例子或案例
-   - 提供实用建议
-
-2. 总结（30秒-1分钟）
-   - 快速总结核心观点
-   - 简短的行动建议
-
-重要要求：
-- 不要包含任何节目介绍、欢迎词、自我介绍
-- 不要创建节目名称或播客信息
-- 直接进入主题内容
-- 内容要高度浓缩，去除冗余信息
-- 语言要简洁有力，节奏要快
-- 总字数控制在800-1000字左右
-
-直接从主题内容开始，无需任何开场白。"""),
-            ("human", "主题描述：{content}")
-        ])
-        
-        response = await self.content_generator_llm.ainvoke(
-            prompt.format_messages(content=state["content"])
-        )
+        response = await self._ainvoke("content_generator", self._detailed_content_messages(state))
         
         return {
             **state,
@@ -243,88 +527,32 @@ class PodcastScriptGenerator:
             "messages": add_messages(state.get("messages", []), [response])
         }
     
+    def _detailed_content_messages(self, state: PodcastState) -> List[Any]:
+        """构建详细内容生成的提示词"""
+        content = long_input.fit_budget(
+            state.get("condensed_content") or state["content"],
+            settings.content_generator_input_tokens,
+            "generate_detailed_content"
+        )
+        return prompts.DETAILED_CONTENT.format_messages(
+            content_type=state.get("content_type") or "通用",
+            voice_instruction=prompts.voice_instruction(state["voices"]),
+            content=content
+        )
+    
     async def _generate_podcast_script(self, state: PodcastState) -> PodcastState:
         """使用专门的脚本生成LLM生成播客脚本"""
-        voices_count = len(state["voices"])
-        source_content = state.get("detailed_content") or state["content"]
-        
-        # 根据voices数量动态调整脚本格式和要求
-        if voices_count <= 1:
-            voice_name = state["voices"][0] if state["voices"] else "朗读者"
-            script_format = f"""
-脚本格式（单人朗读，5分钟）：
-直接输出朗读文本，无需标注发言人。
-
-示例：
-人工智能正在改变我们的工作方式。最明显的变化是自动化程度的提升...
-
-这种变化带来三个关键影响。第一，重复性工作将被替代...
-
-总结一下，面对AI时代，我们需要做好三件事...
-
-要求：
-- 直接从主题内容开始
-- 不要任何开场白、问候语、自我介绍
-- 不要创建节目名称
-- 语言简洁有力，避免废话
-- 总字数800-1000字"""
-            
-        else:
-            voices_list = state["voices"]
-            script_format = f"""
-脚本格式（多人对话，5分钟）：
-发言人：说话内容
-
-示例：
-{voices_list[0]}：人工智能对教育的影响主要体现在三个方面...
-{voices_list[1] if len(voices_list) > 1 else "嘉宾"}：我觉得最重要的是个性化学习...
-{voices_list[0]}：你能具体说说吗？
-{voices_list[1] if len(voices_list) > 1 else "嘉宾"}：比如AI可以根据学生的学习进度...
-
-要求：
-- 严格使用提供的人名：{voices_list}
-- 直接开始讨论主题，无需介绍环节
-- 不要任何开场白、问候语
-- 对话要快节奏，避免冗长
-- 总字数800-1000字"""
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""你是一个专业的脚本编写师。请将给定的内容大纲转换为5分钟的纯文本朗读脚本。
-
-{script_format}
-
-脚本编写要求：
-
-1. 内容要求
-   - 直接从主题内容开始，无任何开场
-   - 不要包含：欢迎词、问候语、自我介绍、节目介绍
-   - 不要创建：节目名称、播客信息、主持人介绍
-   - 每句话都要有价值，去除冗余
-   - 重点突出，逻辑清晰
-
-2. 格式要求
-   - 输出纯文本格式，不使用markdown语法
-   - 不要使用加粗、斜体等格式
-   - 单人：直接输出朗读文本
-   - 多人：严格按照"发言人：说话内容"格式
-   - 发言人姓名必须与voices列表完全一致
-
-3. 时长控制
-   - 严格控制在5分钟内（800-1000字）
-   - 按正常语速150-200字/分钟计算
-
-4. 语言要求
-   - 使用口语化表达，适合朗读
-   - 语言简洁有力，节奏明快
-   - 避免书面语和复杂句式
-
-请生成完整的朗读脚本，直接从主题内容开始。"""),
-            ("human", "参与者：{voices}\n\n请根据以下内容生成脚本：\n\n{content}")
-        ])
-        
+        source_content = long_input.fit_budget(
+            state.get("detailed_content") or state.get("condensed_content") or state["content"],
+            settings.script_generator_input_tokens,
+            "generate_script"
+        )
+        # 单人与多人使用各自的静态系统提示词
+        prompt = prompts.SCRIPT_DIALOGUE if len(state["voices"]) > 1 else prompts.SCRIPT_SINGLE
         voices_str = "、".join(state["voices"]) if state["voices"] else "单人朗读"
         
-        response = await self.script_generator_llm.ainvoke(
+        response = await self._ainvoke(
+            "script_generator",
             prompt.format_messages(voices=voices_str, content=source_content)
         )
         
@@ -334,36 +562,93 @@ class PodcastScriptGenerator:
             "messages": add_messages(state.get("messages", []), [response])
         }
     
+    async def _detect_script_language(self, state: PodcastState) -> PodcastState:
+        """本地识别脚本语言，与目标语言一致且置信度足够时直接作为最终脚本"""
+        detected, confidence = detect_language(state["script"])
+        target = normalize_language(state.get("target_language"))
+        matched = (
+            target is not None
+            and detected == target
+            and confidence >= settings.language_skip_confidence
+        )
+        language_check_total.inc(outcome="skipped" if matched else "translated")
+        
+        return {
+            **state,
+            "detected_language": detected,
+            "language_confidence": confidence,
+            "final_script": state["script"] if matched else None
+        }
+    
+    def _should_translate(self, state: PodcastState) -> str:
+        """决定是否需要调用翻译LLM，以及整篇翻译还是分段并行翻译"""
+        if state.get("final_script") is not None:
+            return "skip_translation"
+        mode = settings.translation_mode
+        # 超出翻译阶段输入上限的脚本只能分段翻译
+        too_long = not long_input.within(state["script"], settings.translator_input_tokens)
+        if too_long or mode == "parallel" or (
+            mode == "auto" and len(state["script"]) >= settings.translation_parallel_min_chars
+        ):
+            chunks, _ = split_script(state["script"], settings.translation_chunk_chars)
+            if len(chunks) > 1:
+                return "translate_chunks"
+        return "translate"
+    
+    async def _translate_in_chunks(self, state: PodcastState, writer: StreamWriter) -> PodcastState:
+        """
+        将脚本按发言轮次分块并发翻译，按原顺序拼接。
+        每当开头的若干块都已完成，就通过custom流按顺序输出，保证客户端看到的文本顺序不变。
+        """
+        target_language = state.get("target_language", "中文")
+        script = state["script"]
+        chunks, separator = split_script(script, settings.translation_chunk_chars)
+        glossary = "、".join(speaker_names(script, state["voices"])) or "无"
+        
+        prompt = prompts.TRANSLATE_CHUNK
+        semaphore = asyncio.Semaphore(settings.translation_concurrency)
+        
+        async def translate(index: int, chunk: str):
+            async with semaphore:
+                return await self._ainvoke(
+                    "translator",
+                    prompt.format_messages(
+                        target_language=target_language,
+                        glossary=glossary,
+                        index=index + 1,
+                        total=len(chunks),
+                        chunk=chunk
+                    )
+                )
+        
+        tasks = [asyncio.create_task(translate(i, chunk)) for i, chunk in enumerate(chunks)]
+        responses = []
+        try:
+            for i, task in enumerate(tasks):
+                response = await task
+                responses.append(response)
+                text = response.content.strip()
+                writer({"text": text + (separator if i < len(tasks) - 1 else "")})
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        return {
+            **state,
+            "final_script": separator.join(r.content.strip() for r in responses),
+            "messages": add_messages(state.get("messages", []), responses)
+        }
+    
     async def _check_and_translate_language(self, state: PodcastState) -> PodcastState:
         """使用专门的翻译LLM检查并翻译语言"""
         target_language = state.get("target_language", "中文")
-        script = state["script"]
+        script = long_input.fit_budget(state["script"], settings.translator_input_tokens, "check_language")
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""你是一个专业的语言检测和翻译专家。请执行以下任务：
-
-1. 语言检测：检测给定脚本的主要语言
-2. 语言匹配：判断是否与目标语言"{target_language}"一致
-3. 翻译处理：如果不一致，请进行专业翻译
-
-翻译要求（如需要）：
-- 保持脚本的格式：
-  * 单人脚本：保持纯文本格式
-  * 多人脚本：保持"发言人：内容"格式
-- 保持发言人姓名不变
-- 确保翻译后的内容自然流畅，适合朗读
-- 保持5分钟的时长要求（800-1000字）
-- 使用目标语言的自然表达方式
-- 输出纯文本格式，不使用任何markdown语法
-
-如果语言一致，请直接返回原脚本。
-如果需要翻译，请返回翻译后的完整脚本。
-
-请只返回最终的脚本内容，不要添加任何解释或说明。"""),
-            ("human", "目标语言：{target_language}\n\n脚本：\n{script}")
-        ])
-        response = await self.translator_llm.ainvoke(
-            prompt.format_messages(target_language=target_language, script=script)
+        prompt = prompts.TRANSLATE
+        response = await self._ainvoke(
+            "translator",
+            prompt.format_messages(target_language=target_language, script=script),
+            streamed=True
         )
         
         return {
@@ -372,6 +657,110 @@ class PodcastScriptGenerator:
             "messages": add_messages(state.get("messages", []), [response])
         }
 
+# 进程内的生成器注册表：按各阶段LLMConfig的有效取值复用已编译的图与LLM实例
+_generators: Dict[Tuple, PodcastScriptGenerator] = {}
+
+
+def get_generator(
+    analyzer_llm_config: LLMConfig = None,
+    content_generator_llm_config: LLMConfig = None,
+    script_generator_llm_config: LLMConfig = None,
+    translator_llm_config: LLMConfig = None
+) -> PodcastScriptGenerator:
+    """
+    获取（必要时创建）对应配置的PodcastScriptGenerator。
+    未指定配置的阶段使用 ``LLM_STAGE_TIERS`` 中的档位，并按 ``LLM_SHORT_INPUT_TIERS`` 对短输入改用其他档位
+    """
+    given = {
+        "analyzer": analyzer_llm_config,
+        "content_generator": content_generator_llm_config,
+        "script_generator": script_generator_llm_config,
+        "translator": translator_llm_config
+    }
+    configs = [config or stage_llm_config(role) for role, config in given.items()]
+    short_input_configs = {
+        role: (int(rule["max_input_tokens"]), stage_llm_config(role, rule["tier"]))
+        for role, rule in settings.llm_short_input_tiers.items()
+        if role in given and given[role] is None
+    }
+    key = (
+        tuple(config.key() for config in configs),
+        tuple((role, limit, config.key()) for role, (limit, config) in sorted(short_input_configs.items()))
+    )
+    generator = _generators.get(key)
+    if generator is None:
+        generator = PodcastScriptGenerator(*configs, short_input_configs=short_input_configs)
+        _generators[key] = generator
+    return generator
+
+
+def _generator_pools(generator: PodcastScriptGenerator) -> List[EndpointPool]:
+    return [*generator.pools.values(), *(pool for _, pool in generator.short_input_pools.values())]
+
+
+def routing_states() -> List[Dict[str, Any]]:
+    """各生成器endpoint池的路由统计"""
+    return [
+        pool.state()
+        for generator in _generators.values()
+        for pool in _generator_pools(generator)
+    ]
+
+
+async def warmup_generators() -> None:
+    """启动时构建默认生成器并预热其连接池"""
+    generator = get_generator()
+    if settings.llm_warmup:
+        await http_pool.warmup(sorted({
+            endpoint.base_url
+            for pool in _generator_pools(generator)
+            for endpoint in pool.endpoints
+            if endpoint.base_url
+        }))
+
+
+async def close_generators() -> None:
+    """关闭时释放生成器与共享连接池"""
+    _generators.clear()
+    await http_pool.aclose_all()
+
+
+# 整篇翻译时由翻译节点产出最终文本，其token会被直接转发给客户端
+TRANSLATE_NODE = "check_language"
+# 不需要翻译时最终文本就是脚本生成节点的输出：开头的token已是目标语言时逐token转发，
+# 否则先缓存，语言识别确认跳过翻译后立即转发
+SCRIPT_NODE = "generate_script"
+DETECT_NODE = "detect_language"
+
+
+def _probably_target_language(text: str, target: Optional[str]) -> bool:
+    """用已生成的脚本开头预判是否会跳过翻译（与语言识别节点的判断条件相同）"""
+    if target is None:
+        return False
+    detected, confidence = detect_language(text)
+    return detected == target and confidence >= settings.language_skip_confidence
+
+
+def _paragraph_events(text: str) -> List[Dict[str, Any]]:
+    """没有逐token输出时，按段落切分最终脚本"""
+    return [
+        {"event": "text", "text": paragraph.strip() + "\n\n"}
+        for paragraph in text.split("\n\n")
+        if paragraph.strip()
+    ]
+
+
+def _stage_event(task: Dict[str, Any]) -> Dict[str, Any]:
+    """将LangGraph的tasks流事件转换为阶段进度事件"""
+    if "input" in task:
+        status = "start"
+    elif task.get("error"):
+        status = "error"
+    else:
+        status = "end"
+    return {"event": "stage", "stage": task["name"], "status": status}
+
+
 async def generate_text_stream(
     content: str, 
     contentType: str = None, 
@@ -381,15 +770,39 @@ async def generate_text_stream(
     content_generator_llm_config: LLMConfig = None,
     script_generator_llm_config: LLMConfig = None,
     translator_llm_config: LLMConfig = None,
-    db: AsyncSession = None
-) -> AsyncGenerator[str, None]:
+    persist: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[float] = None,
+    reuse: Optional[Dict[str, Any]] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
     """
     生成文本流的异步生成器函数
     
+    0. content超过长输入阈值时，先分块并发提炼要点再合并，之后的阶段使用浓缩后的内容
     1. 根据content判断，此内容是精确的内容，还是一个大概性的描述，如果是大概性的描述，则需要根据contentType和voices生成一个详细的内容内容
     2. 如果content是精确的内容，则调用llm生成一个播客脚本
     3. 检测脚本与目标语言是否一致，如果不一致，则需要翻译成目标语言
     4. 返回脚本
+
+    产出的每一项都是一个事件字典，``event`` 字段表示事件类型：
+    - ``stage``：图节点的开始/结束，如 ``{"stage": "analyze_content", "status": "start"}``
+    - ``text``：最终脚本的文本片段：需要翻译时为翻译节点的token，跳过翻译时为脚本生成节点的token
+      （脚本开头已是目标语言时边生成边转发，否则在语言识别确认跳过后、``detect_language`` 结束事件之前转发）
+    - ``reset``：已转发的脚本开头预判为目标语言、但整篇识别后仍需翻译，客户端应丢弃之前收到的文本
+    - ``warning`` / ``error``：提示与错误信息，``text`` 字段为可展示的文本
+    - ``saved``：脚本已保存到数据库，``podcast_id`` 为记录ID
+    - ``cache``：生成缓存查询结果，``status`` 为 hit/partial/miss/bypass
+    - ``speculation``：投机执行的结果与浪费的token、节省的时间
+    - ``condense``：长输入浓缩的块数、reduce轮数与浓缩前后的token数
+    - ``reuse``：复用了近似重复记录的脚本，``podcast_id`` 为被复用的记录，``mode`` 为复用方式
+
+    ``persist=True`` 时通过批量写入队列保存最终脚本，流程本身不占用数据库连接。
+    ``use_cache=False`` 时不读取缓存（仍会用新结果刷新缓存）。
+    ``deadline`` 为整体截止时间（秒，从调用时算起），各阶段的LLM调用与重试在其中按权重分配时间；
+    超过截止时间或LLM服务全部熔断时产出带 ``reason`` 的 ``error`` 事件。
+    ``reuse`` 为近似重复的已保存脚本（见 ``podcast_service.find_similar_script``）：
+    ``mode=script`` 时从语言检查开始（语言一致时不调用LLM），``mode=outline`` 时把它作为精确内容重新编写脚本；
+    复用时不读写生成缓存，结果与被复用的脚本完全相同时不另存新记录。
     """
     
     # 检查依赖是否已安装
@@ -397,23 +810,22 @@ async def generate_text_stream(
         # 依赖未安装，使用简单实现
         chunks = content.split()
         for chunk in chunks:
-            yield chunk + " "
-        yield "\n依赖未安装，请安装所需依赖: pip install langchain-core langchain-openai langgraph"
+            yield {"event": "text", "text": chunk + " "}
+        yield {"event": "error", "text": "\n依赖未安装，请安装所需依赖: pip install langchain-core langchain-openai langgraph"}
         return
     
-    # 默认LLM配置
-    default_config = LLMConfig("gpt-4", temperature=0.7)
-    
-    generator = PodcastScriptGenerator(
-        analyzer_llm_config or default_config,
-        content_generator_llm_config or default_config,
-        script_generator_llm_config or default_config,
-        translator_llm_config or default_config
+    # 截止时间保存在上下文变量中，随图的执行传递到各节点
+    resilience.start_deadline(deadline)
+    generator = get_generator(
+        analyzer_llm_config,
+        content_generator_llm_config,
+        script_generator_llm_config,
+        translator_llm_config
     )
     
     # 验证voices数量
     if len(voices) > 5:
-        yield f"警告：声音数量超过5个限制，已自动截取前5个。\n"
+        yield {"event": "warning", "text": f"警告：声音数量超过5个限制，已自动截取前5个。\n"}
         voices = voices[:5]
     
     # 初始化状态
@@ -421,54 +833,177 @@ async def generate_text_stream(
         content=content,
         content_type=contentType,
         voices=voices,
+        # 长文本计数较慢，放到线程中执行
+        content_tokens=await asyncio.to_thread(long_input.content_tokens, content),
         target_language=target_language,
         messages=[]
     )
     
+    if reuse is not None:
+        if reuse["mode"] == "script":
+            initial_state["script"] = reuse["script"]
+        else:
+            initial_state.update(is_precise=True, detailed_content=reuse["script"])
+        yield {
+            "event": "reuse",
+            "podcast_id": reuse["podcast_id"],
+            "similarity": round(reuse["similarity"], 3),
+            "mode": reuse["mode"]
+        }
+    
+    # 查询各阶段缓存，命中的输出直接填入初始状态
+    cache_keys = generator.stage_cache_keys(content, contentType, voices, target_language)
+    cached = {}
+    if use_cache and reuse is None:
+        found = await generation_cache.get_many(cache_keys.values())
+        for stage, key in cache_keys.items():
+            if key in found:
+                cached[stage] = found[key]
+                initial_state.update(found[key])
+        if "final_script" in cached:
+            cache_status = "hit"
+        elif cached:
+            cache_status = "partial"
+        else:
+            cache_status = "miss"
+    else:
+        cache_status = "bypass"
+    generation_cache_total.inc(result=cache_status)
+    yield {"event": "cache", "status": cache_status, "stages": sorted(cached)}
+    
+    started = time.monotonic()
+    # 任务ID -> 开始时间，用于统计各节点耗时
+    task_started: Dict[str, float] = {}
     try:
-        # 执行图工作流
-        result = await generator.graph.ainvoke(initial_state)
+        if cache_status == "hit":
+            result = initial_state
+            streamed = False
+        else:
+            # 执行图工作流，边执行边转发阶段进度和最终文本的token
+            result = None
+            streamed = False
+            # 脚本生成节点的token；开头达到language_probe_chars字时预判是否需要翻译，
+            # 预判不需要时逐token转发（script_live），否则缓存到语言识别的结果
+            script_chunks: List[str] = []
+            script_chars = 0
+            script_live = False
+            target = normalize_language(target_language)
+            async for mode, chunk in generator.graph.astream(
+                initial_state, stream_mode=["tasks", "messages", "custom", "values"]
+            ):
+                if mode == "tasks":
+                    stage = _stage_event(chunk)
+                    if stage["status"] == "start":
+                        task_started[chunk["id"]] = time.monotonic()
+                    elif chunk["id"] in task_started:
+                        node_duration_seconds.observe(
+                            time.monotonic() - task_started.pop(chunk["id"]),
+                            node=chunk["name"],
+                            outcome="ok" if stage["status"] == "end" else "error"
+                        )
+                    if chunk["name"] == DETECT_NODE and stage["status"] == "end":
+                        # 跳过翻译时脚本即最终文本，在阶段结束事件之前立即转发
+                        skipped = (chunk.get("result") or {}).get("final_script")
+                        script = "".join(script_chunks)
+                        if script_live and skipped != script:
+                            # 预判有误（整篇识别后仍需翻译）或转发的token与脚本不一致
+                            yield {"event": "reset"}
+                            streamed = False
+                        if skipped is not None and not streamed:
+                            streamed = True
+                            if script == skipped:
+                                for text in script_chunks:
+                                    yield {"event": "text", "text": text}
+                            else:
+                                # 脚本来自缓存或复用、模型不支持流式或重试过
+                                for event in _paragraph_events(skipped):
+                                    yield event
+                        script_chunks = []
+                        script_chars = 0
+                        script_live = False
+                    yield stage
+                elif mode == "custom":
+                    # 节点主动输出的内容：分段并行翻译的已完成片段，或投机执行统计等事件
+                    if "event" in chunk:
+                        yield chunk
+                    elif chunk.get("text"):
+                        streamed = True
+                        yield {"event": "text", "text": chunk["text"]}
+                elif mode == "messages":
+                    message, metadata = chunk
+                    node = metadata.get("langgraph_node")
+                    if node == TRANSLATE_NODE and message.content:
+                        streamed = True
+                        yield {"event": "text", "text": message.content}
+                    elif node == SCRIPT_NODE and message.content:
+                        script_chunks.append(message.content)
+                        if script_live:
+                            yield {"event": "text", "text": message.content}
+                            continue
+                        previous, script_chars = script_chars, script_chars + len(message.content)
+                        # 只在首次达到预判字数时识别一次
+                        if previous < settings.language_probe_chars <= script_chars and \
+                                _probably_target_language("".join(script_chunks), target):
+                            script_live = streamed = True
+                            for text in script_chunks:
+                                yield {"event": "text", "text": text}
+                elif mode == "values":
+                    result = chunk
         
-        # 流式返回最终脚本
         final_script = result["final_script"]
         
-        # 将脚本分段流式返回，无需延迟
-        paragraphs = final_script.split('\n\n')
+        # 未逐token输出（如整篇命中缓存或翻译模型不支持流式）时，按段落一次性返回
+        if not streamed:
+            for event in _paragraph_events(final_script):
+                yield event
         
-        # 如果提供了数据库会话，保存脚本到数据库
-        if db:
-            from app.models.podcast import Podcast
-            
-            # 提取脚本摘要（使用前100个字符）
-            summary = content[:100] + "..." if len(content) > 100 else content
-            
-            # 处理voice_ids格式
-            voice_ids_str = ','.join(voices) if voices else ""
-            
-
-
-            
-            # 创建新的播客记录
-            new_podcast = Podcast(
-                content=summary,
-                voice_ids=voice_ids_str,
-                transcript=final_script,
-                content_type=contentType,
-                title=summary
-            )
+        # 回写本次新产生的阶段输出（复用的脚本不属于本次内容，不写入缓存）
+        stage_outputs = {} if reuse is not None else {
+            "condense_content": {"condensed_content": result.get("condensed_content")},
+            "analyze_content": {"is_precise": result.get("is_precise")},
+            "generate_detailed_content": {"detailed_content": result.get("detailed_content")},
+            "generate_script": {"script": result.get("script")},
+            "final_script": {"final_script": final_script}
+        }
+        generation_cache.set_many([
+            (cache_keys[stage], stage, value)
+            for stage, value in stage_outputs.items()
+            if stage not in cached and all(v is not None for v in value.values())
+        ])
+        
+        # 交给批量写入队列保存，写入后拿到记录ID
+        if persist and reuse is not None and reuse["unchanged"] and final_script == reuse["script"]:
+            # 原样复用已保存的脚本，不重复保存
+            yield {"event": "saved", "podcast_id": reuse["podcast_id"]}
+        elif persist:
+            summary = content_summary(content)
             
-            # 保存到数据库
-            db.add(new_podcast)
-            await db.commit()
-            await db.refresh(new_podcast)
+            podcast_id = await podcast_writer.insert({
+                "content": summary,
+                "voice_ids": ','.join(voices) if voices else "",
+                "transcript": final_script,
+                "content_type": contentType,
+                "title": summary,
+                # 摘要只有前100字，另存完整输入的签名供近似重复检测
+                "content_signature": await content_signature(content)
+            })
             
-            # 返回保存成功的消息
-            yield f"播客脚本已保存，ID: {new_podcast.id}\n\n"
-        
-        # 返回脚本内容
-        for paragraph in paragraphs:
-            if paragraph.strip():
-                yield paragraph.strip() + "\n\n"
+            # 返回保存成功的事件
+            yield {"event": "saved", "podcast_id": podcast_id}
         
+        generation_duration_seconds.observe(time.monotonic() - started, cache=cache_status)
+    except limiter.RateLimitExceeded as e:
+        yield {"event": "error", "text": f"\n{str(e)}，请稍后重试\n", "retry_after": round(e.retry_after)}
+    except resilience.LLMTimeout as e:
+        yield {"event": "error", "text": f"\n{str(e)}\n", "reason": "timeout"}
+    except resilience.DeadlineExceeded as e:
+        yield {"event": "error", "text": f"\n{str(e)}\n", "reason": "deadline"}
+    except resilience.CircuitOpenError as e:
+        yield {
+            "event": "error",
+            "text": f"\n{str(e)}，请稍后重试\n",
+            "reason": "circuit_open",
+            "retry_after": max(1, round(e.retry_after))
+        }
     except Exception as e:
-        yield f"\n生成过程中出现错误: {str(e)}\n"
\ No newline at end of file
+        yield {"event": "error", "text": f"\n生成过程中出现错误: {str(e)}\n"}
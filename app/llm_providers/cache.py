@@ -0,0 +1,171 @@
+"""
+内容寻址的生成结果缓存。
+
+键为生成输入（内容、类型、声音、语言、各阶段模型与温度、提示词版本）的稳定哈希，
+值为对应阶段的输出字典。两级存储：
+
+- 内存层：有容量上限的LRU，带TTL；
+- 持久层：数据库 ``generation_cache`` 表，进程重启后仍可命中。
+
+一次生成的各阶段键用一条 ``IN (...)`` 查询批量读取；新结果先写入内存层，
+持久层在后台用一个事务批量写入，不占用响应时间。写入时每隔 ``GENERATION_CACHE_PURGE_INTERVAL``
+秒顺带删除过期的记录。持久层读写失败只打印警告，不影响生成流程。
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+
+def cache_key(*parts: Any) -> str:
+    """对输入做稳定哈希，parts需可JSON序列化"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """带TTL的有界LRU"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class GenerationCache:
+    """内存LRU + 数据库持久层的两级缓存"""
+
+    def __init__(self, maxsize: int, ttl: float, persist: bool = True, purge_interval: float = 3600):
+        self.memory = LRUCache(maxsize, ttl)
+        self.ttl = ttl
+        self.persist = persist
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+        # 进行中的后台写入，关闭时等待完成
+        self._writes: Set[asyncio.Task] = set()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取，返回命中的 键 -> 值；内存层未命中的键用一次数据库查询读取"""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        if missing and self.persist:
+            loaded = await self._load(missing)
+            for key, value in loaded.items():
+                self.memory.set(key, value)
+            found.update(loaded)
+        return found
+
+    async def set(self, key: str, stage: str, value: Dict[str, Any]) -> None:
+        self.set_many([(key, stage, value)])
+
+    def set_many(self, entries: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """写入内存层，持久层在后台用一个事务写入"""
+        for key, _, value in entries:
+            self.memory.set(key, value)
+        if self.persist and entries:
+            task = asyncio.create_task(self._store(entries))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def aclose(self) -> None:
+        """等待进行中的后台写入完成"""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _load(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        from sqlalchemy import select
+
+        from app.db.database import AsyncSessionLocal
+        from app.models.generation_cache import GenerationCacheEntry
+
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(GenerationCacheEntry.cache_key, GenerationCacheEntry.payload)
+                    .where(GenerationCacheEntry.cache_key.in_(keys))
+                    .where(GenerationCacheEntry.expires_at >= datetime.now())
+                )
+                return {key: json.loads(payload) for key, payload in result.all()}
+        except Exception as e:
+            print(f"警告：读取生成缓存失败: {e}")
+            return {}
+
+    async def _store(self, entries: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        from sqlalchemy import delete
+
+        from app.db.database import AsyncSessionLocal
+        from app.models.generation_cache import GenerationCacheEntry
+
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        purge = time.monotonic() - self._last_purge >= self.purge_interval
+        if purge:
+            self._last_purge = time.monotonic()
+        try:
+            async with AsyncSessionLocal() as session:
+                # 先删除再插入，同一事务内完成覆盖写
+                await session.execute(
+                    delete(GenerationCacheEntry)
+                    .where(GenerationCacheEntry.cache_key.in_([key for key, _, _ in entries]))
+                )
+                session.add_all([
+                    GenerationCacheEntry(
+                        cache_key=key,
+                        stage=stage,
+                        payload=json.dumps(value, ensure_ascii=False),
+                        expires_at=expires_at
+                    )
+                    for key, stage, value in entries
+                ])
+                if purge:
+                    await session.execute(
+                        delete(GenerationCacheEntry).where(GenerationCacheEntry.expires_at < now)
+                    )
+                await session.commit()
+        except Exception as e:
+            print(f"警告：写入生成缓存失败: {e}")
+
+
+generation_cache = GenerationCache(
+    maxsize=settings.generation_cache_size,
+    ttl=settings.generation_cache_ttl,
+    persist=settings.generation_cache_persist,
+    purge_interval=settings.generation_cache_purge_interval,
+)
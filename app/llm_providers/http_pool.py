@@ -0,0 +1,64 @@
+"""
+LLM服务商共享的HTTP连接池。
+
+每个服务商endpoint（base_url）在进程内只维护一个 ``httpx.AsyncClient``，
+所有请求、所有 ``ChatOpenAI`` 实例复用其keep-alive连接（可用时启用HTTP/2），
+避免每次请求重新握手TLS。
+"""
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _pool_key(base_url: Optional[str]) -> str:
+    return (base_url or "default").rstrip("/")
+
+
+def get_async_client(base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """获取（必要时创建）指定endpoint的共享AsyncClient"""
+    key = _pool_key(base_url)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=settings.llm_http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.llm_read_timeout, connect=settings.llm_connect_timeout
+            ),
+        )
+        _clients[key] = client
+    return client
+
+
+async def warmup(base_urls: Iterable[Optional[str]]) -> None:
+    """预先建立到各endpoint的连接，失败不影响启动"""
+    for base_url in base_urls:
+        if not base_url:
+            continue
+        client = get_async_client(base_url)
+        try:
+            await client.get(f"{base_url.rstrip('/')}/models", timeout=5.0)
+        except httpx.HTTPError as e:
+            print(f"警告：预热LLM连接失败 {base_url}: {e}")
+
+
+async def aclose_all() -> None:
+    """关闭所有共享连接池"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
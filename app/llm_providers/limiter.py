@@ -0,0 +1,213 @@
+"""
+LLM调用的准入控制与限流。
+
+每个 (服务商endpoint, 模型) 一个 ``ProviderLimiter``：
+- 并发上限限制同时进行的调用数；
+- 每分钟请求数（RPM）与每分钟token数（TPM）两个令牌桶；
+- 超出的调用在公平（FIFO）队列中等待，排队数与等待时间均有上限，
+  超限时抛出 ``RateLimitExceeded``，附带建议的重试间隔。
+
+token数在调用前按提示词长度估算，调用后用实际用量校正。
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+rate_limited_total = metrics.counter(
+    "podcast_llm_rate_limited_total",
+    "被限流器拒绝的LLM调用数，reason为queue_full/timeout",
+    ["provider", "model", "reason"]
+)
+
+
+class RateLimitExceeded(Exception):
+    """限流器排队已满或等待超时"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """按速率匀速补充的令牌桶，允许短时透支以便用实际用量校正"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """距离可取出amount个令牌还需等待的秒数"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """粗略估算提示词token数：中文约1字1token，其他约4字符1token"""
+    total = 0
+    for message in messages:
+        text = getattr(message, "content", message)
+        if not isinstance(text, str):
+            text = str(text)
+        cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+        total += cjk + (len(text) - cjk) // 4
+    return total
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        max_concurrency: int,
+        rpm: float,
+        tpm: float,
+        max_queue: int,
+        max_wait: float
+    ):
+        self.provider = provider
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiting = 0
+        self.active = 0
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+        self.admitted = 0
+        # 并发名额释放时唤醒排队者；asyncio.Lock按FIFO唤醒等待者，保证排队公平
+        self._released = asyncio.Condition()
+        self._turnstile = asyncio.Lock()
+
+    def saturated(self) -> bool:
+        """排队已满，新的调用会被立即拒绝"""
+        return self.waiting >= self.max_queue
+
+    def retry_after(self) -> float:
+        """建议客户端的重试间隔（秒）"""
+        average_wait = self.total_wait / self.admitted if self.admitted else 1.0
+        return max(1.0, min(self.max_wait, average_wait * (self.waiting + 1) / self.max_concurrency))
+
+    def _delay(self, estimated_tokens: int) -> float:
+        return max(self.requests.delay(1), self.tokens.delay(estimated_tokens))
+
+    def _take(self, estimated_tokens: int) -> None:
+        self.active += 1
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+
+    async def _admit(self, estimated_tokens: int) -> None:
+        async with self._turnstile:
+            while True:
+                async with self._released:
+                    while self.active >= self.max_concurrency:
+                        await self._released.wait()
+                delay = self._delay(estimated_tokens)
+                if delay <= 0:
+                    self._take(estimated_tokens)
+                    return
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator["ProviderLimiter"]:
+        """获取一次调用的许可，退出时释放并发名额"""
+        start = time.monotonic()
+        if not self._turnstile.locked() and self.active < self.max_concurrency and self._delay(estimated_tokens) <= 0:
+            # 无人排队且有余量时直接放行
+            self._take(estimated_tokens)
+        else:
+            if self.saturated():
+                rate_limited_total.inc(provider=self.provider, model=self.model, reason="queue_full")
+                raise RateLimitExceeded("LLM调用排队已满", self.retry_after())
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._admit(estimated_tokens), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                rate_limited_total.inc(provider=self.provider, model=self.model, reason="timeout")
+                raise RateLimitExceeded("LLM调用排队超时", self.retry_after())
+            finally:
+                self.waiting -= 1
+        self.last_wait = time.monotonic() - start
+        self.total_wait += self.last_wait
+        self.admitted += 1
+        try:
+            yield self
+        finally:
+            async with self._released:
+                self.active -= 1
+                self._released.notify()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """用实际token用量校正预估值"""
+        if actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "last_wait_seconds": round(self.last_wait, 3),
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+            "admitted": self.admitted,
+            "rpm_available": math.floor(self.requests.tokens),
+            "tpm_available": math.floor(self.tokens.tokens)
+        }
+
+
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+
+
+def get_limiter(base_url: Optional[str], model: str) -> ProviderLimiter:
+    """获取（必要时创建）endpoint与模型对应的限流器"""
+    provider = (base_url or "default").rstrip("/")
+    key = (provider, model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        # LLM_RATE_LIMITS 可按模型名覆盖默认值，如 {"qwen-plus": {"rpm": 1200}}
+        overrides = settings.llm_rate_limits.get(model, {})
+        limiter = _limiters[key] = ProviderLimiter(
+            provider,
+            model,
+            max_concurrency=int(overrides.get("max_concurrency", settings.llm_max_concurrency)),
+            rpm=overrides.get("rpm", settings.llm_rpm),
+            tpm=overrides.get("tpm", settings.llm_tpm),
+            max_queue=int(overrides.get("max_queue", settings.llm_max_queue)),
+            max_wait=overrides.get("max_wait", settings.llm_max_queue_wait)
+        )
+    return limiter
+
+
+def check_admission() -> None:
+    """任一限流器排队已满时拒绝新的生成请求，避免请求进入后才排队失败"""
+    for limiter in _limiters.values():
+        if limiter.saturated():
+            rate_limited_total.inc(provider=limiter.provider, model=limiter.model, reason="queue_full")
+            raise RateLimitExceeded("LLM服务繁忙，请稍后重试", limiter.retry_after())
+
+
+def limiter_states() -> List[Dict[str, Any]]:
+    return [limiter.state() for limiter in _limiters.values()]
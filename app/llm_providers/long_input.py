@@ -0,0 +1,236 @@
+"""
+长输入的处理：按token切分、抽样、截断，以及分块摘要再合并（map-reduce）。
+
+用户粘贴的长文（如5万字的文章）不再原样进入每个阶段：
+- 内容分析阶段只看开头、中间、结尾的抽样片段；
+- 超过 ``long_input_threshold_tokens`` 时先把内容按段落/句子切成不超过 ``long_input_chunk_tokens`` 的块，
+  以有限的并发分别提炼要点（map），要点总长仍超出 ``long_input_summary_tokens`` 时
+  分组合并、逐轮缩减（reduce），之后的阶段使用浓缩后的内容；
+- 每个阶段的输入另有token上限，超出时截断，避免超出模型上下文。
+
+token数优先用tiktoken（``TOKENIZER_ENCODING``，编码文件不可用时自动退回估算）计算，
+否则按中文约1字1token、其他约4字符1token估算。
+"""
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.llm_providers import prompts
+from app.llm_providers.limiter import estimate_tokens
+
+truncated_inputs_total = metrics.counter(
+    "podcast_llm_truncated_inputs_total",
+    "因超出阶段输入token上限而被截断的输入数",
+    ["stage"]
+)
+condense_chunks = metrics.histogram(
+    "podcast_long_input_chunks",
+    "长输入浓缩时切分的块数",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+# 段落内的句子边界
+_SENTENCE_END = re.compile(r"(?<=[。！？；!?;\n])|(?<=\. )")
+# 抽样与截断处的省略标记
+ELLIPSIS = "\n……\n"
+# reduce的最大轮数，之后仍超出时截断
+MAX_REDUCE_ROUNDS = 3
+
+_encoding: Any = None
+_encoding_loaded = False
+
+
+def _tokenizer() -> Any:
+    """按需加载tiktoken编码，未安装或编码文件不可用时返回None"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if settings.tokenizer_encoding:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(settings.tokenizer_encoding)
+            except Exception as e:
+                print(f"警告：加载tiktoken编码{settings.tokenizer_encoding}失败，改用估算的token数: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _tokenizer()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens([text])
+
+
+def within(text: str, max_tokens: int) -> bool:
+    """token数是否不超过上限。UTF-8字节数是token数的上界，短文本不必实际计算"""
+    return len(text.encode("utf-8")) <= max_tokens or count_tokens(text) <= max_tokens
+
+
+def is_long(content_tokens: Optional[int]) -> bool:
+    return content_tokens is not None and content_tokens > settings.long_input_threshold_tokens
+
+
+def content_tokens(content: str) -> int:
+    """
+    输入内容的token数，只用于判断是否为长输入：
+    字节数不超过阈值的短输入直接返回字节数（token数的上界），不必实际计算。
+    """
+    size = len(content.encode("utf-8"))
+    if size <= settings.long_input_threshold_tokens:
+        return size
+    return count_tokens(content)
+
+
+def _segments(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """
+    切成不超过max_tokens的片段（含其后的分隔符）：先按段落，过长的段落按句子，过长的句子按字符
+    """
+    segments = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            segments.append((paragraph + "\n\n", tokens))
+            continue
+        pieces = []
+        for sentence in _SENTENCE_END.split(paragraph):
+            if not sentence:
+                continue
+            tokens = count_tokens(sentence)
+            if tokens <= max_tokens:
+                pieces.append((sentence, tokens))
+                continue
+            # 按平均每token的字符数硬切
+            step = max(1, len(sentence) * max_tokens // tokens)
+            for start in range(0, len(sentence), step):
+                piece = sentence[start:start + step]
+                pieces.append((piece, count_tokens(piece)))
+        last, tokens = pieces[-1]
+        pieces[-1] = (last + "\n\n", tokens)
+        segments.extend(pieces)
+    return segments
+
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """按段落与句子边界切分，相邻片段合并到不超过max_tokens的块"""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for segment, tokens in _segments(text, max_tokens):
+        if current and size + tokens > max_tokens:
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+        current.append(segment)
+        size += tokens
+    if current:
+        chunks.append("".join(current).strip())
+    return chunks
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """保留开头不超过max_tokens的部分"""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    length = len(text) * max_tokens // tokens
+    while length > 0:
+        head = text[:length]
+        if count_tokens(head) <= max_tokens:
+            return head
+        length = length * 9 // 10
+    return ""
+
+
+def sample(text: str, max_tokens: int, windows: int = 3) -> str:
+    """超出上限时取开头、中间、结尾等间隔的若干片段，用省略号连接"""
+    if within(text, max_tokens):
+        return text
+    window_tokens = max(1, (max_tokens - windows * count_tokens(ELLIPSIS)) // windows)
+    parts = []
+    for i in range(windows):
+        start = len(text) * i // windows
+        parts.append(truncate(text[start:], window_tokens).strip())
+    return ELLIPSIS.join(part for part in parts if part)
+
+
+def fit_budget(text: str, max_tokens: int, stage: str) -> str:
+    """阶段输入超出token上限时截断并计数"""
+    if within(text, max_tokens):
+        return text
+    truncated_inputs_total.inc(stage=stage)
+    return truncate(text, max_tokens - count_tokens(ELLIPSIS)) + ELLIPSIS
+
+
+async def _gather(coroutines: List[Awaitable[str]]) -> List[str]:
+    """并发执行，任一失败时取消其余调用"""
+    tasks = [asyncio.ensure_future(c) for c in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def condense(
+    content: str,
+    invoke: Callable[[List[Any]], Awaitable[Any]]
+) -> Tuple[str, Dict[str, Any], List[Any]]:
+    """
+    分块并发提炼要点再合并，返回 ``(浓缩后的内容, 统计, LLM响应列表)``。
+    ``invoke`` 接收提示词消息并返回LLM响应。
+    """
+    chunk_tokens = settings.long_input_chunk_tokens
+    target_tokens = settings.long_input_summary_tokens
+    semaphore = asyncio.Semaphore(settings.long_input_concurrency)
+    responses: List[Any] = []
+
+    async def call(messages: List[Any]) -> str:
+        async with semaphore:
+            response = await invoke(messages)
+        responses.append(response)
+        return response.content.strip()
+
+    # 长文本的切分与计数耗时较长，放到线程中执行
+    chunks = await asyncio.to_thread(split_text, content, chunk_tokens)
+    condense_chunks.observe(len(chunks))
+    # 每块的摘要长度按目标总长平均分配，中文约1字1token
+    per_chunk = max(100, target_tokens // len(chunks))
+    summaries = await _gather([
+        call(prompts.SUMMARIZE_CHUNK.format_messages(
+            index=i + 1, total=len(chunks), max_chars=per_chunk, chunk=chunk
+        ))
+        for i, chunk in enumerate(chunks)
+    ])
+
+    rounds = 0
+    while len(summaries) > 1 and count_tokens("\n\n".join(summaries)) > target_tokens and rounds < MAX_REDUCE_ROUNDS:
+        rounds += 1
+        # 相邻摘要分组，每组不超过一块的大小
+        groups: List[List[str]] = [[]]
+        size = 0
+        for summary in summaries:
+            tokens = count_tokens(summary)
+            if groups[-1] and size + tokens > chunk_tokens:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += tokens
+        per_group = max(100, target_tokens // len(groups))
+        summaries = await _gather([
+            call(prompts.MERGE_SUMMARIES.format_messages(
+                max_chars=per_group, summaries="\n\n".join(group)
+            ))
+            for group in groups
+        ])
+
+    condensed = fit_budget("\n\n".join(summaries), target_tokens, "condense_content")
+    stats = {
+        "chunks": len(chunks),
+        "reduce_rounds": rounds,
+        "output_tokens": count_tokens(condensed)
+    }
+    return condensed, stats, responses
@@ -0,0 +1,253 @@
+"""
+生成流程各阶段的提示词注册表。
+
+提示词在导入时构建一次，每次调用只需格式化末尾的用户消息：
+- 系统提示词是不含任何请求参数的静态文本，所有请求逐字节相同，可以命中服务商的提示词前缀缓存
+  （OpenAI、DeepSeek、通义千问等对相同前缀自动缓存，最小长度与粒度各不相同）；
+- 内容类型、发言人、目标语言等每次请求变化的部分统一放在末尾的用户消息中；
+- 每个提示词带版本号，参与生成结果缓存键的计算。修改提示词文本时递增对应的版本号，
+  只有用到该提示词的阶段的缓存会失效。
+
+重构前已有的提示词版本号从2开始：1为此前直接写在各节点中、包含请求参数的提示词。
+"""
+import string
+from typing import Any, Dict, List, Tuple
+
+try:
+    from langchain_core.messages import HumanMessage, SystemMessage
+except ImportError:
+    class _Message:
+        def __init__(self, content: str):
+            self.content = content
+
+    HumanMessage = SystemMessage = _Message
+
+
+class Prompt:
+    """静态系统提示词 + 用户消息模板（``str.format`` 语法）"""
+
+    def __init__(self, name: str, version: int, system: str, human: str):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.human = human
+        self.fields = frozenset(field for _, field, _, _ in string.Formatter().parse(human) if field)
+        # 所有请求共享同一个系统消息对象
+        self.system_message = SystemMessage(content=system)
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.name, self.version
+
+    def format_messages(self, **values: Any) -> List[Any]:
+        return [self.system_message, HumanMessage(content=self.human.format(**values))]
+
+
+_registry: Dict[str, Prompt] = {}
+
+
+def register(name: str, version: int, system: str, human: str) -> Prompt:
+    if name in _registry:
+        raise ValueError(f"提示词 {name} 重复注册")
+    if "{" in system or "}" in system:
+        raise ValueError(f"提示词 {name} 的系统部分须为静态文本，请把变量放到用户消息中")
+    prompt = _registry[name] = Prompt(name, version, system, human)
+    return prompt
+
+
+def get_prompt(name: str) -> Prompt:
+    return _registry[name]
+
+
+def prompt_versions(*names: str) -> Tuple[Tuple[str, int], ...]:
+    """用于缓存键：指定提示词的 (名称, 版本)"""
+    return tuple(_registry[name].key for name in names)
+
+
+def all_prompts() -> List[Prompt]:
+    return list(_registry.values())
+
+
+ANALYZE_CONTENT = register("analyze_content", 2, """你是一个专业的内容分析专家。请判断给定的内容是精确的播客脚本还是模糊的主题描述。
+
+精确脚本的特征：
+- 包含具体的朗读文本内容
+- 有明确的发言人和对话（如果是多人）
+- 内容详细完整，可以直接朗读
+- 有具体的播客结构和内容
+
+模糊描述的特征：
+- 只是主题、概念或想法
+- 缺乏具体的文本内容
+- 需要进一步展开成完整的朗读稿
+- 只是大纲或提纲
+
+请仔细分析内容，只回答 "precise" 或 "vague"，不要添加其他解释。""", "请分析以下内容：\n{content}")
+
+
+DETAILED_CONTENT = register("detailed_content", 2, """你是一个专业的内容策划师。根据给定的主题描述，生成5分钟朗读内容的详细大纲。
+
+用户消息会给出内容类型、朗读形式（单人朗读或多人对话及参与者）和主题描述，请按朗读形式组织大纲：
+- 单人朗读：直入主题，无需自我介绍，内容要有重点，简洁明了
+- 多人对话：直接开始讨论，无需介绍环节，对话要简洁高效
+
+请生成包含以下要素的内容大纲：
+
+1. 核心内容（4-4.5分钟）
+   - 2-3个核心要点
+   - 每个要点要精炼有力
+   - 包含具体例子或案例
+   - 提供实用建议
+
+2. 总结（30秒-1分钟）
+   - 快速总结核心观点
+   - 简短的行动建议
+
+重要要求：
+- 不要包含任何节目介绍、欢迎词、自我介绍
+- 不要创建节目名称或播客信息
+- 直接进入主题内容
+- 内容要高度浓缩，去除冗余信息
+- 语言要简洁有力，节奏要快
+- 总字数控制在800-1000字左右
+
+直接从主题内容开始，无需任何开场白。""", "内容类型：{content_type}\n朗读形式：{voice_instruction}\n\n主题描述：{content}")
+
+
+_SCRIPT_RULES = """脚本编写要求：
+
+1. 内容要求
+   - 直接从主题内容开始，无任何开场
+   - 不要包含：欢迎词、问候语、自我介绍、节目介绍
+   - 不要创建：节目名称、播客信息、主持人介绍
+   - 每句话都要有价值，去除冗余
+   - 重点突出，逻辑清晰
+
+2. 格式要求
+   - 输出纯文本格式，不使用markdown语法
+   - 不要使用加粗、斜体等格式
+   - 单人：直接输出朗读文本
+   - 多人：严格按照"发言人：说话内容"格式
+   - 发言人姓名必须与参与者列表完全一致
+
+3. 时长控制
+   - 严格控制在5分钟内（800-1000字）
+   - 按正常语速150-200字/分钟计算
+
+4. 语言要求
+   - 使用口语化表达，适合朗读
+   - 语言简洁有力，节奏明快
+   - 避免书面语和复杂句式
+
+请生成完整的朗读脚本，直接从主题内容开始。"""
+
+SCRIPT_SINGLE = register("script_single", 2, """你是一个专业的脚本编写师。请将给定的内容大纲转换为5分钟的纯文本朗读脚本。
+
+脚本格式（单人朗读，5分钟）：
+直接输出朗读文本，无需标注发言人。
+
+示例：
+人工智能正在改变我们的工作方式。最明显的变化是自动化程度的提升...
+
+这种变化带来三个关键影响。第一，重复性工作将被替代...
+
+总结一下，面对AI时代，我们需要做好三件事...
+
+要求：
+- 直接从主题内容开始
+- 不要任何开场白、问候语、自我介绍
+- 不要创建节目名称
+- 语言简洁有力，避免废话
+- 总字数800-1000字
+
+""" + _SCRIPT_RULES, "参与者：{voices}\n\n请根据以下内容生成脚本：\n\n{content}")
+
+SCRIPT_DIALOGUE = register("script_dialogue", 2, """你是一个专业的脚本编写师。请将给定的内容大纲转换为5分钟的纯文本朗读脚本。
+
+脚本格式（多人对话，5分钟）：
+发言人：说话内容
+
+示例（发言人A、B代指用户消息中的参与者）：
+发言人A：人工智能对教育的影响主要体现在三个方面...
+发言人B：我觉得最重要的是个性化学习...
+发言人A：你能具体说说吗？
+发言人B：比如AI可以根据学生的学习进度...
+
+要求：
+- 严格使用用户消息中提供的人名作为发言人
+- 直接开始讨论主题，无需介绍环节
+- 不要任何开场白、问候语
+- 对话要快节奏，避免冗长
+- 总字数800-1000字
+
+""" + _SCRIPT_RULES, "参与者：{voices}\n\n请根据以下内容生成脚本：\n\n{content}")
+
+
+TRANSLATE_CHUNK = register("translate_chunk", 2, """你是一个专业的播客脚本翻译专家。请将用户消息中的脚本片段翻译成指定的目标语言。
+
+片段来自一篇完整脚本，请只翻译这一段，不要续写或总结。
+
+翻译要求：
+- 保持原有格式：多人脚本保持"发言人：内容"格式，每个发言轮次单独一行
+- 用户消息中列出的发言人姓名保持原样，不要翻译
+- 确保翻译后的内容自然流畅，适合朗读
+- 使用目标语言的自然表达方式
+- 输出纯文本格式，不使用任何markdown语法
+- 如果片段已经是目标语言，直接原样返回
+
+请只返回翻译后的片段，不要添加任何解释或说明。""", "目标语言：{target_language}\n发言人姓名：{glossary}\n片段位置：第{index}/{total}段\n\n{chunk}")
+
+
+TRANSLATE = register("translate", 2, """你是一个专业的语言检测和翻译专家。请执行以下任务：
+
+1. 语言检测：检测给定脚本的主要语言
+2. 语言匹配：判断是否与用户消息中的目标语言一致
+3. 翻译处理：如果不一致，请进行专业翻译
+
+翻译要求（如需要）：
+- 保持脚本的格式：
+  * 单人脚本：保持纯文本格式
+  * 多人脚本：保持"发言人：内容"格式
+- 保持发言人姓名不变
+- 确保翻译后的内容自然流畅，适合朗读
+- 保持5分钟的时长要求（800-1000字）
+- 使用目标语言的自然表达方式
+- 输出纯文本格式，不使用任何markdown语法
+
+如果语言一致，请直接返回原脚本。
+如果需要翻译，请返回翻译后的完整脚本。
+
+请只返回最终的脚本内容，不要添加任何解释或说明。""", "目标语言：{target_language}\n\n脚本：\n{script}")
+
+
+SUMMARIZE_CHUNK = register("summarize_chunk", 1, """你是一个专业的内容编辑。用户消息给出一篇长文中的一个片段及其位置，请提炼这一片段的要点，供之后编写5分钟播客使用。
+
+要求：
+- 保留关键事实、数据、人名、观点和具体例子
+- 不要添加片段中没有的信息，不要评价或续写
+- 按片段中的顺序组织要点，语言简洁
+- 输出纯文本格式，不使用任何markdown语法
+- 不超过用户消息中给出的字数上限
+
+请只返回要点，不要添加任何解释或说明。""", "片段位置：第{index}/{total}段\n字数上限：{max_chars}字\n\n{chunk}")
+
+
+MERGE_SUMMARIES = register("merge_summaries", 1, """你是一个专业的内容编辑。用户消息给出同一篇长文中若干连续部分的要点，请把它们合并为一份连贯的要点，供之后编写5分钟播客使用。
+
+要求：
+- 按原文顺序组织，合并重复的内容
+- 保留最重要的事实、数据、人名、观点和具体例子
+- 不要添加要点中没有的信息
+- 输出纯文本格式，不使用任何markdown语法
+- 不超过用户消息中给出的字数上限
+
+请只返回合并后的要点，不要添加任何解释或说明。""", "字数上限：{max_chars}字\n\n{summaries}")
+
+
+def voice_instruction(voices: List[str]) -> str:
+    """详细内容阶段用户消息中的朗读形式说明"""
+    if not voices:
+        return "单人朗读"
+    if len(voices) == 1:
+        return f"单人朗读，朗读者：{voices[0]}"
+    return f"多人对话，参与者：{'、'.join(voices)}"
@@ -0,0 +1,232 @@
+"""
+LLM调用的截止时间、重试与熔断。
+
+- 截止时间：一次生成可以带整体截止时间（请求字段 ``deadlineSeconds`` 或 ``X-Deadline-Seconds`` 请求头），
+  保存在上下文变量中，随生成图传递到各节点。每次调用按 ``LLM_STAGE_BUDGET_SHARES`` 的权重，
+  把剩余时间在本阶段与之后的阶段之间分配，本阶段（含重试）不超过分到的时间；
+- 超时与重试：每次尝试不超过 ``LLM_STAGE_TIMEOUTS`` 中该阶段的上限（也不超过本阶段剩余的时间）。
+  超时、连接错误、429与5xx可以重试，退避时间为带完全抖动的指数退避，
+  只有退避之后本阶段仍剩余至少 ``LLM_RETRY_MIN_SECONDS`` 秒时才重试；
+- 熔断：每个endpoint（base_url+模型，同一上游被多个阶段使用时共用一个熔断器）统计最近 ``LLM_BREAKER_WINDOW`` 次调用中可重试错误的比例，
+  达到 ``LLM_BREAKER_ERROR_RATE`` 时打开熔断，``LLM_BREAKER_OPEN_SECONDS`` 秒内不再向其发送请求；
+  之后进入半开状态，放行一个探测请求，成功则关闭，失败则重新打开。
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+breaker_state = metrics.gauge(
+    "podcast_llm_breaker_state",
+    "endpoint的熔断状态：0关闭、1半开、2打开",
+    ["base_url", "model"]
+)
+breaker_transitions_total = metrics.counter(
+    "podcast_llm_breaker_transitions_total",
+    "熔断状态切换次数，state为切换后的状态",
+    ["base_url", "model", "state"]
+)
+deadline_exceeded_total = metrics.counter(
+    "podcast_generation_deadline_exceeded_total",
+    "因超过整体截止时间而终止的生成数，stage为未能开始的阶段",
+    ["stage"]
+)
+
+# 各阶段在生成流程中的先后顺序，用于把剩余时间留给之后的阶段
+STAGE_ORDER = ["analyzer", "content_generator", "script_generator", "translator"]
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """生成的截止时间已到"""
+
+
+class LLMTimeout(TimeoutError):
+    """单次LLM调用超时"""
+
+
+class CircuitOpenError(Exception):
+    """阶段的所有endpoint都已熔断"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def start_deadline(seconds: Optional[float]) -> Optional[float]:
+    """
+    为当前上下文（及之后在其中创建的任务）设置从现在起seconds秒的截止时间。
+    未指定时使用 ``REQUEST_DEADLINE_DEFAULT``（0表示不限），不超过 ``REQUEST_DEADLINE_MAX``；返回生效的秒数
+    """
+    seconds = seconds or settings.request_deadline_default or None
+    if seconds is not None:
+        seconds = min(seconds, settings.request_deadline_max)
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+    return seconds
+
+
+def deadline_remaining() -> Optional[float]:
+    """距截止时间的秒数，未设置时返回None"""
+    expires_at = _deadline.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+
+def stage_deadline(role: str) -> Optional[float]:
+    """
+    本阶段的截止时刻（time.monotonic()）：剩余时间按权重分给本阶段与之后的各阶段。
+    未设置截止时间时返回None，已超过截止时间时抛出DeadlineExceeded
+    """
+    remaining = deadline_remaining()
+    if remaining is None:
+        return None
+    if remaining <= 0:
+        deadline_exceeded_total.inc(stage=role)
+        raise DeadlineExceeded("生成已超过截止时间")
+    shares = settings.llm_stage_budget_shares
+    later = STAGE_ORDER[STAGE_ORDER.index(role):] if role in STAGE_ORDER else [role]
+    total = sum(shares.get(stage, 1.0) for stage in later)
+    return time.monotonic() + remaining * shares.get(role, 1.0) / total
+
+
+def attempt_timeout(role: str, stage_expires_at: Optional[float]) -> float:
+    """单次尝试的超时：阶段的超时上限，且不超过本阶段剩余的时间"""
+    timeout = settings.llm_stage_timeouts.get(role, settings.llm_read_timeout)
+    if stage_expires_at is not None:
+        timeout = min(timeout, stage_expires_at - time.monotonic())
+    return timeout
+
+
+def backoff(attempt: int) -> float:
+    """第attempt次重试前的等待时间：完全抖动的指数退避"""
+    ceiling = min(settings.llm_retry_backoff_max, settings.llm_retry_backoff_base * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """服务商返回的HTTP状态码（openai.APIStatusError等），没有时返回None"""
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: BaseException, streamed: bool = False) -> bool:
+    """
+    超时、连接错误、429与5xx可以重试，其他错误（如400、401）是请求本身的问题。
+    ``streamed`` 为True（输出逐token转发给客户端）时只重试收到错误状态码的调用，此时尚未输出，
+    超时与连接中断可能发生在输出途中，重试会重复输出
+    """
+    code = status_code(error)
+    if code is not None:
+        return code == 429 or code >= 500
+    if streamed:
+        return False
+    if isinstance(error, (asyncio.TimeoutError, OSError)):
+        return True
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError") or _is_transport_error(error)
+
+
+def _is_transport_error(error: BaseException) -> bool:
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """一个endpoint的熔断器，按最近若干次调用的错误率打开；通过 ``get_breaker()`` 获取共用的实例"""
+
+    def __init__(self, base_url: Optional[str], model: str):
+        self.labels = {"base_url": (base_url or "default").rstrip("/"), "model": model}
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.outcomes: Deque[bool] = deque(maxlen=settings.llm_breaker_window)
+        self.probing = False
+        self.timeouts = 0
+        breaker_state.set(0, **self.labels)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        breaker_state.set(_STATE_VALUES[state], **self.labels)
+        breaker_transitions_total.inc(state=state, **self.labels)
+
+    def retry_after(self) -> float:
+        """距离进入半开状态的秒数"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + settings.llm_breaker_open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """是否可以向endpoint发送请求；打开时间已满时进入半开状态，只放行一个探测请求"""
+        if self.state == OPEN and self.retry_after() <= 0:
+            self._transition(HALF_OPEN)
+            self.probing = False
+        if self.state == HALF_OPEN:
+            return not self.probing
+        return self.state == CLOSED
+
+    def acquire(self) -> None:
+        """请求发出前调用，半开状态下占用探测名额"""
+        if self.state == HALF_OPEN:
+            self.probing = True
+
+    def release(self) -> None:
+        """请求被取消、没有结果时调用，归还探测名额"""
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def record(self, failed: bool, timed_out: bool = False) -> None:
+        """记录调用结果。只有endpoint的问题（可重试的错误）计为失败"""
+        self.timeouts += int(timed_out)
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if failed:
+                self._open()
+            else:
+                self.outcomes.clear()
+                self._transition(CLOSED)
+            return
+        self.outcomes.append(failed)
+        if (
+            self.state == CLOSED
+            and len(self.outcomes) >= settings.llm_breaker_min_calls
+            and sum(self.outcomes) / len(self.outcomes) >= settings.llm_breaker_error_rate
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "retry_after": round(self.retry_after(), 3),
+            "recent_error_rate": round(sum(self.outcomes) / len(self.outcomes), 3) if self.outcomes else 0.0,
+            "timeouts": self.timeouts
+        }
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+
+def get_breaker(base_url: Optional[str], model: str) -> CircuitBreaker:
+    """获取（必要时创建）endpoint与模型对应的熔断器，各阶段的路由池共用"""
+    key = ((base_url or "default").rstrip("/"), model)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(base_url, model)
+    return breaker
@@ -0,0 +1,302 @@
+"""
+多endpoint的延迟感知路由与对冲请求。
+
+每个阶段（analyzer/content_generator/script_generator/translator）可配置一组
+OpenAI兼容的endpoint及权重：
+- 路由：按权重随机抽取两个endpoint，选择EWMA延迟与错误率综合代价更低的一个；
+- 重试与故障转移：每次调用有阶段的超时上限，超时、连接错误、429与5xx按带抖动的指数退避重试，
+  优先换一个endpoint，次数与时间受本阶段的截止时间约束（见 ``resilience``）；
+- 熔断：熔断打开的endpoint不参与路由，全部打开时改用备用endpoint，没有备用时立即失败；
+- 对冲：开启后，若主请求在近期p90延迟内未返回，向另一个endpoint发送相同请求，
+  取先返回的结果并取消另一个。只适合短小、非流式输出的阶段（如内容分析）。
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from app.core import metrics
+from app.core.config import settings
+from app.llm_providers import resilience
+from app.llm_providers.limiter import ProviderLimiter, estimate_tokens, get_limiter
+from app.llm_providers.resilience import CircuitOpenError, DeadlineExceeded, LLMTimeout, get_breaker
+
+hedged_requests_total = metrics.counter(
+    "podcast_llm_hedged_requests_total",
+    "发出的对冲请求数，winner为primary/hedge表示哪一个先返回",
+    ["role", "winner"]
+)
+failover_total = metrics.counter(
+    "podcast_llm_failover_total",
+    "调用失败后切换endpoint重试的次数",
+    ["role"]
+)
+retries_total = metrics.counter(
+    "podcast_llm_retries_total",
+    "调用失败后的重试次数（含切换endpoint的重试）",
+    ["role"]
+)
+timeouts_total = metrics.counter(
+    "podcast_llm_timeouts_total",
+    "超过单次超时上限的LLM调用数",
+    ["role", "model"]
+)
+fallback_total = metrics.counter(
+    "podcast_llm_fallback_total",
+    "阶段的endpoint全部熔断、改用备用endpoint的调用数",
+    ["role"]
+)
+short_circuited_total = metrics.counter(
+    "podcast_llm_short_circuited_total",
+    "endpoint全部熔断且没有备用endpoint、直接失败的调用数",
+    ["role"]
+)
+llm_queue_wait_seconds = metrics.histogram(
+    "podcast_llm_queue_wait_seconds",
+    "LLM调用在限流器中排队等待的时间",
+    ["role", "model"]
+)
+llm_request_seconds = metrics.histogram(
+    "podcast_llm_request_seconds",
+    "LLM调用耗时（不含排队），outcome为ok/error",
+    ["role", "model", "outcome"]
+)
+llm_prompt_tokens = metrics.histogram(
+    "podcast_llm_prompt_tokens",
+    "每次LLM调用的提示词token数（服务商未返回用量时为估算值）",
+    ["role", "model"],
+    buckets=metrics.TOKEN_BUCKETS
+)
+llm_cached_prompt_tokens_total = metrics.counter(
+    "podcast_llm_cached_prompt_tokens_total",
+    "命中服务商提示词前缀缓存的token数（服务商返回缓存用量时统计）",
+    ["role", "model"]
+)
+llm_completion_tokens = metrics.histogram(
+    "podcast_llm_completion_tokens",
+    "每次LLM调用的输出token数（服务商未返回用量时为估算值）",
+    ["role", "model"],
+    buckets=metrics.TOKEN_BUCKETS
+)
+llm_tokens_per_second = metrics.histogram(
+    "podcast_llm_tokens_per_second",
+    "每次LLM调用的输出速度（输出token数/调用耗时）",
+    ["role", "model"],
+    buckets=(5, 10, 20, 40, 80, 160, 320, 640)
+)
+
+# 错误率对代价的放大系数：错误率为25%时代价翻倍
+ERROR_PENALTY = 4.0
+# 计算p90所需的最少样本数，不足时使用配置的默认对冲延迟
+MIN_SAMPLES_FOR_P90 = 20
+
+
+class Endpoint:
+    """一个OpenAI兼容endpoint上的某个模型，及其延迟与错误统计"""
+
+    def __init__(self, base_url: Optional[str], model: str, llm: Any, weight: float = 1.0):
+        self.base_url = base_url
+        self.model = model
+        self.llm = llm
+        self.weight = weight
+        self.limiter: ProviderLimiter = get_limiter(base_url, model)
+        self.breaker = get_breaker(base_url, model)
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def cost(self) -> float:
+        """路由代价，越低越优先；尚无观测的endpoint代价为0以便尽快探测"""
+        latency = self.ewma_latency or 0.0
+        return latency * (1 + ERROR_PENALTY * self.ewma_error) / self.weight
+
+    def observe(self, latency: float, failed: bool) -> None:
+        alpha = settings.llm_ewma_alpha
+        self.calls += 1
+        self.errors += int(failed)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = alpha * latency + (1 - alpha) * self.ewma_latency
+        self.ewma_error = alpha * float(failed) + (1 - alpha) * self.ewma_error
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "weight": self.weight,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "ewma_error": round(self.ewma_error, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "breaker": self.breaker.snapshot()
+        }
+
+
+class EndpointPool:
+    """一个阶段的endpoint池"""
+
+    def __init__(
+        self, role: str, endpoints: Sequence[Endpoint], hedge: bool = False, fallbacks: Sequence[Endpoint] = ()
+    ):
+        if not endpoints:
+            raise ValueError(f"阶段{role}没有可用的endpoint")
+        self.role = role
+        self.endpoints = list(endpoints)
+        self.fallbacks = list(fallbacks)
+        self.hedge = hedge and len(self.endpoints) > 1
+        self._latencies: Deque[float] = deque(maxlen=200)
+
+    def choose(self, exclude: Sequence[Endpoint] = ()) -> Endpoint:
+        """
+        在熔断未打开的endpoint中按权重抽取两个候选，返回代价更低的一个（power of two choices）。
+        优先选择exclude（已失败过的）以外的endpoint；全部熔断时改用备用endpoint，仍没有可用的则抛出CircuitOpenError
+        """
+        allowed = [e for e in self.endpoints if e.breaker.allow()]
+        if not allowed and self.fallbacks:
+            allowed = [e for e in self.fallbacks if e.breaker.allow()]
+            if allowed:
+                fallback_total.inc(role=self.role)
+        if not allowed:
+            short_circuited_total.inc(role=self.role)
+            retry_after = min(e.breaker.retry_after() for e in self.endpoints + self.fallbacks)
+            raise CircuitOpenError(f"阶段{self.role}的LLM服务暂不可用（熔断中）", retry_after)
+        candidates = [e for e in allowed if e not in exclude] or allowed
+        if len(candidates) == 1:
+            return candidates[0]
+        weights = [e.weight for e in candidates]
+        first, second = random.choices(candidates, weights=weights, k=2)
+        return first if first.cost() <= second.cost() else second
+
+    def hedge_delay(self) -> float:
+        """对冲等待时间：近期成功调用延迟的p90"""
+        if len(self._latencies) < MIN_SAMPLES_FOR_P90:
+            return settings.llm_hedge_default_delay
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.9) - 1]
+
+    async def _call(self, endpoint: Endpoint, messages: List[Any], stage_expires_at: Optional[float] = None) -> Any:
+        estimated = estimate_tokens(messages)
+        queued = time.monotonic()
+        async with endpoint.limiter.slot(estimated):
+            start = time.monotonic()
+            llm_queue_wait_seconds.observe(start - queued, role=self.role, model=endpoint.model)
+            # 排队之后再计算超时，排队时间也计入本阶段的时间
+            timeout = resilience.attempt_timeout(self.role, stage_expires_at)
+            if timeout <= 0:
+                raise DeadlineExceeded("生成已超过截止时间")
+            endpoint.breaker.acquire()
+            try:
+                response = await asyncio.wait_for(endpoint.llm.ainvoke(messages), timeout)
+            except asyncio.CancelledError:
+                endpoint.breaker.release()
+                raise
+            except Exception as e:
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if timed_out:
+                    timeouts_total.inc(role=self.role, model=endpoint.model)
+                endpoint.breaker.record(failed=resilience.is_retryable(e), timed_out=timed_out)
+                endpoint.observe(time.monotonic() - start, failed=True)
+                llm_request_seconds.observe(
+                    time.monotonic() - start, role=self.role, model=endpoint.model, outcome="error"
+                )
+                if timed_out:
+                    raise LLMTimeout(f"阶段{self.role}的LLM调用超时（{timeout:.1f}秒）") from e
+                raise
+        latency = time.monotonic() - start
+        endpoint.breaker.record(failed=False)
+        endpoint.observe(latency, failed=False)
+        self._latencies.append(latency)
+        usage = getattr(response, "usage_metadata", None)
+        endpoint.limiter.record_usage(estimated, usage.get("total_tokens") if usage else None)
+        self._record(endpoint, latency, usage, estimated, response)
+        return response
+
+    def _record(self, endpoint: Endpoint, latency: float, usage: Any, estimated: int, response: Any) -> None:
+        prompt_tokens = (usage or {}).get("input_tokens") or estimated
+        completion_tokens = (usage or {}).get("output_tokens") or estimate_tokens([response])
+        labels = {"role": self.role, "model": endpoint.model}
+        llm_request_seconds.observe(latency, outcome="ok", **labels)
+        llm_prompt_tokens.observe(prompt_tokens, **labels)
+        cached_tokens = ((usage or {}).get("input_token_details") or {}).get("cache_read")
+        if cached_tokens:
+            llm_cached_prompt_tokens_total.inc(cached_tokens, **labels)
+        llm_completion_tokens.observe(completion_tokens, **labels)
+        if latency > 0:
+            llm_tokens_per_second.observe(completion_tokens / latency, **labels)
+
+    async def _call_with_retries(
+        self, endpoint: Endpoint, messages: List[Any], stage_expires_at: Optional[float], streamed: bool
+    ) -> Any:
+        """调用失败且可重试时退避后重试，优先换一个endpoint；退避后本阶段剩余时间不足时不再重试"""
+        tried: List[Endpoint] = []
+        attempt = 0
+        while True:
+            try:
+                return await self._call(endpoint, messages, stage_expires_at)
+            except Exception as e:
+                if attempt >= settings.llm_max_retries or not resilience.is_retryable(e, streamed=streamed):
+                    raise
+                delay = resilience.backoff(attempt)
+                if (
+                    stage_expires_at is not None
+                    and stage_expires_at - time.monotonic() - delay < settings.llm_retry_min_seconds
+                ):
+                    raise
+                attempt += 1
+                tried.append(endpoint)
+                retries_total.inc(role=self.role)
+                await asyncio.sleep(delay)
+                endpoint = self.choose(exclude=tried)
+                if endpoint not in tried:
+                    failover_total.inc(role=self.role)
+
+    async def ainvoke(self, messages: List[Any], streamed: bool = False) -> Any:
+        """
+        调用本阶段的LLM。``streamed`` 表示输出会逐token转发给客户端，
+        此时只重试尚未产生输出的失败（429与5xx），且不发送对冲请求
+        """
+        stage_expires_at = resilience.stage_deadline(self.role)
+        primary = self.choose()
+        if not self.hedge or streamed:
+            return await self._call_with_retries(primary, messages, stage_expires_at, streamed)
+
+        primary_task = asyncio.create_task(self._call(primary, messages, stage_expires_at))
+        tasks = [primary_task]
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_delay())
+            if done and not primary_task.exception():
+                return primary_task.result()
+
+            # 主请求超过p90仍未返回（或已失败），向另一个endpoint发送对冲请求
+            hedge_task = asyncio.create_task(
+                self._call(self.choose(exclude=[primary]), messages, stage_expires_at)
+            )
+            tasks.append(hedge_task)
+            pending = {hedge_task} if done else {primary_task, hedge_task}
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    if not task.exception():
+                        hedged_requests_total.inc(
+                            role=self.role, winner="primary" if task is primary_task else "hedge"
+                        )
+                        return task.result()
+            # 两个请求都失败，抛出对冲请求的异常
+            return hedge_task.result()
+        finally:
+            # 调用方被取消（如客户端断开）或已有结果时，取消仍在进行的请求，释放限流名额
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "hedge": self.hedge,
+            "hedge_delay": round(self.hedge_delay(), 3),
+            "endpoints": [endpoint.state() for endpoint in self.endpoints],
+            "fallbacks": [endpoint.state() for endpoint in self.fallbacks]
+        }
@@ -0,0 +1,53 @@
+"""
+播客脚本的分块工具，用于分段并行翻译。
+
+脚本按发言轮次/段落切分（多人脚本每行一个 ``发言人：内容``），
+再把相邻的短段合并到目标长度附近，保证每块翻译时有足够的上下文。
+"""
+import re
+from typing import Dict, List, Tuple
+
+_SPEAKER = re.compile(r"^([^\n:：]{1,20})[:：]", re.MULTILINE)
+
+
+def split_script(script: str, chunk_chars: int) -> Tuple[List[str], str]:
+    """
+    将脚本切分为若干块，返回 ``(块列表, 块之间的分隔符)``。
+    原脚本以空行分段时分隔符为 ``\\n\\n``，否则为 ``\\n``。
+    """
+    separator = "\n\n" if "\n\n" in script else "\n"
+    turns = [turn.strip() for turn in script.split(separator) if turn.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for turn in turns:
+        current.append(turn)
+        size += len(turn)
+        if size >= chunk_chars:
+            chunks.append(separator.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(separator.join(current))
+    return chunks, separator
+
+
+def speaker_names(script: str, voices: List[str]) -> List[str]:
+    """脚本中出现的发言人姓名（含voices），翻译时需保持不变"""
+    names = list(voices)
+    for name in _SPEAKER.findall(script):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def rename_speakers(script: str, names: Dict[str, str]) -> str:
+    """按names替换行首的发言人姓名（可互换，如A与B对调）"""
+    if all(old == new for old, new in names.items()):
+        return script
+
+    def replace(match: "re.Match[str]") -> str:
+        name = match.group(1)
+        return names.get(name.strip(), name) + match.group(0)[len(name):]
+
+    return _SPEAKER.sub(replace, script)
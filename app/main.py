@@ -1,21 +1,54 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from app.api import podcast
 
 from app.db.database import init_db
+from app.db.writer import podcast_writer
+from app.llm_providers.base import warmup_generators, close_generators, routing_states
+from app.llm_providers.cache import generation_cache
+from app.tasks.jobs import job_manager
+from app.llm_providers.limiter import limiter_states
+from app.core import metrics
+from app.services.detail_cache import detail_cache
+from app.services.search import search_backend, search_index
+from app.services.near_duplicate import near_duplicate_index
+from app.core.config import settings
+from app.services.transcripts import transcript_codec
 
 
 from fastapi.middleware.cors import CORSMiddleware
 
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     await init_db()
-#     start_scheduler()
-#     yield
-    # 可在此处关闭数据库连接、调度器等
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    # 加载脚本压缩字典（表不存在时按无字典压缩）
+    try:
+        await transcript_codec.load()
+    except Exception as e:
+        print(f"警告：加载脚本压缩字典失败: {e}")
+    # 预先编译生成图并建立LLM连接池
+    await warmup_generators()
+    # 启动批量写入队列与异步任务worker，恢复未完成的任务
+    podcast_writer.start()
+    # 使用进程内搜索索引时在后台加载已有记录
+    if search_backend() == "memory":
+        search_index.start()
+    # 近似重复索引同样在后台加载，之后随批量写入增量更新
+    if settings.near_duplicate_index:
+        near_duplicate_index.start()
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    await search_index.stop()
+    await near_duplicate_index.stop()
+    # 写入仍在排队的生成结果与生成缓存
+    await podcast_writer.stop()
+    await generation_cache.aclose()
+    # 关闭共享的LLM连接池
+    await close_generators()
 
-# app = FastAPI(title="AI播客生成服务", lifespan=lifespan)
-app = FastAPI(title="AI播客生成服务")
+app = FastAPI(title="AI播客生成服务", lifespan=lifespan)
 
 # 添加CORS中间件
 app.add_middleware(
@@ -35,3 +68,30 @@ app.include_router(podcast.router, prefix="/podcast", tags=["Podcast"])
 @app.get("/")
 async def root():
     return {"message": "AI播客生成后端服务已启动"}
+
+
+@app.get("/limiter")
+async def limiter_status():
+    """LLM限流器状态（并发、排队深度与等待时间）及各endpoint的路由统计与熔断状态"""
+    return {
+        "limiters": limiter_states(),
+        "routing": routing_states(),
+        "pending_jobs": job_manager.pending(),
+        "pending_writes": podcast_writer.pending()
+    }
+
+
+@app.get("/cache")
+async def cache_status():
+    """进程内详情缓存的命中率与内存占用，以及搜索索引与近似重复索引的状态"""
+    return {
+        "detail": detail_cache.stats(),
+        "search": {"backend": search_backend(), **search_index.stats()},
+        "near_duplicate": near_duplicate_index.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus格式的指标：各节点/LLM调用/SSE/数据库连接池的耗时直方图与各类计数器"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
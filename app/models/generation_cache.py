@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy import func
+
+from app.models.podcast import Base
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+    cache_key = Column(String(64), primary_key=True)
+    stage = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime
+from sqlalchemy import func
+
+from app.models.podcast import Base
+
+
+class GenerationSession(Base):
+    """已结束的生成会话的事件记录，供断线的客户端续传"""
+    __tablename__ = "generation_session"
+    session_id = Column(String(32), primary_key=True)
+    first_event_id = Column(Integer, nullable=False)
+    last_event_id = Column(Integer, nullable=False)
+    events = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
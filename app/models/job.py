@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import func
+
+from app.models.podcast import Base
+
+
+class PodcastJob(Base):
+    __tablename__ = "podcast_job"
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    status = Column(String(32), nullable=False, index=True)
+    request = Column(Text, nullable=False)
+    podcast_id = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    owner = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
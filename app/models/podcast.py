@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, LargeBinary, String, Text, DateTime, Index
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import deferred
 from sqlalchemy.orm import relationship
 from sqlalchemy import func
 
@@ -13,7 +14,17 @@ class Podcast(Base):
     content = Column(Text, nullable=False)
     voice_ids = Column(String(255), nullable=False)
     content_type = Column(String(255), nullable=False)
-    transcript = Column(Text, nullable=True)
+    # 旧版内联存储的脚本，迁移后为空；延迟加载，常规查询不读取
+    transcript = deferred(Column(Text, nullable=True))
+    # 压缩脚本（transcript_blob表）的内容哈希
+    transcript_hash = Column(String(64), nullable=True)
     title = Column(String(255), nullable=True)
+    # 完整输入的MinHash签名（近似重复检测用，content只保存摘要）；延迟加载，常规查询不读取
+    content_signature = deferred(Column(LargeBinary, nullable=True))
     created_at = Column(DateTime, nullable=False, default=func.now())
 
+    __table_args__ = (
+        # /podcast/list 按 (created_at, id) 倒序做键集分页
+        Index("idx_podcast_created_at_id", "created_at", "id"),
+    )
+
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, Text
+
+from app.models.podcast import Base
+
+
+class PodcastSearchText(Base):
+    """
+    MySQL全文检索用的明文（标题、内容摘要与脚本），脚本压缩存储后仍可检索。
+    FULLTEXT ngram索引见 ``init_db.sql``
+    """
+    __tablename__ = "podcast_search_text"
+    podcast_id = Column(Integer, primary_key=True, autoincrement=False)
+    body = Column(Text, nullable=False)
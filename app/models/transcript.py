@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime
+from sqlalchemy import func
+
+from app.models.podcast import Base
+
+
+class TranscriptBlob(Base):
+    """按内容寻址的压缩脚本，相同脚本只存一份"""
+    __tablename__ = "transcript_blob"
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String(16), nullable=False)
+    dictionary_id = Column(Integer, nullable=True)
+    raw_size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+
+
+class TranscriptDictionary(Base):
+    """用已有脚本训练的压缩字典"""
+    __tablename__ = "transcript_dictionary"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    codec = Column(String(16), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
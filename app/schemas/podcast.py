@@ -11,14 +11,36 @@ class PodcastGenerateResponse(BaseModel):
     status: str = Field(..., description="任务状态")
     message: Optional[str] = Field(None, description="提示信息")
 
+class PodcastJobStatusResponse(BaseModel):
+    task_id: int = Field(..., description="播客生成任务ID")
+    status: str = Field(..., description="任务状态：queued/running/succeeded/failed")
+    podcast_id: Optional[int] = Field(None, description="生成成功后的播客ID")
+    error: Optional[str] = Field(None, description="失败原因")
+    created_at: Optional[str] = Field(None, description="创建时间")
+    finished_at: Optional[str] = Field(None, description="结束时间")
+
 class PodcastItem(BaseModel):
     id: int = Field(..., description="任务ID")
-    content: str = Field(..., description="播客内容")
+    content: Optional[str] = Field(None, description="播客内容（summary模式下不返回）")
     voice_ids: str = Field(..., description="播客音色素材ID列表，逗号分隔")
     content_type: str = Field(..., description="播客内容标签")
     title: str = Field(..., description="播客标题")
     created_at: Optional[str] = Field(None, description="创建时间")
-    transcript: Optional[str] = Field(None, description="播客完整脚本")
+    transcript: Optional[str] = Field(None, description="播客完整脚本（summary模式下不返回）")
+    excerpt: Optional[str] = Field(None, description="脚本开头片段")
+
+class PodcastSearchItem(BaseModel):
+    id: int = Field(..., description="播客ID")
+    title: str = Field(..., description="播客标题")
+    content_type: str = Field(..., description="播客内容标签")
+    created_at: Optional[str] = Field(None, description="创建时间")
+    score: float = Field(..., description="相关度得分，越大越相关")
+    snippet: str = Field(..., description="命中位置附近的脚本片段，命中词用<em>标记，其余内容已做HTML转义")
+
+class PodcastSearchResponse(BaseModel):
+    total: int = Field(..., description="命中总数")
+    items: List[PodcastSearchItem] = Field(..., description="按相关度排序的结果")
+    next_offset: Optional[int] = Field(None, description="下一页的offset，为空表示没有更多结果")
 
 class PodcastListResponse(BaseModel):
     total: int = Field(..., description="总数")
@@ -47,8 +69,24 @@ class ScriptGenerateRequest(BaseModel):
     voices: List[str] = Field(..., description="音色素材ID列表")
     contentType: str = Field(..., description="内容类型")
     timestamp: str = Field(..., description="时间戳")
+    bypassCache: bool = Field(False, description="是否跳过生成缓存，强制重新生成")
+    reuseSimilar: bool = Field(
+        False, description="内容与已保存的记录近似重复时复用其脚本（按需替换发言人、翻译），不重新生成"
+    )
+    similarityThreshold: Optional[float] = Field(
+        None, gt=0, le=1, description="复用已有脚本的最低相似度，默认使用服务端配置"
+    )
+    deadlineSeconds: Optional[float] = Field(
+        None, gt=0, description="整体截止时间（秒），超过后停止生成；也可通过X-Deadline-Seconds请求头指定"
+    )
+
+
+class ScriptBatchGenerateRequest(BaseModel):
+    items: List[ScriptGenerateRequest] = Field(..., min_length=1, description="生成请求列表")
+    concurrency: Optional[int] = Field(None, ge=1, description="同时生成的条目数，默认使用服务端配置")
 
 
 class PodcastGeneratedListResponse(BaseModel):
-    total: int = Field(..., description="总数")
-    items: List[PodcastItem] = Field(..., description="播客列表")
\ No newline at end of file
+    total: Optional[int] = Field(None, description="总数（MySQL上为估计值），只在第一页返回")
+    items: List[PodcastItem] = Field(..., description="播客列表")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多数据")
\ No newline at end of file
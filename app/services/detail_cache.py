@@ -0,0 +1,114 @@
+"""
+播客详情的读穿（read-through）缓存。
+
+脚本写入后不再变化，详情接口又被前端频繁轮询，因此在进程内缓存序列化后的响应：
+- 值为预先编码好的JSON字节与强ETag，命中时跳过Pydantic校验与序列化；
+- 容量按字节数（而非条目数）限制，超出时按LRU淘汰；
+- 将来新增修改或删除记录的接口时，需调用 ``invalidate()`` 使对应条目失效。
+"""
+import hashlib
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.schemas.podcast import PodcastDetailResponse
+
+detail_cache_total = metrics.counter(
+    "podcast_detail_cache_total",
+    "详情缓存查询次数，result为hit/miss",
+    ["result"]
+)
+detail_cache_bytes = metrics.gauge(
+    "podcast_detail_cache_bytes",
+    "详情缓存占用的字节数（响应体与ETag，另按条目计入固定开销）"
+)
+detail_cache_entries = metrics.gauge(
+    "podcast_detail_cache_entries",
+    "详情缓存的条目数"
+)
+
+# 每个条目除响应体外的大致内存开销：字典槽位、元组与ETag字符串等
+ENTRY_OVERHEAD = 200
+
+
+class CachedDetail(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def encode_detail(detail: PodcastDetailResponse) -> CachedDetail:
+    """序列化详情并计算强ETag（响应体的SHA-256）"""
+    body = detail.model_dump_json().encode("utf-8")
+    return CachedDetail(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+
+
+class DetailCache:
+    """按字节数限制容量的LRU"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[int, CachedDetail]" = OrderedDict()
+
+    @staticmethod
+    def _cost(entry: CachedDetail) -> int:
+        return len(entry.body) + len(entry.etag) + ENTRY_OVERHEAD
+
+    def get(self, podcast_id: int) -> Optional[CachedDetail]:
+        entry = self._data.get(podcast_id)
+        if entry is None:
+            self.misses += 1
+            detail_cache_total.inc(result="miss")
+            return None
+        self._data.move_to_end(podcast_id)
+        self.hits += 1
+        detail_cache_total.inc(result="hit")
+        return entry
+
+    def put(self, podcast_id: int, entry: CachedDetail) -> None:
+        cost = self._cost(entry)
+        if cost > self.max_bytes:
+            return
+        self.invalidate(podcast_id)
+        self._data[podcast_id] = entry
+        self.size += cost
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= self._cost(evicted)
+        self._report()
+
+    def invalidate(self, podcast_id: int) -> None:
+        """记录被修改或删除后使缓存失效"""
+        entry = self._data.pop(podcast_id, None)
+        if entry is not None:
+            self.size -= self._cost(entry)
+            self._report()
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+        self._report()
+
+    def _report(self) -> None:
+        detail_cache_bytes.set(self.size)
+        detail_cache_entries.set(len(self._data))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+detail_cache = DetailCache(settings.detail_cache_max_bytes)
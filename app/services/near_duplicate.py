@@ -0,0 +1,343 @@
+"""
+近似重复主题检测：已保存记录的MinHash LSH索引。
+
+- 特征：与搜索相同的切分（中日韩文字相邻两字、其他文字单词）得到的词集合，
+  两段文本的相似度为词集合的Jaccard相似度；
+- 签名：单次哈希的MinHash（one permutation hashing）：每个词只计算一次哈希（64位BLAKE2b，
+  不受PYTHONHASHSEED影响，各进程与重启前后的签名一致），按哈希值分到
+  ``NEAR_DUPLICATE_NUM_PERM`` 个桶中取最小值，空桶取右侧最近的非空桶（旋转补齐），
+  长文本的签名计算与签名长度无关；
+- LSH：签名分为 ``NEAR_DUPLICATE_BANDS`` 段，任一段完全相同的记录作为候选，
+  再用保存的签名（每个桶只保留低8位）估计相似度，并扣除低位偶然相同的概率；
+- 存储：每段是按 (段哈希, 槽位) 排序的紧凑数组，用二分查找；新插入的记录先放在小的字典中，
+  攒够一定数量后合并进数组，每条记录约 ``段数×8 + 签名长度 + 4`` 字节。
+
+``podcast.content`` 只保存内容摘要（前100字），开头相同、正文不同的长输入摘要也相同，
+因此内容字段使用保存时另存的完整输入的签名（``podcast.content_signature``）；
+没有该签名的旧记录只在摘要未被截断（即完整输入）时按摘要建立索引。
+``NEAR_DUPLICATE_FIELDS`` 包含transcript时另对脚本建立索引（用户直接提交脚本的情况）。
+两个字段都用完整输入查询。索引在启动时从数据库分批加载，之后随批量写入增量更新。
+输入较长（超过 ``NEAR_DUPLICATE_OFFLOAD_CHARS`` 字）时在线程池中计算签名，不阻塞事件循环。
+"""
+import asyncio
+import hashlib
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from operator import eq
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.writer import podcast_writer
+from app.models.podcast import Podcast
+from app.services.search import tokenize
+from app.services.transcripts import decode_transcripts, join_transcript, transcript_columns
+
+near_duplicate_lookup_seconds = metrics.histogram(
+    "podcast_near_duplicate_lookup_seconds",
+    "近似重复索引的查询耗时（含签名计算）",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+)
+near_duplicate_documents = metrics.gauge(
+    "podcast_near_duplicate_documents",
+    "近似重复索引中的条目数",
+    ["field"]
+)
+
+_MASK64 = (1 << 64) - 1
+_EMPTY = 1 << 64
+# 旋转补齐时每隔一个桶加上的偏移，使借用的值与原桶的值不同
+_ROTATION_OFFSET = 0x9E3779B97F4A7C15
+# 段哈希取32位，与32位槽位合成一个64位的有序键
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+# 未合并的新记录达到该数量时合并进有序数组
+MERGE_THRESHOLD = 4096
+# 每次查询最多验证的候选数，避免常见主题的大桶拖慢查询
+MAX_CANDIDATES = 256
+# 启动时每批加载的记录数
+BUILD_BATCH = 500
+# 加载时每处理多少条记录让出一次事件循环
+BUILD_YIELD_EVERY = 50
+# 签名只保留每个桶的低8位，两个无关的值偶然相同的概率
+_LOW_BITS_COLLISION = 1 / 256
+# podcast.content 保存的摘要长度（见 ``content_summary``），超过时为截断后的摘要
+SUMMARY_CHARS = 100
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def signature(text: Optional[str], num_perm: int) -> Optional[List[int]]:
+    """文本的MinHash签名（每个桶的最小哈希值），没有可用的词时返回None"""
+    shingles = set(tokenize(text))
+    if not shingles:
+        return None
+    bins = [_EMPTY] * num_perm
+    for shingle in shingles:
+        # 低位决定桶，其余位作为桶内比较的值（与桶号无关，低8位才能用于估计相似度）
+        h = _hash64(shingle.encode("utf-8"))
+        index, value = h % num_perm, h // num_perm
+        if value < bins[index]:
+            bins[index] = value
+    if _EMPTY not in bins:
+        return bins
+    # 旋转补齐：空桶取右侧（循环）最近的非空桶的值，按距离加上偏移
+    filled = list(bins)
+    donor = None
+    distance = 0
+    for i in range(2 * num_perm - 1, -1, -1):
+        index = i % num_perm
+        if bins[index] != _EMPTY:
+            donor, distance = bins[index], 0
+        else:
+            distance += 1
+            if i < num_perm and donor is not None:
+                filled[index] = (donor + distance * _ROTATION_OFFSET) & _MASK64
+    return filled
+
+
+def encode_signature(sig: Optional[List[int]]) -> Optional[bytes]:
+    """签名保存为每个桶8字节的定长二进制"""
+    return array("Q", sig).tobytes() if sig is not None else None
+
+
+def decode_signature(data: Optional[bytes], num_perm: int) -> Optional[List[int]]:
+    """读取保存的签名，签名长度与当前配置不同（如修改了签名长度）时返回None"""
+    if not data or len(data) != num_perm * 8:
+        return None
+    return array("Q", data).tolist()
+
+
+async def content_signature(content: str) -> Optional[bytes]:
+    """保存记录时另存的完整输入的签名，较长的输入在线程池中计算"""
+    num_perm = settings.near_duplicate_num_perm
+    if len(content) > settings.near_duplicate_offload_chars:
+        return encode_signature(await asyncio.to_thread(signature, content, num_perm))
+    return encode_signature(signature(content, num_perm))
+
+
+class LSHTable:
+    """一个字段的LSH索引：段哈希的有序数组 + 每条记录的低8位签名"""
+
+    def __init__(self, num_perm: int, bands: int):
+        if num_perm % bands:
+            raise ValueError("签名长度须为LSH段数的整数倍")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # 槽位 -> 记录ID
+        self.ids = array("I")
+        # 槽位i的签名为 signatures[i*num_perm:(i+1)*num_perm]
+        self.signatures = array("B")
+        # 每段一个有序数组，元素为 段哈希 << 32 | 槽位
+        self.buckets = [array("Q") for _ in range(bands)]
+        # 尚未合并的新记录：每段一个 段哈希 -> [槽位]
+        self.pending: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+        self.pending_slots = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def band_keys(self, sig: List[int]) -> List[int]:
+        rows = self.rows
+        return [_hash64(array("Q", sig[b * rows:(b + 1) * rows]).tobytes()) & _SLOT_MASK for b in range(self.bands)]
+
+    def add(self, podcast_id: int, sig: List[int]) -> None:
+        slot = len(self.ids)
+        self.ids.append(podcast_id)
+        self.signatures.extend([value & 0xFF for value in sig])
+        for band, key in enumerate(self.band_keys(sig)):
+            self.pending[band].setdefault(key, []).append(slot)
+        self.pending_slots += 1
+        if self.pending_slots >= MERGE_THRESHOLD:
+            self.merge()
+
+    def merge(self) -> None:
+        """把未合并的新记录并入有序数组"""
+        for band, pending in enumerate(self.pending):
+            if not pending:
+                continue
+            bucket = self.buckets[band]
+            # 新记录先单独排序，再与已有的有序数组合并：两段有序序列的排序是线性的
+            bucket.extend(sorted(key << _SLOT_BITS | slot for key, slots in pending.items() for slot in slots))
+            self.buckets[band] = array("Q", sorted(bucket))
+            self.pending[band] = {}
+        self.pending_slots = 0
+
+    def candidates(self, sig: List[int]) -> Set[int]:
+        slots: Set[int] = set()
+        for band, key in enumerate(self.band_keys(sig)):
+            bucket = self.buckets[band]
+            i = bisect_left(bucket, key << _SLOT_BITS)
+            while i < len(bucket) and bucket[i] >> _SLOT_BITS == key and len(slots) < MAX_CANDIDATES:
+                slots.add(bucket[i] & _SLOT_MASK)
+                i += 1
+            slots.update(self.pending[band].get(key, ()))
+        return slots
+
+    def query(self, sig: List[int], threshold: float) -> List[Tuple[int, float]]:
+        """估计的相似度不低于threshold的 (记录ID, 相似度)，按相似度从高到低"""
+        low = [value & 0xFF for value in sig]
+        num_perm = self.num_perm
+        matches = []
+        for slot in self.candidates(sig):
+            start = slot * num_perm
+            agree = sum(map(eq, self.signatures[start:start + num_perm], low)) / num_perm
+            similarity = max(0.0, (agree - _LOW_BITS_COLLISION) / (1 - _LOW_BITS_COLLISION))
+            if similarity >= threshold:
+                matches.append((self.ids[slot], similarity))
+        matches.sort(key=lambda item: (-item[1], -item[0]))
+        return matches
+
+    def memory_bytes(self) -> int:
+        arrays = [self.ids, self.signatures, *self.buckets]
+        total = sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+        for pending in self.pending:
+            total += sys.getsizeof(pending) + sum(sys.getsizeof(slots) for slots in pending.values())
+        return total
+
+
+class NearDuplicateIndex:
+    """按字段（content/transcript）分别维护的MinHash LSH索引"""
+
+    def __init__(self, fields: Sequence[str], num_perm: int, bands: int):
+        self.num_perm = num_perm
+        self.tables = {field: LSHTable(num_perm, bands) for field in fields}
+        self.ready = False
+        self._build_task: Optional[asyncio.Task] = None
+        # 加载期间经写入回调加入的记录，加载时跳过
+        self._live_ids: Set[int] = set()
+
+    def add(
+        self,
+        podcast_id: int,
+        content: Optional[str],
+        transcript: Optional[str],
+        content_sig: Optional[List[int]] = None
+    ) -> None:
+        """
+        加入一条记录。content为 ``podcast.content`` 的摘要，content_sig为完整输入的签名；
+        没有签名且摘要被截断时不对内容字段建立索引，避免只是开头相同的输入被判为近似重复
+        """
+        for field, table in self.tables.items():
+            if field == "content":
+                sig = content_sig
+                if sig is None and content is not None and len(content) <= SUMMARY_CHARS:
+                    sig = signature(content, self.num_perm)
+            else:
+                sig = signature(transcript, self.num_perm)
+            if sig is not None:
+                table.add(podcast_id, sig)
+                near_duplicate_documents.set(len(table), field=field)
+
+    def add_records(self, records: Sequence[Dict[str, Any]]) -> None:
+        """批量写入的回调：把新插入的记录加入索引"""
+        for record in records:
+            if self._build_task is not None and not self.ready:
+                self._live_ids.add(record["id"])
+            self.add(
+                record["id"], record.get("content"), record.get("transcript"),
+                decode_signature(record.get("content_signature"), self.num_perm)
+            )
+
+    def match(self, sig: Optional[List[int]], threshold: float, limit: int = 5) -> List[Tuple[int, float]]:
+        """用完整输入的签名查询各字段，返回相似度不低于threshold的 (记录ID, 相似度)，按相似度从高到低"""
+        if sig is None:
+            return []
+        best: Dict[int, float] = {}
+        for table in self.tables.values():
+            for podcast_id, similarity in table.query(sig, threshold):
+                if similarity > best.get(podcast_id, -1.0):
+                    best[podcast_id] = similarity
+        return sorted(best.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+
+    async def lookup(self, content: str, threshold: float, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        查找与完整输入content的相似度不低于threshold的记录，返回按相似度从高到低的 (记录ID, 相似度)。
+        输入较长时在线程池中计算签名
+        """
+        start = time.perf_counter()
+        if len(content) > settings.near_duplicate_offload_chars:
+            sig = await asyncio.to_thread(signature, content, self.num_perm)
+        else:
+            sig = signature(content, self.num_perm)
+        matches = self.match(sig, threshold, limit)
+        near_duplicate_lookup_seconds.observe(time.perf_counter() - start)
+        return matches
+
+    def start(self) -> None:
+        """后台分批加载已有记录，加载期间的查询只覆盖已加载部分"""
+        if self._build_task is None:
+            self._build_task = asyncio.create_task(self._build())
+
+    async def stop(self) -> None:
+        if self._build_task is not None:
+            self._build_task.cancel()
+            await asyncio.gather(self._build_task, return_exceptions=True)
+            self._build_task = None
+
+    async def _build(self) -> None:
+        with_transcript = "transcript" in self.tables
+        last_id = 0
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    if with_transcript:
+                        result = await db.execute(join_transcript(
+                            select(Podcast.id, Podcast.content, Podcast.content_signature, *transcript_columns())
+                            .where(Podcast.id > last_id)
+                            .order_by(Podcast.id)
+                            .limit(BUILD_BATCH)
+                        ))
+                        rows = result.mappings().all()
+                        transcripts = await decode_transcripts(db, rows)
+                    else:
+                        result = await db.execute(
+                            select(Podcast.id, Podcast.content, Podcast.content_signature)
+                            .where(Podcast.id > last_id)
+                            .order_by(Podcast.id)
+                            .limit(BUILD_BATCH)
+                        )
+                        rows = result.mappings().all()
+                        transcripts = [None] * len(rows)
+                if not rows:
+                    break
+                for i, (row, transcript) in enumerate(zip(rows, transcripts), 1):
+                    if row["id"] not in self._live_ids:
+                        self.add(
+                            row["id"], row["content"], transcript,
+                            decode_signature(row["content_signature"], self.num_perm)
+                        )
+                    # 每条记录约0.1-0.2毫秒，定期让出事件循环，避免加载大量记录时阻塞请求
+                    if i % BUILD_YIELD_EVERY == 0:
+                        await asyncio.sleep(0)
+                last_id = rows[-1]["id"]
+                await asyncio.sleep(0)
+            self.ready = True
+            self._live_ids.clear()
+        except Exception as e:
+            print(f"警告：加载近似重复索引失败: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "num_perm": self.num_perm,
+            "fields": {
+                field: {"documents": len(table), "memory_bytes": table.memory_bytes()}
+                for field, table in self.tables.items()
+            }
+        }
+
+
+near_duplicate_index = NearDuplicateIndex(
+    settings.near_duplicate_fields, settings.near_duplicate_num_perm, settings.near_duplicate_bands
+)
+if settings.near_duplicate_index:
+    podcast_writer.add_listener(near_duplicate_index.add_records)
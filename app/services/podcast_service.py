@@ -1,30 +1,131 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import base64
+import math
+from datetime import datetime
+from typing import AsyncGenerator, Any, Dict, List, Optional, Tuple
 from sqlalchemy import insert
-from sqlalchemy import select
+from sqlalchemy import select, func, or_, and_, text
 
 from app.schemas.podcast import PodcastItem,  PodcastGeneratedListResponse
 from app.schemas.podcast import PodcastDetailResponse
+from app.schemas.podcast import ScriptGenerateRequest
+from app.core import metrics
+from app.core.config import settings
 from app.models.podcast import Podcast
+from app.db.database import AsyncSessionLocal, engine
 from app.llm_providers.base import generate_text_stream
-from typing import AsyncGenerator,List
+from app.llm_providers.script_chunks import rename_speakers
+from app.llm_providers.cache import cache_key
+from app.services import singleflight
+from app.services.near_duplicate import near_duplicate_index
+from app.services.detail_cache import CachedDetail, detail_cache, encode_detail
+from app.services.transcripts import decode_transcripts, join_transcript, load_transcript, transcript_columns
 
+batch_items_total = metrics.counter(
+    "podcast_batch_items_total",
+    "批量生成中完成的条目数，status为succeeded/failed",
+    ["status"]
+)
 
+near_duplicate_reuse_total = metrics.counter(
+    "podcast_near_duplicate_reuse_total",
+    "开启reuseSimilar的生成查找近似重复记录的结果，result为script/outline（复用方式）或miss",
+    ["result"]
+)
 
-async def list_generated_podcasts(db: AsyncSession) -> PodcastGeneratedListResponse:
+# 批量生成时等待发送的事件数上限，客户端读取过慢时生成协程在此等待
+BATCH_EVENT_BUFFER = 256
+
+
+def encode_cursor(created_at: datetime, podcast_id: int) -> str:
+    """将分页位置编码为不透明游标"""
+    raw = f"{created_at.isoformat()}|{podcast_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，格式非法时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, podcast_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(podcast_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+async def list_generated_podcasts(
+    db: AsyncSession,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: str = "full",
+    excerpt_length: int = 0
+) -> PodcastGeneratedListResponse:
+    """
+    按 (created_at, id) 倒序键集分页查询播客列表
+
+    - ``cursor``：上一页返回的 ``next_cursor``，为空表示第一页
+    - ``fields``：``full`` 返回全部字段；``summary`` 不查询 ``content`` 与脚本
+    - ``excerpt_length``：大于0时返回脚本开头作为 ``excerpt``
+
+    ``total`` 只在第一页返回（之后的页为None），MySQL上为统计信息中的估计行数，不扫描全表。
+    脚本压缩存储在 ``transcript_blob`` 表，只有需要脚本（full模式或excerpt）时才关联查询并解压本页记录。
+    """
     from sqlalchemy import desc
-    stmt = select(Podcast).order_by(desc(Podcast.created_at))
+    columns = [Podcast.id, Podcast.voice_ids, Podcast.content_type, Podcast.title, Podcast.created_at]
+    if fields == "full":
+        columns.append(Podcast.content)
+    need_transcript = fields == "full" or excerpt_length > 0
+    if need_transcript:
+        columns += transcript_columns()
+    
+    # 多取一条用于判断是否还有下一页
+    stmt = select(*columns).order_by(desc(Podcast.created_at), desc(Podcast.id)).limit(limit + 1)
+    if need_transcript:
+        stmt = join_transcript(stmt)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Podcast.created_at < cursor_created_at,
+            and_(Podcast.created_at == cursor_created_at, Podcast.id < cursor_id)
+        ))
     result = await db.execute(stmt)
-    podcasts = result.scalars().all()
+    rows = result.mappings().all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    
+    transcripts = await decode_transcripts(db, rows) if need_transcript else [None] * len(rows)
     items = [PodcastItem(
-        id=p.id,
-        content=p.content,
-        voice_ids=p.voice_ids,
-        content_type=p.content_type,
-        transcript=p.transcript,
-        title=p.title,
-        created_at=p.created_at.strftime("%Y-%m-%d %H:%M:%S")
-    ) for p in podcasts]
-    return PodcastGeneratedListResponse(total=len(items), items=items)
+        id=row["id"],
+        content=row.get("content"),
+        voice_ids=row["voice_ids"],
+        content_type=row["content_type"],
+        transcript=transcript if fields == "full" else None,
+        excerpt=transcript[:excerpt_length] if transcript and excerpt_length > 0 else None,
+        title=row["title"],
+        created_at=row["created_at"].strftime("%Y-%m-%d %H:%M:%S")
+    ) for row, transcript in zip(rows, transcripts)]
+    
+    total = await estimate_podcast_count(db) if cursor is None else None
+    return PodcastGeneratedListResponse(total=total, items=items, next_cursor=next_cursor)
+
+async def estimate_podcast_count(db: AsyncSession) -> int:
+    """
+    播客总数：MySQL取information_schema中InnoDB的估计行数（误差可达数十个百分点，但不扫描表），
+    其他数据库（SQLite等，用于开发与压测）使用COUNT(*)
+    """
+    if engine.dialect.name == "mysql":
+        estimate = (await db.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {"table": Podcast.__tablename__})).scalar()
+        if estimate is not None:
+            return int(estimate)
+    return (await db.execute(select(func.count()).select_from(Podcast))).scalar_one()
+
 
 async def get_podcast_detail(db: AsyncSession, podcast_id: int) -> PodcastDetailResponse:
     from sqlalchemy import select
@@ -37,12 +138,32 @@ async def get_podcast_detail(db: AsyncSession, podcast_id: int) -> PodcastDetail
         id=podcast.id,
         content=podcast.content,
         voice_ids=podcast.voice_ids,
-        transcript=podcast.transcript,
+        transcript=await load_transcript(db, podcast.id),
         content_type=podcast.content_type,
         title=podcast.title
     )
 
 
+async def get_podcast_detail_cached(db: AsyncSession, podcast_id: int) -> Optional[CachedDetail]:
+    """
+    读穿缓存获取预先序列化的播客详情，记录不存在时返回None（不缓存不存在的结果）
+    """
+    cached = detail_cache.get(podcast_id)
+    if cached is not None:
+        return cached
+    detail = await get_podcast_detail(db, podcast_id)
+    if detail is None:
+        return None
+    cached = encode_detail(detail)
+    detail_cache.put(podcast_id, cached)
+    return cached
+
+
+def invalidate_podcast_detail(podcast_id: int) -> None:
+    """修改或删除播客记录后调用，使详情缓存失效"""
+    detail_cache.invalidate(podcast_id)
+
+
 
 
 
@@ -62,11 +183,206 @@ async def generate_script_stream(
     content: str, 
     contentType: str = None, 
     voices: List[str] = [],
-    db: AsyncSession = None,
-    language: str = "中文"
-) -> AsyncGenerator[str, None]:
-    """流式生成播客脚本"""
-    
-    # 调用generate_text_stream函数
-    async for text_chunk in generate_text_stream(content, contentType, voices, target_language=language, db=db):
-        yield text_chunk
+    persist: bool = False,
+    language: str = "中文",
+    use_cache: bool = True,
+    deadline: Optional[float] = None,
+    reuse_threshold: Optional[float] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    流式生成播客脚本，产出阶段进度与文本片段等事件
+
+    相同参数的并发请求合并为一次生成：共享同一个LLM流程和同一条数据库记录，
+    晚加入的请求会先收到已产生的事件。``persist=True`` 时生成结果经批量写入队列保存，
+    生成期间不占用数据库连接。``deadline`` 为整体截止时间（秒），合并的请求沿用发起生成的请求的截止时间。
+    ``reuse_threshold`` 不为None时，先查找相似度不低于该值的已保存脚本并复用（见 ``find_similar_script``）。
+    """
+    flight = _script_flight(content, contentType, voices, persist, language, use_cache, deadline, reuse_threshold)
+    async for event in flight.subscribe():
+        yield event
+
+
+def _script_flight(
+    content: str,
+    contentType: Optional[str],
+    voices: List[str],
+    persist: bool,
+    language: str,
+    use_cache: bool,
+    deadline: Optional[float] = None,
+    reuse_threshold: Optional[float] = None
+) -> singleflight.Flight:
+    """相同参数的生成请求共享的事件流；截止时间不影响生成结果，不计入合并的键"""
+    async def run_pipeline():
+        reuse = None
+        if reuse_threshold is not None:
+            reuse = await find_similar_script(content, contentType, voices, reuse_threshold)
+        async for event in generate_text_stream(
+            content, contentType, voices, target_language=language, persist=persist, use_cache=use_cache,
+            deadline=deadline, reuse=reuse
+        ):
+            yield event
+
+    key = cache_key("generate_script", content, contentType, voices, language, use_cache, persist, reuse_threshold)
+    return singleflight.acquire(key, run_pipeline)
+
+
+def open_script_session(
+    content: str,
+    contentType: str = None,
+    voices: List[str] = [],
+    persist: bool = False,
+    language: str = "中文",
+    use_cache: bool = True,
+    deadline: Optional[float] = None,
+    reuse_threshold: Optional[float] = None
+) -> Tuple[str, AsyncGenerator[Dict[str, Any], None]]:
+    """
+    与 ``generate_script_stream`` 相同，但返回 ``(会话ID, 事件流)``，事件带从1开始的编号 ``id``。
+    客户端断开后生成继续运行一段时间（``SSE_DISCONNECT_MODE=finish`` 时运行到结束并保存），
+    可用 ``resume_script_session`` 从最后收到的事件之后续传。
+    """
+    flight = _script_flight(content, contentType, voices, persist, language, use_cache, deadline, reuse_threshold)
+    return flight.session_id, flight.subscribe(numbered=True, linger=disconnect_linger())
+
+
+def reuse_threshold_for(req: ScriptGenerateRequest) -> Optional[float]:
+    """请求开启reuseSimilar时复用已有脚本的相似度阈值，未开启（或索引未启用）时返回None"""
+    if not req.reuseSimilar or not settings.near_duplicate_index:
+        return None
+    return req.similarityThreshold or settings.near_duplicate_threshold
+
+
+async def find_similar_script(
+    content: str,
+    contentType: Optional[str],
+    voices: List[str],
+    threshold: float
+) -> Optional[Dict[str, Any]]:
+    """
+    在近似重复索引中查找内容类型相同、相似度不低于threshold的已保存脚本。
+    发言人数相同时按顺序替换发言人后复用脚本（``mode=script``），否则作为精确内容重新编写脚本（``mode=outline``）；
+    没有可复用的记录（或查询失败）时返回None，按正常流程生成
+    """
+    matches = await near_duplicate_index.lookup(content, threshold)
+    if not matches:
+        near_duplicate_reuse_total.inc(result="miss")
+        return None
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(join_transcript(
+                select(Podcast.id, Podcast.voice_ids, Podcast.content_type, *transcript_columns())
+                .where(Podcast.id.in_([podcast_id for podcast_id, _ in matches]))
+            ))
+            found = result.mappings().all()
+            transcripts = await decode_transcripts(db, found)
+    except Exception as e:
+        print(f"警告：读取近似重复记录失败，按正常流程生成: {e}")
+        near_duplicate_reuse_total.inc(result="miss")
+        return None
+    rows = {row["id"]: (row, transcript) for row, transcript in zip(found, transcripts)}
+    voices = voices[:5]
+    for podcast_id, similarity in matches:
+        if podcast_id not in rows:
+            continue
+        row, transcript = rows[podcast_id]
+        if not transcript or row["content_type"] != contentType:
+            continue
+        stored_voices = [voice for voice in row["voice_ids"].split(",") if voice]
+        if len(stored_voices) == len(voices):
+            mode = "script"
+            script = rename_speakers(transcript, dict(zip(stored_voices, voices)))
+        else:
+            mode = "outline"
+            script = transcript
+        near_duplicate_reuse_total.inc(result=mode)
+        return {
+            "podcast_id": podcast_id,
+            "similarity": similarity,
+            "mode": mode,
+            "script": script,
+            "unchanged": mode == "script" and stored_voices == voices and script == transcript
+        }
+    near_duplicate_reuse_total.inc(result="miss")
+    return None
+
+
+def disconnect_linger() -> float:
+    """客户端全部断开后生成流程继续运行的秒数"""
+    if settings.sse_disconnect_mode == "finish":
+        return math.inf
+    return settings.sse_resume_grace_seconds
+
+
+async def resume_script_session(
+    session_id: str,
+    last_event_id: int = 0
+) -> Optional[AsyncGenerator[Dict[str, Any], None]]:
+    """
+    续传生成会话，回放编号大于last_event_id的事件并跟随仍在运行的生成，不会再次调用LLM。
+    会话不存在或已过期时返回None，事件已移出回放缓冲时抛出 ``singleflight.EventsEvicted``
+    """
+    return await singleflight.resume(session_id, last_event_id)
+
+
+async def generate_script_batch(
+    items: List[ScriptGenerateRequest],
+    concurrency: int
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    以有限的并发生成多份脚本，按产生的先后顺序产出带 ``index``（条目在请求中的下标）的事件，
+    快的条目不必等待慢的条目。
+
+    每个条目结束时产出 ``done`` 事件（status、podcast_id、error），单个条目失败不影响其他条目；
+    全部结束后产出 ``batch`` 汇总事件。各条目的结果经批量写入队列保存，
+    同时完成的条目在同一个事务中提交。调用方停止读取（如客户端断开）时取消未完成的条目。
+    """
+    events: asyncio.Queue = asyncio.Queue(maxsize=BATCH_EVENT_BUFFER)
+    pending = iter(enumerate(items))
+
+    async def run_item(index: int, req: ScriptGenerateRequest) -> None:
+        podcast_id = None
+        error = None
+        try:
+            async for event in generate_script_stream(
+                req.content,
+                req.contentType,
+                req.voices,
+                persist=True,
+                language=req.language,
+                use_cache=not req.bypassCache,
+                deadline=req.deadlineSeconds,
+                reuse_threshold=reuse_threshold_for(req)
+            ):
+                if event["event"] == "saved":
+                    podcast_id = event["podcast_id"]
+                elif event["event"] == "error":
+                    error = event["text"].strip()
+                await events.put({"index": index, **event})
+        except Exception as e:
+            error = f"生成过程中出现错误: {e}"
+        status = "succeeded" if podcast_id is not None else "failed"
+        if status == "failed" and error is None:
+            error = "生成未完成"
+        batch_items_total.inc(status=status)
+        await events.put({"index": index, "event": "done", "status": status, "podcast_id": podcast_id, "error": error})
+
+    async def worker() -> None:
+        # 各worker共享同一个迭代器，依次领取下一个条目
+        for index, req in pending:
+            await run_item(index, req)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    finished = succeeded = 0
+    try:
+        while finished < len(items):
+            event = await events.get()
+            if event["event"] == "done":
+                finished += 1
+                succeeded += event["status"] == "succeeded"
+            yield event
+        yield {"event": "batch", "total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
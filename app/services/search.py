@@ -0,0 +1,290 @@
+"""
+播客全文搜索。
+
+两种后端（``SEARCH_BACKEND``，auto时MySQL使用mysql，其他数据库使用memory）：
+- ``mysql``：``podcast_search_text`` 表上的FULLTEXT ngram索引（见 ``init_db.sql``），按MATCH相关度排序。
+  脚本压缩存储，批量写入时在同一事务中另存标题、内容摘要与脚本开头 ``SEARCH_TRANSCRIPT_CHARS`` 字的明文
+  供检索（明文不压缩，只保存有限的开头），已有记录由 ``python -m app.db.migrate_transcripts`` 补建。
+  索引在数据库中，多个worker进程的结果一致；
+- ``memory``：进程内的倒排索引，中日韩文本按相邻两字（与MySQL ngram_token_size=2一致）、
+  其他文本按单词切分，使用BM25打分。启动时分批加载已有记录（解压脚本），之后随本进程的批量写入增量更新，
+  只适合单进程部署（其他worker写入的记录要到重启后才能搜到）。
+
+两种后端都只通过索引得到一页结果的ID，再按主键取出这一页的记录生成高亮片段，查询不扫描全表。
+"""
+import asyncio
+import heapq
+import html
+import math
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, engine
+from app.db.writer import podcast_writer
+from app.models.podcast import Podcast
+from app.models.search import PodcastSearchText
+from app.schemas.podcast import PodcastSearchItem, PodcastSearchResponse
+from app.services.transcripts import decode_transcripts, join_transcript, transcript_columns
+
+search_seconds = metrics.histogram(
+    "podcast_search_seconds",
+    "搜索查询耗时（不含高亮片段的记录读取）",
+    ["backend"]
+)
+search_index_documents = metrics.gauge(
+    "podcast_search_index_documents",
+    "进程内搜索索引中的记录数"
+)
+
+# 中日韩文字连续段，或字母数字组成的单词
+_TOKEN = re.compile(
+    r"(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)"
+    r"|(?P<word>[0-9a-z\u00c0-\u024f]+)"
+)
+# 标题中的词按该倍数计入词频
+TITLE_WEIGHT = 3
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 启动时每批加载的记录数
+BUILD_BATCH = 500
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """切分检索词：中日韩文字取相邻两字（单字段保留单字），其他文字取小写单词"""
+    terms = []
+    for match in _TOKEN.finditer((text or "").lower()):
+        run = match.group()
+        if match.lastgroup == "word" or len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class BigramIndex:
+    """进程内倒排索引：词 -> {记录ID: 加权词频}"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.ready = False
+        self._build_task: Optional[asyncio.Task] = None
+
+    def add(self, podcast_id: int, title: Optional[str], content: Optional[str], transcript: Optional[str]) -> None:
+        if podcast_id in self.doc_lengths:
+            return
+        frequencies: Dict[str, int] = defaultdict(int)
+        for term in tokenize(title):
+            frequencies[term] += TITLE_WEIGHT
+        for term in tokenize(content):
+            frequencies[term] += 1
+        for term in tokenize(transcript):
+            frequencies[term] += 1
+        for term, frequency in frequencies.items():
+            self.postings[term][podcast_id] = frequency
+        length = sum(frequencies.values())
+        self.doc_lengths[podcast_id] = length
+        self.total_length += length
+        search_index_documents.set(len(self.doc_lengths))
+
+    def add_records(self, records: Sequence[Dict[str, Any]]) -> None:
+        """批量写入的回调：把新插入的记录加入索引（使用进程内索引时）"""
+        if search_backend() != "memory":
+            return
+        for record in records:
+            self.add(record["id"], record.get("title"), record.get("content"), record.get("transcript"))
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[int, List[Tuple[int, float]]]:
+        """返回 (命中总数, 第offset起的limit条 (记录ID, 得分))"""
+        terms = set(tokenize(query))
+        if not terms or not self.doc_lengths:
+            return 0, []
+        documents = len(self.doc_lengths)
+        average_length = self.total_length / documents
+        scores: Dict[int, float] = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for podcast_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[podcast_id] / average_length)
+                scores[podcast_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return len(scores), top[offset:]
+
+    def start(self) -> None:
+        """后台分批加载已有记录，加载期间的查询只覆盖已加载部分"""
+        if self._build_task is None:
+            self._build_task = asyncio.create_task(self._build())
+
+    async def stop(self) -> None:
+        if self._build_task is not None:
+            self._build_task.cancel()
+            await asyncio.gather(self._build_task, return_exceptions=True)
+            self._build_task = None
+
+    async def _build(self) -> None:
+        last_id = 0
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(join_transcript(
+                        select(Podcast.id, Podcast.title, Podcast.content, *transcript_columns())
+                        .where(Podcast.id > last_id)
+                        .order_by(Podcast.id)
+                        .limit(BUILD_BATCH)
+                    ))
+                    rows = result.mappings().all()
+                    transcripts = await decode_transcripts(db, rows)
+                if not rows:
+                    break
+                for row, transcript in zip(rows, transcripts):
+                    self.add(row["id"], row["title"], row["content"], transcript)
+                last_id = rows[-1]["id"]
+                # 让出事件循环，避免加载大量记录时阻塞请求
+                await asyncio.sleep(0)
+            self.ready = True
+        except Exception as e:
+            print(f"警告：加载搜索索引失败: {e}")
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "documents": len(self.doc_lengths), "terms": len(self.postings)}
+
+
+def search_backend() -> str:
+    backend = settings.search_backend
+    if backend == "auto":
+        return "mysql" if engine.dialect.name == "mysql" else "memory"
+    return backend
+
+
+def search_body(title: Optional[str], content: Optional[str], transcript: Optional[str]) -> str:
+    """MySQL全文检索的明文：标题、内容摘要与脚本开头（不超过 ``SEARCH_TRANSCRIPT_CHARS`` 字）"""
+    excerpt = transcript[:settings.search_transcript_chars] if transcript else None
+    return "\n".join(text for text in (title, content, excerpt) if text)
+
+
+async def store_search_text(db: AsyncSession, records: Sequence[Dict[str, Any]]) -> None:
+    """批量写入的事务内回调：使用MySQL全文检索时另存新记录的明文"""
+    if search_backend() != "mysql":
+        return
+    db.add_all([
+        PodcastSearchText(
+            podcast_id=record["id"],
+            body=search_body(record.get("title"), record.get("content"), record.get("transcript"))
+        )
+        for record in records
+    ])
+
+
+search_index = BigramIndex()
+podcast_writer.add_listener(search_index.add_records)
+podcast_writer.add_insert_hook(store_search_text)
+
+
+def highlight(text: Optional[str], query: str, width: int) -> str:
+    """截取命中最集中位置附近的片段，HTML转义后用<em>标记命中词"""
+    text = text or ""
+    lowered = text.lower()
+    marked = [False] * len(text)
+    for term in set(tokenize(query)):
+        start = lowered.find(term)
+        while start != -1:
+            for i in range(start, start + len(term)):
+                marked[i] = True
+            start = lowered.find(term, start + 1)
+    if not any(marked):
+        snippet_start = 0
+    else:
+        # 选取命中字符最多的窗口，前面留出少量上下文
+        best, best_count, count = 0, -1, 0
+        for i in range(len(text)):
+            count += marked[i]
+            if i >= width:
+                count -= marked[i - width]
+            if count > best_count:
+                best, best_count = max(0, i - width + 1), count
+        first_hit = marked.index(True, best)
+        snippet_start = max(0, min(best, first_hit - width // 4))
+    end = min(len(text), snippet_start + width)
+    parts = []
+    i = snippet_start
+    while i < end:
+        j = i
+        while j < end and marked[j] == marked[i]:
+            j += 1
+        segment = html.escape(text[i:j])
+        parts.append(f"<em>{segment}</em>" if marked[i] else segment)
+        i = j
+    prefix = "…" if snippet_start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+async def _mysql_search(db: AsyncSession, query: str, limit: int, offset: int) -> Tuple[int, List[Tuple[int, float]]]:
+    from sqlalchemy.dialects.mysql import match
+
+    relevance = match(PodcastSearchText.body, against=query).in_natural_language_mode()
+    score = relevance.label("score")
+    result = await db.execute(
+        select(PodcastSearchText.podcast_id, score)
+        .where(relevance)
+        .order_by(score.desc(), PodcastSearchText.podcast_id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    hits = [(row.podcast_id, float(row.score)) for row in result]
+    total = (await db.execute(select(func.count()).select_from(PodcastSearchText).where(relevance))).scalar_one()
+    return total, hits
+
+
+async def search_podcasts(db: AsyncSession, query: str, limit: int = 20, offset: int = 0) -> PodcastSearchResponse:
+    """
+    搜索播客，按相关度排序并分页，返回带高亮片段的结果。
+    检索词中没有可用的词时抛出ValueError。
+    """
+    if not tokenize(query):
+        raise ValueError("搜索关键词不能为空")
+    backend = search_backend()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    if backend == "mysql":
+        total, hits = await _mysql_search(db, query, limit, offset)
+    else:
+        total, hits = search_index.search(query, limit, offset)
+    search_seconds.observe(loop.time() - start, backend=backend)
+
+    if not hits:
+        return PodcastSearchResponse(total=total, items=[], next_offset=None)
+    result = await db.execute(join_transcript(
+        select(Podcast.id, Podcast.title, Podcast.content_type, Podcast.created_at, Podcast.content, *transcript_columns())
+        .where(Podcast.id.in_([podcast_id for podcast_id, _ in hits]))
+    ))
+    found = result.mappings().all()
+    transcripts = await decode_transcripts(db, found)
+    rows = {row["id"]: (row, transcript) for row, transcript in zip(found, transcripts)}
+    items = []
+    for podcast_id, score in hits:
+        if podcast_id not in rows:
+            # 索引中有但记录已被删除
+            continue
+        row, transcript = rows[podcast_id]
+        items.append(PodcastSearchItem(
+            id=row["id"],
+            title=row["title"],
+            content_type=row["content_type"],
+            created_at=row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if row["created_at"] else None,
+            score=round(score, 4),
+            snippet=highlight(transcript or row["content"], query, settings.search_snippet_chars)
+        ))
+    next_offset = offset + limit if offset + limit < total else None
+    return PodcastSearchResponse(total=total, items=items, next_offset=next_offset)
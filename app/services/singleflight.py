@@ -0,0 +1,323 @@
+"""
+相同请求的单飞（single-flight）合并与可续传的生成会话。
+
+同一个键同时只运行一个事件流，后续相同请求作为订阅者挂到正在运行的流上：
+- 每个订阅者都会收到完整的事件序列，晚加入者先回放已产生的事件；
+- 只有最后一个订阅者离开时才取消底层任务，取消会传递到正在执行的节点及其LLM请求；
+  可续传的订阅者全部离开后，底层任务继续运行 ``SSE_RESUME_GRACE_SECONDS`` 秒等待重连，超时才取消
+  （``SSE_DISCONNECT_MODE=finish`` 时则在后台运行到结束）；
+- 底层流结束后自动从注册表移除，之后的相同请求会开启新的执行。
+
+每次执行是一个会话，有会话ID，事件按产生顺序从1开始编号。断线的客户端带上最后收到的事件编号，
+即可回放之后的事件并继续跟随正在运行的流，不会再次调用LLM：
+- 回放缓冲最多保留 ``SSE_REPLAY_MAX_EVENTS`` 个事件，超出时丢弃最早的事件，
+  读取过慢、落后超过缓冲的订阅者收到error事件后结束；
+- 结束的会话在内存中保留 ``SSE_REPLAY_TTL`` 秒（最多 ``SSE_REPLAY_MAX_SESSIONS`` 个）；
+  开启 ``SSE_REPLAY_PERSIST`` 时，正常结束的会话还会压缩写入数据库 ``generation_session`` 表，
+  进程重启或内存中的会话过期后仍可回放。持久层读写失败只打印警告。
+"""
+import asyncio
+import json
+import math
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+coalesced_requests_total = metrics.counter(
+    "podcast_coalesced_requests_total",
+    "合并到已在运行的生成流程上的请求数"
+)
+session_resumes_total = metrics.counter(
+    "podcast_session_resumes_total",
+    "生成会话的续传请求数，result为memory/database/not_found/evicted",
+    ["result"]
+)
+orphaned_flights_total = metrics.counter(
+    "podcast_orphaned_flights_total",
+    "所有订阅者都已离开的生成流程，outcome为cancelled（被取消）/resumed（有订阅者重新加入）/"
+    "completed（在后台运行到结束）",
+    ["outcome"]
+)
+lagging_readers_total = metrics.counter(
+    "podcast_lagging_readers_total",
+    "读取过慢、要读取的事件已移出回放缓冲而提前结束的订阅者数"
+)
+
+
+class EventsEvicted(LookupError):
+    """要续传的事件已被移出回放缓冲"""
+
+
+class EventBuffer:
+    """可被多个读者从头回放并跟随的事件序列，可限制保留的事件数"""
+
+    def __init__(self, max_events: Optional[int] = None):
+        self.events: List[Dict[str, Any]] = []
+        # events[0]在整个序列中的下标，丢弃最早的事件后大于0
+        self.first = 0
+        self.max_events = max_events
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    def __len__(self) -> int:
+        """已产生的事件总数（含已丢弃的）"""
+        return self.first + len(self.events)
+
+    async def append(self, event: Dict[str, Any]) -> None:
+        async with self._changed:
+            self.events.append(event)
+            if self.max_events is not None and len(self.events) > self.max_events:
+                del self.events[0]
+                self.first += 1
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def follow(self, start: int = 0, numbered: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        从第start个事件开始回放，并跟随后续事件直到关闭。
+        ``numbered`` 时每个事件带上从1开始的编号 ``id``。
+        读者落后太多、要读取的事件已被丢弃时，以一个不带编号的error事件结束，
+        客户端保留的 ``Last-Event-ID`` 不变，续传时得到410后重新发起生成
+        """
+        index = start
+        while True:
+            async with self._changed:
+                while index >= len(self) and not self.done:
+                    await self._changed.wait()
+                evicted = index < self.first
+                batch = self.events[index - self.first:]
+                first_id = index + 1
+                index = len(self)
+                finished = self.done
+            if evicted:
+                lagging_readers_total.inc()
+                yield {"event": "error", "text": f"\n读取过慢，事件{first_id}已移出回放缓冲，请重新生成\n"}
+                return
+            for offset, event in enumerate(batch):
+                yield {**event, "id": first_id + offset} if numbered else event
+            if finished and index >= len(self):
+                return
+
+
+class Flight:
+    """一次正在运行的事件流（一个会话）及其订阅者"""
+
+    def __init__(self, key: str, source: Callable[[], AsyncGenerator[Dict[str, Any], None]]):
+        self.key = key
+        self.session_id = uuid.uuid4().hex
+        self.buffer = EventBuffer(max_events=settings.sse_replay_max_events)
+        self.subscribers = 0
+        # 最后一个订阅者离开后继续运行、等待重连的秒数，无穷大表示运行到结束
+        self.linger = 0.0
+        # 底层流正常结束（含以error事件结束），而不是被取消
+        self.completed = False
+        # 所有订阅者都已离开
+        self.orphaned = False
+        self._abandon_handle: Optional[asyncio.TimerHandle] = None
+        _running[self.session_id] = self
+        self._task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source: Callable[[], AsyncGenerator[Dict[str, Any], None]]) -> None:
+        try:
+            async for event in source():
+                await self.buffer.append(event)
+            self.completed = True
+        except asyncio.CancelledError:
+            # 续传的客户端能看到生成被取消，而不是流直接结束
+            await self.buffer.append({"event": "error", "text": "\n生成已取消\n"})
+            raise
+        except Exception as e:
+            await self.buffer.append({"event": "error", "text": f"\n生成过程中出现错误: {str(e)}\n"})
+            self.completed = True
+        finally:
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+            await self.buffer.close()
+            if self.orphaned and self.completed:
+                orphaned_flights_total.inc(outcome="completed")
+            _finish(self)
+
+    def subscribe(
+        self, start: int = 0, numbered: bool = False, linger: float = 0.0
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        订阅事件流，从第start个事件开始回放再跟随后续事件。
+        ``linger`` 大于0时，所有订阅者离开后底层流程继续运行该秒数等待重连，无穷大时运行到结束。
+        开始迭代时才计入订阅者，从未迭代就被丢弃的订阅不会让底层流程一直运行
+        """
+        return self._follow(start, numbered, linger)
+
+    async def _follow(self, start: int, numbered: bool, linger: float) -> AsyncGenerator[Dict[str, Any], None]:
+        self.subscribers += 1
+        self.linger = max(self.linger, linger)
+        if self.orphaned and not self.buffer.done:
+            orphaned_flights_total.inc(outcome="resumed")
+        self.orphaned = False
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+        try:
+            async for event in self.buffer.follow(start, numbered):
+                yield event
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.buffer.done:
+                self.orphaned = True
+                if self.linger == math.inf:
+                    pass
+                elif self.linger > 0:
+                    self._abandon_handle = asyncio.get_running_loop().call_later(self.linger, self._abandon)
+                else:
+                    self._abandon()
+
+    def _abandon(self) -> None:
+        """最后一个订阅者离开（且等待重连超时）后取消底层流程"""
+        self._abandon_handle = None
+        if self.subscribers == 0 and not self.buffer.done:
+            orphaned_flights_total.inc(outcome="cancelled")
+            self._task.cancel()
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+
+
+_flights: Dict[str, Flight] = {}
+# 会话ID -> 会话：运行中的，以及结束后仍在内存中保留的（按过期时间排序）
+_running: Dict[str, Flight] = {}
+_finished: "OrderedDict[str, Tuple[float, Flight]]" = OrderedDict()
+# 进行中的持久化写入，保留引用避免任务被回收
+_stores: Set[asyncio.Task] = set()
+
+
+def acquire(key: str, source: Callable[[], AsyncGenerator[Dict[str, Any], None]]) -> Flight:
+    """键对应的正在运行的流，不存在时用source启动一个新的"""
+    flight = _flights.get(key)
+    # 回放缓冲已丢弃开头的事件时，晚加入者收不到完整序列，开启新的执行
+    if flight is None or flight.buffer.first > 0:
+        flight = _flights[key] = Flight(key, source)
+    else:
+        coalesced_requests_total.inc()
+    return flight
+
+
+def join(
+    key: str, source: Callable[[], AsyncGenerator[Dict[str, Any], None]]
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """加入键对应的事件流，不存在时用source启动一个新的"""
+    return acquire(key, source).subscribe()
+
+
+def in_flight() -> int:
+    """当前正在运行的流数量"""
+    return len(_flights)
+
+
+def _finish(flight: Flight) -> None:
+    """流结束后把会话转入保留区，正常结束的按配置写入数据库"""
+    _running.pop(flight.session_id, None)
+    now = time.monotonic()
+    if settings.sse_replay_ttl > 0:
+        _finished[flight.session_id] = (now + settings.sse_replay_ttl, flight)
+    while _finished and (
+        len(_finished) > settings.sse_replay_max_sessions or next(iter(_finished.values()))[0] < now
+    ):
+        _finished.popitem(last=False)
+    if settings.sse_replay_persist and flight.completed:
+        task = asyncio.create_task(_store(flight))
+        _stores.add(task)
+        task.add_done_callback(_stores.discard)
+
+
+def find_session(session_id: str) -> Optional[Flight]:
+    """内存中的会话（运行中或结束后未过期）"""
+    flight = _running.get(session_id)
+    if flight is not None:
+        return flight
+    item = _finished.get(session_id)
+    if item is None:
+        return None
+    if item[0] < time.monotonic():
+        del _finished[session_id]
+        return None
+    return item[1]
+
+
+def _check_resume(last_event_id: int, first: int, total: int) -> None:
+    if last_event_id > total:
+        raise ValueError(f"事件编号{last_event_id}超出会话已产生的事件数{total}")
+    if last_event_id < first:
+        session_resumes_total.inc(result="evicted")
+        raise EventsEvicted(f"事件{last_event_id + 1}已移出回放缓冲")
+
+
+async def resume(session_id: str, last_event_id: int = 0) -> Optional[AsyncGenerator[Dict[str, Any], None]]:
+    """
+    续传会话：回放编号大于last_event_id的事件（带编号 ``id``），会话仍在运行时继续跟随。
+    会话不存在或已过期时返回None；这些事件已被丢弃时抛出EventsEvicted，
+    编号超出已产生的事件数时抛出ValueError
+    """
+    flight = find_session(session_id)
+    if flight is not None:
+        _check_resume(last_event_id, flight.buffer.first, len(flight.buffer))
+        session_resumes_total.inc(result="memory")
+        return flight.subscribe(last_event_id, numbered=True, linger=settings.sse_resume_grace_seconds)
+    stored = await _load(session_id) if settings.sse_replay_persist else None
+    if stored is None:
+        session_resumes_total.inc(result="not_found")
+        return None
+    first, events = stored
+    _check_resume(last_event_id, first, first + len(events))
+    session_resumes_total.inc(result="database")
+    return _replay(events, first, last_event_id)
+
+
+async def _replay(events: List[Dict[str, Any]], first: int, start: int) -> AsyncGenerator[Dict[str, Any], None]:
+    for index in range(start, first + len(events)):
+        yield {**events[index - first], "id": index + 1}
+
+
+async def _store(flight: Flight) -> None:
+    from app.db.database import AsyncSessionLocal
+    from app.models.generation_session import GenerationSession
+
+    buffer = flight.buffer
+    try:
+        payload = json.dumps(buffer.events, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        data = await asyncio.to_thread(zlib.compress, payload)
+        async with AsyncSessionLocal() as session:
+            await session.merge(GenerationSession(
+                session_id=flight.session_id,
+                first_event_id=buffer.first + 1,
+                last_event_id=len(buffer),
+                events=data,
+                expires_at=datetime.now() + timedelta(seconds=settings.sse_replay_persist_ttl)
+            ))
+            await session.commit()
+    except Exception as e:
+        print(f"警告：写入生成会话{flight.session_id}失败: {e}")
+
+
+async def _load(session_id: str) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+    """数据库中的会话：(首个事件的下标, 事件列表)"""
+    from app.db.database import AsyncSessionLocal
+    from app.models.generation_session import GenerationSession
+
+    try:
+        async with AsyncSessionLocal() as session:
+            entry = await session.get(GenerationSession, session_id)
+            if entry is None or entry.expires_at < datetime.now():
+                return None
+            events = json.loads(await asyncio.to_thread(zlib.decompress, entry.events))
+            return entry.first_event_id - 1, events
+    except Exception as e:
+        print(f"警告：读取生成会话{session_id}失败: {e}")
+        return None
@@ -0,0 +1,233 @@
+"""
+脚本的压缩存储。
+
+脚本不再内联在 ``podcast`` 表中，而是按内容寻址存入 ``transcript_blob`` 表：
+- 键为脚本原文的SHA-256，相同脚本（如缓存命中后重复保存）只存一份；
+- 用zlib（或安装了zstandard时可选zstd）压缩。各脚本共享大量套话，
+  因此用已有脚本训练压缩字典（``transcript_dictionary`` 表），每条记录注明使用的字典；
+- ``podcast`` 只保存哈希，列表等常规查询不再读取大字段，需要原文时再关联查询并解压。
+
+迁移前写入的记录仍保存在 ``podcast.transcript``（延迟加载列），读取时自动回退。
+"""
+import hashlib
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.podcast import Podcast
+from app.models.transcript import TranscriptBlob, TranscriptDictionary
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# zlib的窗口为32KB，更大的字典没有意义
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+ZSTD_DICTIONARY_SIZE = 64 * 1024
+
+
+def transcript_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_raw_dictionary(samples: Sequence[str], size: int = ZLIB_DICTIONARY_SIZE) -> bytes:
+    """
+    用样本构建原始内容字典：多份样本中重复出现的行放在末尾（离待压缩数据最近，匹配代价最低），
+    剩余空间用样本原文填充。
+    """
+    line_counts = Counter()
+    for sample in samples:
+        line_counts.update({line.strip() for line in sample.splitlines() if line.strip()})
+    common = [line for line, count in line_counts.most_common() if count > 1]
+    tail = b""
+    for line in common:
+        encoded = (line + "\n").encode("utf-8")
+        if len(tail) + len(encoded) > size // 2:
+            break
+        # 出现次数最多的行排在最后
+        tail = encoded + tail
+    head = b""
+    for sample in samples:
+        encoded = sample.encode("utf-8")
+        if len(head) + len(tail) + len(encoded) > size:
+            break
+        head += encoded
+    return head + tail
+
+
+class TranscriptCodec:
+    """压缩与解压，缓存已加载的字典"""
+
+    def __init__(self, codec: str, level: int):
+        if codec == "zstd" and not ZSTD_AVAILABLE:
+            print("警告：未安装zstandard，脚本压缩改用zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.level = level
+        # 字典ID -> (编码, 字典内容)
+        self.dictionaries: Dict[int, Tuple[str, bytes]] = {}
+        # 压缩新脚本时使用的字典
+        self.active: Optional[int] = None
+        self._zstd: Dict[Tuple[str, Optional[int]], Any] = {}
+
+    def train(self, samples: Sequence[str]) -> bytes:
+        """用样本脚本训练当前编码的字典"""
+        if self.codec == "zstd":
+            try:
+                trained = zstandard.train_dictionary(
+                    ZSTD_DICTIONARY_SIZE, [sample.encode("utf-8") for sample in samples]
+                )
+                return trained.as_bytes()
+            except zstandard.ZstdError:
+                # 样本太少时无法训练，退回原始内容字典
+                return build_raw_dictionary(samples, ZSTD_DICTIONARY_SIZE)
+        return build_raw_dictionary(samples)
+
+    def _zstd_dict(self, dictionary_id: Optional[int]) -> Optional[Any]:
+        if dictionary_id is None:
+            return None
+        return zstandard.ZstdCompressionDict(self.dictionaries[dictionary_id][1])
+
+    def compress(self, text: str) -> Tuple[str, Optional[int], bytes]:
+        """返回 (编码, 字典ID, 压缩数据)"""
+        raw = text.encode("utf-8")
+        dictionary_id = self.active
+        if self.codec == "zstd":
+            compressor = self._zstd.get(("c", dictionary_id))
+            if compressor is None:
+                compressor = self._zstd[("c", dictionary_id)] = zstandard.ZstdCompressor(
+                    level=self.level, dict_data=self._zstd_dict(dictionary_id)
+                )
+            return "zstd", dictionary_id, compressor.compress(raw)
+        if dictionary_id is None:
+            return "zlib", None, zlib.compress(raw, self.level)
+        compressor = zlib.compressobj(self.level, zdict=self.dictionaries[dictionary_id][1])
+        return "zlib", dictionary_id, compressor.compress(raw) + compressor.flush()
+
+    def decompress(self, codec: str, dictionary_id: Optional[int], data: bytes) -> str:
+        if codec == "zstd":
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("读取zstd压缩的脚本需要安装zstandard")
+            decompressor = self._zstd.get(("d", dictionary_id))
+            if decompressor is None:
+                decompressor = self._zstd[("d", dictionary_id)] = zstandard.ZstdDecompressor(
+                    dict_data=self._zstd_dict(dictionary_id)
+                )
+            return decompressor.decompress(data).decode("utf-8")
+        if dictionary_id is None:
+            return zlib.decompress(data).decode("utf-8")
+        decompressor = zlib.decompressobj(zdict=self.dictionaries[dictionary_id][1])
+        return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+
+    def add_dictionary(self, dictionary_id: int, codec: str, data: bytes) -> None:
+        self.dictionaries[dictionary_id] = (codec, data)
+        if codec == self.codec and (self.active is None or dictionary_id > self.active):
+            self.active = dictionary_id
+
+    async def load(self, db: Optional[AsyncSession] = None) -> None:
+        """加载所有字典，使用当前编码最新的字典压缩新脚本"""
+        await self.ensure(db, None)
+
+    async def ensure(self, db: Optional[AsyncSession], dictionary_ids: Optional[Iterable[int]]) -> None:
+        """确保指定（None表示全部）字典已加载"""
+        if dictionary_ids is not None:
+            missing = {i for i in dictionary_ids if i is not None and i not in self.dictionaries}
+            if not missing:
+                return
+        stmt = select(TranscriptDictionary.id, TranscriptDictionary.codec, TranscriptDictionary.data)
+        if dictionary_ids is not None:
+            stmt = stmt.where(TranscriptDictionary.id.in_(missing))
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                rows = (await session.execute(stmt)).all()
+        else:
+            rows = (await db.execute(stmt)).all()
+        for row in rows:
+            self.add_dictionary(row.id, row.codec, row.data)
+
+
+transcript_codec = TranscriptCodec(settings.transcript_codec, settings.transcript_compression_level)
+
+
+async def store_transcripts(db: AsyncSession, texts: Sequence[Optional[str]]) -> List[Optional[str]]:
+    """压缩并保存脚本（已存在的相同脚本跳过），返回各自的内容哈希；调用方负责提交"""
+    hashes: List[Optional[str]] = []
+    blobs: Dict[str, Dict[str, Any]] = {}
+    for text in texts:
+        if text is None:
+            hashes.append(None)
+            continue
+        digest = transcript_hash(text)
+        hashes.append(digest)
+        if digest not in blobs:
+            codec, dictionary_id, data = transcript_codec.compress(text)
+            blobs[digest] = {
+                "hash": digest,
+                "codec": codec,
+                "dictionary_id": dictionary_id,
+                "raw_size": len(text.encode("utf-8")),
+                "data": data
+            }
+    if blobs:
+        stmt = (
+            insert(TranscriptBlob)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite")
+        )
+        await db.execute(stmt, list(blobs.values()))
+    return hashes
+
+
+async def prepare_podcast_rows(db: AsyncSession, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """批量写入前把记录中的脚本原文换成压缩存储的哈希"""
+    hashes = await store_transcripts(db, [record.get("transcript") for record in records])
+    prepared = []
+    for record, digest in zip(records, hashes):
+        values = {k: v for k, v in record.items() if k != "transcript"}
+        values["transcript_hash"] = digest
+        prepared.append(values)
+    return prepared
+
+
+def transcript_columns() -> List[Any]:
+    """读取脚本所需的列，需配合 ``join_transcript()`` 使用"""
+    return [
+        Podcast.transcript.label("inline_transcript"),
+        TranscriptBlob.codec.label("transcript_codec"),
+        TranscriptBlob.dictionary_id.label("transcript_dictionary_id"),
+        TranscriptBlob.data.label("transcript_data")
+    ]
+
+
+def join_transcript(stmt: Any) -> Any:
+    return stmt.outerjoin(TranscriptBlob, TranscriptBlob.hash == Podcast.transcript_hash)
+
+
+async def decode_transcripts(db: AsyncSession, rows: Sequence[Mapping[str, Any]]) -> List[Optional[str]]:
+    """解压查询结果（mappings）中的脚本，未迁移的旧记录返回内联的原文"""
+    await transcript_codec.ensure(db, {row["transcript_dictionary_id"] for row in rows})
+    texts = []
+    for row in rows:
+        if row["transcript_data"] is not None:
+            texts.append(transcript_codec.decompress(
+                row["transcript_codec"], row["transcript_dictionary_id"], row["transcript_data"]
+            ))
+        else:
+            texts.append(row["inline_transcript"])
+    return texts
+
+
+async def load_transcript(db: AsyncSession, podcast_id: int) -> Optional[str]:
+    """读取单条播客的脚本"""
+    stmt = join_transcript(select(*transcript_columns()).select_from(Podcast).where(Podcast.id == podcast_id))
+    row = (await db.execute(stmt)).mappings().first()
+    if row is None:
+        return None
+    return (await decode_transcripts(db, [row]))[0]
@@ -0,0 +1,234 @@
+"""
+异步生成任务。
+
+提交任务后立即返回任务ID，任务在有界的asyncio worker池中执行：
+- worker数量与排队上限由 ``JOB_WORKERS`` / ``JOB_QUEUE_SIZE`` 配置；
+- 任务状态保存在 ``podcast_job`` 表，提交任务的进程是任务的owner并定期刷新心跳；
+  owner退出（正常停止时释放，崩溃时心跳过期）后，未完成的任务由某一个进程用带条件的UPDATE认领并重新排队，
+  多个worker进程同时启动时任务不会被重复执行；
+- 运行中任务的进度事件保存在内存中，可随时回放并跟随。
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.job import PodcastJob
+from app.schemas.podcast import ScriptGenerateRequest
+from app.services.podcast_service import generate_script_stream, reuse_threshold_for
+from app.services.singleflight import EventBuffer
+from app.services.transcripts import load_transcript
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """排队任务数达到上限"""
+
+
+class JobManager:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._progress: Dict[int, EventBuffer] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        # 本进程的标识，写入所认领任务的owner列
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-64:]
+
+    async def start(self) -> None:
+        """启动worker，认领上次未完成且无人负责的任务并重新排队"""
+        await self._claim_orphans()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._heartbeat = asyncio.create_task(self._keep_alive())
+
+    async def stop(self) -> None:
+        """停止worker并释放本进程的任务，正在执行的任务保持running状态，由下次启动的进程认领后重新执行"""
+        tasks = self._tasks + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._heartbeat = None
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(PodcastJob)
+                    .where(PodcastJob.owner == self.owner, PodcastJob.status.in_([QUEUED, RUNNING]))
+                    .values(owner=None, heartbeat_at=None)
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"警告：释放未完成的任务失败，将在心跳过期后由其他进程认领: {e}")
+
+    async def submit(self, req: ScriptGenerateRequest) -> int:
+        """保存并排队任务，返回任务ID；队列已满时抛出QueueFullError"""
+        if self._queue.qsize() >= self.queue_size:
+            raise QueueFullError("任务队列已满，请稍后重试")
+        async with AsyncSessionLocal() as db:
+            job = PodcastJob(
+                status=QUEUED, request=req.model_dump_json(), owner=self.owner, heartbeat_at=datetime.now()
+            )
+            db.add(job)
+            await db.commit()
+            job_id = job.id
+        await self._enqueue(job_id)
+        return job_id
+
+    async def get(self, job_id: int) -> Optional[PodcastJob]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(PodcastJob, job_id)
+
+    async def stream(self, job_id: int) -> AsyncGenerator[Dict[str, Any], None]:
+        """回放并跟随任务进度；任务已结束时直接返回结果"""
+        progress = self._progress.get(job_id)
+        if progress is not None:
+            async for event in progress.follow():
+                yield event
+            return
+        job = await self.get(job_id)
+        if job is None:
+            return
+        yield {"event": "job", "task_id": job.id, "status": job.status}
+        if job.status == SUCCEEDED and job.podcast_id:
+            async with AsyncSessionLocal() as db:
+                transcript = await load_transcript(db, job.podcast_id)
+            if transcript:
+                for paragraph in transcript.split("\n\n"):
+                    if paragraph.strip():
+                        yield {"event": "text", "text": paragraph.strip() + "\n\n"}
+            yield {"event": "saved", "podcast_id": job.podcast_id}
+        elif job.status == FAILED:
+            yield {"event": "error", "text": job.error or "任务失败"}
+
+    def pending(self) -> int:
+        """排队中的任务数"""
+        return self._queue.qsize()
+
+    async def _claim_orphans(self) -> List[int]:
+        """
+        认领无人负责（owner已释放或心跳过期）的排队中、运行中任务并重新排队，返回认领到的任务ID。
+
+        每个任务用带条件的UPDATE认领，多个进程同时认领同一任务时只有一个能更新成功。
+        """
+        stale = datetime.now() - timedelta(seconds=settings.job_stale_seconds)
+        # 本进程的任务即使心跳一时未刷新也仍在执行，不重复认领
+        orphaned = and_(
+            PodcastJob.status.in_([QUEUED, RUNNING]),
+            or_(PodcastJob.heartbeat_at.is_(None), PodcastJob.heartbeat_at < stale),
+            or_(PodcastJob.owner.is_(None), PodcastJob.owner != self.owner)
+        )
+        claimed = []
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(PodcastJob.id).where(orphaned).order_by(PodcastJob.id))
+            for job_id in result.scalars().all():
+                result = await db.execute(
+                    update(PodcastJob)
+                    .where(PodcastJob.id == job_id, orphaned)
+                    .values(status=QUEUED, owner=self.owner, heartbeat_at=datetime.now())
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+        for job_id in claimed:
+            await self._enqueue(job_id)
+        return claimed
+
+    async def _keep_alive(self) -> None:
+        """定期刷新本进程任务的心跳，并认领心跳过期（所属进程已崩溃）的任务"""
+        while True:
+            await asyncio.sleep(settings.job_heartbeat_interval)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(PodcastJob)
+                        .where(PodcastJob.owner == self.owner, PodcastJob.status.in_([QUEUED, RUNNING]))
+                        .values(heartbeat_at=datetime.now())
+                    )
+                    await db.commit()
+                await self._claim_orphans()
+            except Exception as e:
+                print(f"警告：刷新任务心跳失败: {e}")
+
+    async def _enqueue(self, job_id: int) -> None:
+        progress = self._progress[job_id] = EventBuffer()
+        await progress.append({"event": "job", "task_id": job_id, "status": QUEUED})
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"警告：任务{job_id}执行异常: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _set_status(self, job_id: int, **values: Any) -> bool:
+        """更新本进程负责的任务，任务已被其他进程认领时不更新并返回False"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(PodcastJob).where(PodcastJob.id == job_id, PodcastJob.owner == self.owner).values(**values)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _run(self, job_id: int) -> None:
+        progress = self._progress[job_id]
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            req = ScriptGenerateRequest(**json.loads(job.request))
+            if not await self._set_status(job_id, status=RUNNING, started_at=datetime.now()):
+                print(f"警告：任务{job_id}已由其他进程认领，跳过")
+                return
+            await progress.append({"event": "job", "task_id": job_id, "status": RUNNING})
+
+            podcast_id = None
+            error = None
+            async for event in generate_script_stream(
+                req.content,
+                req.contentType,
+                req.voices,
+                persist=True,
+                language=req.language,
+                use_cache=not req.bypassCache,
+                deadline=req.deadlineSeconds,
+                reuse_threshold=reuse_threshold_for(req)
+            ):
+                await progress.append(event)
+                if event["event"] == "saved":
+                    podcast_id = event["podcast_id"]
+                elif event["event"] == "error":
+                    error = event["text"].strip()
+
+            status = SUCCEEDED if podcast_id is not None else FAILED
+            if status == FAILED and error is None:
+                error = "生成未完成"
+            await self._set_status(
+                job_id, status=status, podcast_id=podcast_id, error=error, finished_at=datetime.now()
+            )
+            await progress.append({"event": "job", "task_id": job_id, "status": status})
+        except Exception as e:
+            await self._set_status(job_id, status=FAILED, error=str(e), finished_at=datetime.now())
+            await progress.append({"event": "job", "task_id": job_id, "status": FAILED})
+            raise
+        finally:
+            await progress.close()
+            self._progress.pop(job_id, None)
+
+
+job_manager = JobManager(workers=settings.job_workers, queue_size=settings.job_queue_size)
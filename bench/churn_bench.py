@@ -0,0 +1,203 @@
+"""
+客户端频繁断开（churn）下的离线压测，不消耗真实token。
+
+若干客户端循环发起 ``/podcast/generate_script``，每次只读取随机的一段时间就断开（模拟关闭页面），
+分别在两种断开处理模式下运行（见 ``SSE_DISCONNECT_MODE``）：
+- ``finish``：断开后生成流程在后台运行到结束并保存；
+- ``cancel``：断开后（等待 ``--grace`` 秒无人重连）取消生成流程，包括正在进行的LLM请求。
+
+每种模式输出发起的生成数（及因排队已满被拒绝的数量）、LLM请求数与提示词/回复字数（桩服务统计）、被中止的LLM请求数、
+保存的记录数、压测期间限流器占用（含排队）的并发槽位、停止压测后并发槽位全部释放所需的时间（含探测请求），
+以及压测结束时一次完整读取的探测请求的首段文本时间与总延迟（JSON）：
+
+    python -m bench.churn_bench --clients 16 --duration 20 --max-concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from bench.run_bench import AppServer, prepare_database, sse_messages, summarize
+from bench.stub_llm import StubConfig, start_stub_server
+
+ROLES = ["analyzer", "content_generator", "script_generator", "translator"]
+
+
+def request_body(text: str) -> Dict[str, Any]:
+    return {
+        "content": text,
+        "language": "中文",
+        "voices": ["voice-a", "voice-b"],
+        "contentType": "对话",
+        "timestamp": "churn",
+        # 内容各不相同且跳过缓存，保证每次都完整走一遍生成流程
+        "bypassCache": True
+    }
+
+
+async def read_for(client: httpx.AsyncClient, text: str, seconds: float) -> int:
+    """发起生成，读取seconds秒后断开，返回响应状态码"""
+    status = 0
+
+    async def read() -> None:
+        nonlocal status
+        async with client.stream("POST", "/podcast/generate_script", json=request_body(text)) as response:
+            status = response.status_code
+            async for _ in response.aiter_bytes():
+                pass
+
+    try:
+        await asyncio.wait_for(read(), seconds)
+    except asyncio.TimeoutError:
+        pass
+    return status
+
+
+async def probe(client: httpx.AsyncClient, text: str) -> Dict[str, Any]:
+    """完整读取一次生成，返回首段文本时间与总延迟"""
+    start = time.monotonic()
+    first_text = None
+    async with client.stream("POST", "/podcast/generate_script", json=request_body(text)) as response:
+        async for event_type, _ in sse_messages(response):
+            if first_text is None and event_type == "text":
+                first_text = time.monotonic() - start
+    return {"first_text": first_text, "latency": time.monotonic() - start}
+
+
+async def active_slots(client: httpx.AsyncClient) -> int:
+    limiters = (await client.get("/limiter")).json()["limiters"]
+    return sum(limiter["active"] + limiter["waiting"] for limiter in limiters)
+
+
+async def saved_rows(client: httpx.AsyncClient) -> int:
+    return (await client.get("/podcast/list", params={"limit": 1, "fields": "summary"})).json()["total"]
+
+
+async def run_mode(client: httpx.AsyncClient, mode: str, args: argparse.Namespace, stub: Any) -> Dict[str, Any]:
+    from app.core.config import settings
+
+    settings.sse_disconnect_mode = mode
+    settings.sse_resume_grace_seconds = args.grace
+    rng = random.Random(args.seed)
+    rows_before = await saved_rows(client)
+    stub.reset_stats()
+    sessions = rejected = 0
+    deadline = time.monotonic() + args.duration
+
+    async def churn(worker: int) -> None:
+        nonlocal sessions, rejected
+        while time.monotonic() < deadline:
+            sessions += 1
+            text = f"{mode}-{worker}-{sessions}：人工智能对教育的影响"
+            status = await read_for(client, text, rng.uniform(args.read_min, args.read_max))
+            if status == 429:
+                # 排队已满被拒绝，稍后重试
+                rejected += 1
+                await asyncio.sleep(args.read_min)
+
+    samples: List[int] = []
+
+    async def sample() -> None:
+        while True:
+            samples.append(await active_slots(client))
+            await asyncio.sleep(0.2)
+
+    sampling = asyncio.create_task(sample())
+    await asyncio.gather(*[churn(i) for i in range(args.clients)])
+    sampling.cancel()
+
+    async def drain() -> float:
+        stopped = time.monotonic()
+        while await active_slots(client) > 0 or stub.stats()["in_flight"] > 0:
+            await asyncio.sleep(0.2)
+        return time.monotonic() - stopped
+
+    # 压测停止时仍有遗留的生成流程，探测请求与它们争用并发槽位
+    draining = asyncio.create_task(drain())
+    probe_result = await probe(client, f"{mode}-probe：人工智能对教育的影响")
+    drain_seconds = await draining
+    # 等待后台完成的生成经批量写入队列落库
+    await asyncio.sleep(1)
+
+    return {
+        "sessions": sessions,
+        "rejected": rejected,
+        "llm": stub.stats(),
+        "saved_rows": await saved_rows(client) - rows_before - 1,
+        "active_slots": {
+            "mean": round(sum(samples) / len(samples), 2) if samples else 0.0,
+            **summarize([float(s) for s in samples])
+        },
+        "drain_seconds": round(drain_seconds, 2),
+        "probe": {key: round(value, 3) if value is not None else None for key, value in probe_result.items()}
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="客户端频繁断开下的压测")
+    parser.add_argument("--modes", default="finish,cancel")
+    parser.add_argument("--clients", type=int, default=16, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=20.0, help="每种模式的压测时长（秒）")
+    parser.add_argument("--read-min", type=float, default=0.5, help="每次断开前读取时间的下限（秒），也是被拒绝后的重试间隔")
+    parser.add_argument("--read-max", type=float, default=3.0, help="每次断开前读取时间的上限（秒）")
+    parser.add_argument("--grace", type=float, default=0.0, help="断开后等待重连的时间（秒）")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="每个endpoint的LLM并发上限")
+    parser.add_argument("--ttft", type=float, default=0.2, help="桩服务首token延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--reply-chars", type=int, default=400)
+    parser.add_argument("--stub-port", type=int, default=9231)
+    parser.add_argument("--app-port", type=int, default=9230)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    stub = start_stub_server(StubConfig(
+        latency_median=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        reply_chars=args.reply_chars
+    ), port=args.stub_port)
+    # 须在导入app模块之前设置
+    path = os.path.join(tempfile.mkdtemp(prefix="podcast-churn-"), "bench.db")
+    os.environ["DATABASE_DSN"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_WARMUP"] = "false"
+    os.environ["GENERATION_CACHE_PERSIST"] = "false"
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    os.environ["LLM_ENDPOINTS"] = json.dumps({
+        role: [{"base_url": stub.base_url, "model": "stub", "api_key": "stub"}] for role in ROLES
+    })
+
+    try:
+        asyncio.run(prepare_database(0))
+        server = AppServer(args.app_port).start()
+        try:
+            async def run_all() -> Dict[str, Any]:
+                limits = httpx.Limits(max_connections=args.clients + 4)
+                async with httpx.AsyncClient(base_url=server.base_url, limits=limits, timeout=300) as client:
+                    return {mode: await run_mode(client, mode, args, stub) for mode in args.modes.split(",")}
+
+            results = asyncio.run(run_all())
+        finally:
+            server.stop()
+    finally:
+        stub.stop()
+
+    output = json.dumps({
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results
+    }, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+长输入处理的基准测试，不消耗真实token。
+
+用本地桩服务（模拟预填充耗时与上下文长度上限，见 ``bench.stub_llm``）分别按两种模式
+运行完整的生成流程，输入从1KB到1MB：
+- ``verbatim``：关闭长输入模式与各阶段输入上限，内容原样进入每个阶段（此前的行为）；
+- ``long_input``：默认配置，分析阶段抽样，长输入先分块浓缩，各阶段输入受token上限约束。
+
+输出每种输入大小与模式的总耗时、是否成功、LLM调用次数、提示词token总数与单次最大值（JSON）：
+
+    python -m bench.long_input_bench --sizes 1k,10k,100k,1m --prefill-tokens-per-second 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from bench.stub_llm import StubConfig, start_stub_server
+
+ROLES = ["analyzer", "content_generator", "script_generator", "translator"]
+UNITS = {"k": 1024, "m": 1024 * 1024}
+SENTENCES = [
+    "人工智能正在深刻地改变教育、医疗和交通等行业。",
+    "研究人员指出，数据质量决定了模型效果的上限。",
+    "在过去十年里，算力成本下降了两个数量级。",
+    "许多企业开始把大模型用于客服、写作和代码生成。",
+    "监管机构也在讨论如何平衡创新与风险。",
+    "有专家认为，人机协作会成为未来工作的常态。",
+]
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    if value[-1] in UNITS:
+        return int(float(value[:-1]) * UNITS[value[-1]])
+    return int(value)
+
+
+def make_article(size: int, seed: int) -> str:
+    """生成UTF-8编码后约为size字节、分段的中文文章"""
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    total = 0
+    while total < size:
+        paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 8)))
+        paragraph = f"第{len(paragraphs) + 1}节。" + paragraph
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode("utf-8")) + 2
+    return "\n\n".join(paragraphs)
+
+
+def set_mode(mode: str, defaults: Dict[str, Any]) -> None:
+    from app.core.config import settings
+
+    for name, value in defaults.items():
+        setattr(settings, name, value if mode == "long_input" else 10 ** 12)
+
+
+async def run_once(content: str) -> Dict[str, Any]:
+    from app.llm_providers.base import generate_text_stream
+
+    start = time.perf_counter()
+    error = None
+    condense = None
+    async for event in generate_text_stream(
+        content, "科技", ["主持人A", "主持人B"], target_language="中文", use_cache=False
+    ):
+        if event["event"] == "error":
+            error = event["text"].strip()
+        elif event["event"] == "condense":
+            condense = {k: v for k, v in event.items() if k != "event"}
+    return {"seconds": round(time.perf_counter() - start, 3), "ok": error is None, "error": error, "condense": condense}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="长输入处理基准测试")
+    parser.add_argument("--sizes", default="1k,10k,100k,1m", help="逗号分隔的输入大小（UTF-8字节），支持k/m后缀")
+    parser.add_argument("--modes", default="verbatim,long_input")
+    parser.add_argument("--ttft", type=float, default=0.05, help="桩服务首token延迟（秒）")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=20000.0, help="桩服务的预填充速度")
+    parser.add_argument("--max-context-tokens", type=int, default=128000, help="桩服务的上下文长度上限")
+    parser.add_argument("--stub-port", type=int, default=9221)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    stub = start_stub_server(StubConfig(
+        latency_median=args.ttft,
+        tokens_per_second=0,
+        reply_chars=600,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        max_context_tokens=args.max_context_tokens
+    ), port=args.stub_port)
+    # 须在导入app模块之前设置
+    os.environ.setdefault("DATABASE_DSN", "sqlite+aiosqlite:///:memory:")
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_WARMUP"] = "false"
+    os.environ["GENERATION_CACHE_PERSIST"] = "false"
+    os.environ["LLM_TPM"] = str(10 ** 12)
+    os.environ["LLM_ENDPOINTS"] = json.dumps({
+        role: [{"base_url": stub.base_url, "model": "stub", "api_key": "stub"}] for role in ROLES
+    })
+    from app.core.config import settings
+    from app.llm_providers.long_input import count_tokens
+
+    defaults = {
+        name: getattr(settings, name)
+        for name in (
+            "long_input_threshold_tokens", "analyzer_input_tokens", "content_generator_input_tokens",
+            "script_generator_input_tokens", "translator_input_tokens"
+        )
+    }
+    async def run_all() -> List[Dict[str, Any]]:
+        # 共享的LLM连接池绑定事件循环，所有运行使用同一个事件循环
+        results = []
+        for size_text in args.sizes.split(","):
+            size = parse_size(size_text)
+            content = make_article(size, args.seed)
+            tokens = count_tokens(content)
+            for mode in args.modes.split(","):
+                set_mode(mode, defaults)
+                stub.reset_stats()
+                outcome = await run_once(content)
+                results.append({
+                    "size": size_text.strip(),
+                    "bytes": len(content.encode("utf-8")),
+                    "input_tokens": tokens,
+                    "mode": mode,
+                    **outcome,
+                    "llm": stub.stats()
+                })
+        return results
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        stub.stop()
+
+    output = json.dumps({
+        "config": {
+            "ttft": args.ttft,
+            "prefill_tokens_per_second": args.prefill_tokens_per_second,
+            "max_context_tokens": args.max_context_tokens,
+            **defaults
+        },
+        "results": results
+    }, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
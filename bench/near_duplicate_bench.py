@@ -0,0 +1,137 @@
+"""
+近似重复索引（MinHash LSH）的基准测试，不需要数据库与LLM。
+
+生成若干条随机的中文内容摘要（长度与 ``podcast.content`` 相近）建立索引，输出：
+- 建立索引的耗时与每条记录的平均耗时、索引占用的内存（紧凑数组与未合并部分）及每条记录的字节数；
+- 近似重复查询（对已有内容做少量增删改字）与无关查询的延迟分位数；
+- 近似重复查询的召回率（真实Jaccard相似度不低于阈值的查询中找到原记录的比例）、
+  返回结果的精确率与估计相似度的平均绝对误差（JSON）：
+
+    python -m bench.near_duplicate_bench --rows 100000,300000 --queries 2000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("DATABASE_DSN", "sqlite+aiosqlite:///:memory:")
+
+from app.services.near_duplicate import NearDuplicateIndex, signature  # noqa: E402
+from app.services.search import tokenize  # noqa: E402
+from bench.run_bench import summarize  # noqa: E402
+
+# 常用汉字范围中的一段，组成随机内容
+CHARS = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+PREFIXES = ["聊聊", "讲讲", "谈谈", "说说", ""]
+
+
+def make_content(rng: random.Random) -> str:
+    return rng.choice(PREFIXES) + "".join(rng.choice(CHARS) for _ in range(rng.randint(8, 100)))
+
+
+def perturb(content: str, rng: random.Random, edits: int) -> str:
+    """随机增删改若干个字，模拟措辞上的细微差别"""
+    chars = list(content)
+    for _ in range(edits):
+        position = rng.randrange(len(chars))
+        operation = rng.choice(("insert", "delete", "replace"))
+        if operation == "insert":
+            chars.insert(position, rng.choice(CHARS))
+        elif operation == "delete" and len(chars) > 2:
+            del chars[position]
+        else:
+            chars[position] = rng.choice(CHARS)
+    return "".join(chars)
+
+
+def jaccard(a: str, b: str) -> float:
+    first, second = set(tokenize(a)), set(tokenize(b))
+    return len(first & second) / len(first | second) if first | second else 0.0
+
+
+def run(rows: int, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    contents = [make_content(rng) for _ in range(rows)]
+    index = NearDuplicateIndex(["content"], args.num_perm, args.bands)
+    gc.collect()
+    start = time.perf_counter()
+    for podcast_id, content in enumerate(contents, 1):
+        index.add(podcast_id, content, None, signature(content, args.num_perm))
+    build_seconds = time.perf_counter() - start
+    table = index.tables["content"]
+    memory = table.memory_bytes()
+
+    near_latencies: List[float] = []
+    other_latencies: List[float] = []
+    expected = found = returned = correct = 0
+    errors: List[float] = []
+    for _ in range(args.queries):
+        podcast_id = rng.randrange(rows) + 1
+        original = contents[podcast_id - 1]
+        query = perturb(original, rng, rng.randint(1, args.max_edits))
+        similarity = jaccard(query, original)
+        start = time.perf_counter()
+        matches = index.match(signature(query, args.num_perm), args.threshold)
+        near_latencies.append((time.perf_counter() - start) * 1000)
+        estimates = dict(matches)
+        if similarity >= args.threshold:
+            expected += 1
+            found += podcast_id in estimates
+        if podcast_id in estimates:
+            errors.append(abs(estimates[podcast_id] - similarity))
+        returned += len(matches)
+        correct += sum(1 for match_id, _ in matches if jaccard(query, contents[match_id - 1]) >= args.threshold)
+
+        unrelated = make_content(rng)
+        start = time.perf_counter()
+        index.match(signature(unrelated, args.num_perm), args.threshold)
+        other_latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "rows": rows,
+        "build_seconds": round(build_seconds, 3),
+        "build_us_per_row": round(build_seconds / rows * 1e6, 2),
+        "memory_bytes": memory,
+        "bytes_per_row": round(memory / rows, 1),
+        "pending_rows": table.pending_slots,
+        "lookup_near_duplicate_ms": {
+            "mean": round(sum(near_latencies) / len(near_latencies), 4), **summarize(near_latencies)
+        },
+        "lookup_unrelated_ms": {
+            "mean": round(sum(other_latencies) / len(other_latencies), 4), **summarize(other_latencies)
+        },
+        "recall": round(found / expected, 4) if expected else None,
+        "precision": round(correct / returned, 4) if returned else None,
+        "similarity_mean_abs_error": round(sum(errors) / len(errors), 4) if errors else None
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="近似重复索引的基准测试")
+    parser.add_argument("--rows", default="10000,100000,300000", help="逗号分隔的记录数")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--bands", type=int, default=16)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--max-edits", type=int, default=4, help="近似重复查询最多增删改的字数")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    results = [run(int(rows), args) for rows in args.rows.split(",")]
+    output = json.dumps({
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results
+    }, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+提示词注册表的微基准测试，不消耗真实token。
+
+1. 格式化开销：对比此前每次调用都用f-string拼出系统提示词、再构建 ``ChatPromptTemplate``
+   的做法（legacy）与注册表中预先构建的提示词（registry）每次调用的耗时；
+2. 前缀缓存收益：启动支持提示词前缀缓存的本地桩服务（见 ``bench.stub_llm``），
+   用参数各异的请求分别按两种布局调用，对比缓存命中的token比例与延迟。
+   legacy布局把请求参数放在系统提示词开头（与此前的节点一致），registry布局把它们放在末尾。
+
+    python -m bench.prompt_bench --iterations 5000 --requests 100 --prefill-tokens-per-second 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("DATABASE_DSN", "sqlite+aiosqlite:///:memory:")
+
+import httpx  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+
+from app.llm_providers import prompts  # noqa: E402
+from bench.run_bench import summarize  # noqa: E402
+from bench.stub_llm import StubConfig, start_stub_server  # noqa: E402
+
+CONTENT_TYPES = ["科技", "教育", "财经", "历史", "健康"]
+VOICES = ["小明", "小红", "老王", "阿杰", "Lily", "Tom"]
+LANGUAGES = ["中文", "English", "日本語"]
+TOPICS = ["人工智能对教育的影响", "城市交通的未来", "睡眠与健康", "量子计算入门", "咖啡的历史"]
+
+# 提示词 -> 正文所在的字段（legacy布局中仍放在用户消息里）
+BODY_FIELDS = {
+    "analyze_content": "content",
+    "detailed_content": "content",
+    "script_single": "content",
+    "script_dialogue": "content",
+    "translate_chunk": "chunk",
+    "translate": "script",
+}
+
+
+def sample_values(name: str, rng: random.Random) -> Dict[str, Any]:
+    """为提示词生成一组参数各异的请求值"""
+    voices = rng.sample(VOICES, rng.randint(2, 3))
+    topic = rng.choice(TOPICS)
+    body = f"{topic}。" + "这是一段用于测试的正文内容，" * rng.randint(5, 15)
+    values = {
+        "content": body,
+        "content_type": rng.choice(CONTENT_TYPES),
+        "voice_instruction": prompts.voice_instruction(voices),
+        "voices": "、".join(voices),
+        "target_language": rng.choice(LANGUAGES),
+        "glossary": "、".join(voices),
+        "index": rng.randint(1, 4),
+        "total": 4,
+        "chunk": body,
+        "script": body,
+    }
+    return {field: values[field] for field in prompts.get_prompt(name).fields}
+
+
+def legacy_parts(name: str, values: Dict[str, Any]) -> Tuple[str, str]:
+    """legacy布局：请求参数写在系统提示词开头，用户消息只有正文"""
+    body_field = BODY_FIELDS[name]
+    header = "\n".join(f"{field}：{value}" for field, value in values.items() if field != body_field)
+    return f"{header}\n\n{prompts.get_prompt(name).system}", body_field
+
+
+def legacy_format(name: str, values: Dict[str, Any]) -> List[Any]:
+    """此前的做法：每次调用构建模板再格式化"""
+    system, body_field = legacy_parts(name, values)
+    template = ChatPromptTemplate.from_messages([
+        ("system", system.replace("{", "{{").replace("}", "}}")),
+        ("human", "{" + body_field + "}")
+    ])
+    return template.format_messages(**{body_field: values[body_field]})
+
+
+def registry_format(name: str, values: Dict[str, Any]) -> List[Any]:
+    return prompts.get_prompt(name).format_messages(**values)
+
+
+def time_formatting(iterations: int, seed: int) -> Dict[str, Dict[str, float]]:
+    """每种提示词每次调用的格式化耗时（微秒）"""
+    results = {}
+    for name in BODY_FIELDS:
+        rng = random.Random(seed)
+        samples = [sample_values(name, rng) for _ in range(100)]
+        row = {}
+        for layout, format_messages in (("legacy", legacy_format), ("registry", registry_format)):
+            start = time.perf_counter()
+            for i in range(iterations):
+                format_messages(name, samples[i % len(samples)])
+            row[f"{layout}_us"] = round((time.perf_counter() - start) / iterations * 1e6, 2)
+        row["speedup"] = round(row["legacy_us"] / row["registry_us"], 1)
+        results[name] = row
+    return results
+
+
+def to_openai(messages: List[Any]) -> List[Dict[str, str]]:
+    roles = {"system": "system", "human": "user"}
+    return [{"role": roles[message.type], "content": message.content} for message in messages]
+
+
+async def run_requests(
+    base_url: str,
+    requests: int,
+    seed: int,
+    format_messages: Callable[[str, Dict[str, Any]], List[Any]]
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    names = list(BODY_FIELDS)
+    latencies: List[float] = []
+    prompt_tokens = cached_tokens = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for _ in range(requests):
+            name = rng.choice(names)
+            messages = to_openai(format_messages(name, sample_values(name, rng)))
+            start = time.perf_counter()
+            response = await client.post("/chat/completions", json={"model": "stub", "messages": messages})
+            latencies.append(time.perf_counter() - start)
+            usage = response.json()["usage"]
+            prompt_tokens += usage["prompt_tokens"]
+            cached_tokens += usage["prompt_tokens_details"]["cached_tokens"]
+    return {
+        "latency": summarize(latencies),
+        "mean_latency": round(sum(latencies) / len(latencies), 4),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_ratio": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="提示词注册表微基准测试")
+    parser.add_argument("--iterations", type=int, default=5000, help="每种提示词格式化的次数")
+    parser.add_argument("--requests", type=int, default=100, help="前缀缓存测试中每种布局的请求数")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=5000.0, help="桩服务的预填充速度")
+    parser.add_argument("--prefix-cache-block", type=int, default=64, help="桩服务前缀缓存的粒度（token）")
+    parser.add_argument("--stub-port", type=int, default=9211)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    result: Dict[str, Any] = {"formatting": time_formatting(args.iterations, args.seed), "prefix_cache": {}}
+    for offset, (layout, format_messages) in enumerate((("legacy", legacy_format), ("registry", registry_format))):
+        # 每种布局使用单独的桩服务，互不共享前缀缓存
+        stub = start_stub_server(StubConfig(
+            latency_median=0.01,
+            tokens_per_second=0,
+            reply_chars=20,
+            prefill_tokens_per_second=args.prefill_tokens_per_second,
+            prefix_cache=True,
+            prefix_cache_block=args.prefix_cache_block
+        ), port=args.stub_port + offset)
+        try:
+            result["prefix_cache"][layout] = asyncio.run(
+                run_requests(stub.base_url, args.requests, args.seed, format_messages)
+            )
+        finally:
+            stub.stop()
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
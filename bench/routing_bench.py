@@ -0,0 +1,108 @@
+"""
+多endpoint路由与对冲请求的离线压测。
+
+启动若干延迟分布不同的本地桩服务，分别在关闭/开启对冲时并发调用内容分析阶段，
+输出延迟分位数与各endpoint的路由统计（JSON）。
+
+    python -m bench.routing_bench --requests 300 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_DSN", "sqlite+aiosqlite:///:memory:")
+
+from langchain_core.messages import HumanMessage, SystemMessage  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.llm_providers.base import create_chat_llm  # noqa: E402
+from app.llm_providers.routing import Endpoint, EndpointPool  # noqa: E402
+from bench.stub_llm import StubConfig, start_stub_server  # noqa: E402
+
+# 名称 -> 桩服务配置：一个稳定的快速endpoint，一个长尾endpoint，一个偶发错误的endpoint
+STUBS = {
+    "fast": StubConfig(latency_median=0.15, latency_sigma=0.2),
+    "long_tail": StubConfig(latency_median=0.15, latency_sigma=1.2),
+    "flaky": StubConfig(latency_median=0.2, latency_sigma=0.3, error_rate=0.2),
+}
+
+MESSAGES = [
+    SystemMessage(content="请只回答 \"precise\" 或 \"vague\"。"),
+    HumanMessage(content="请分析以下内容：\nAI对教育的影响"),
+]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(pool: EndpointPool, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                await pool.ainvoke(MESSAGES)
+                latencies.append(time.monotonic() - start)
+            except Exception:
+                errors += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return {
+        "hedge": pool.hedge,
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": round(time.monotonic() - start, 3),
+        "p50": round(percentile(latencies, 0.5), 3),
+        "p90": round(percentile(latencies, 0.9), 3),
+        "p99": round(percentile(latencies, 0.99), 3),
+        "endpoints": pool.state()["endpoints"],
+    }
+
+
+def build_pool(servers: dict, hedge: bool) -> EndpointPool:
+    endpoints = [
+        Endpoint(server.base_url, f"stub-{name}", create_chat_llm(f"stub-{name}", server.base_url, "stub", 0.0))
+        for name, server in servers.items()
+    ]
+    return EndpointPool("analyzer", endpoints, hedge=hedge)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base-port", type=int, default=9101)
+    args = parser.parse_args()
+
+    settings.llm_hedge_default_delay = 0.3
+    servers = {
+        name: start_stub_server(config, args.base_port + i)
+        for i, (name, config) in enumerate(STUBS.items())
+    }
+
+
+    async def run_all():
+        # 共享的HTTP连接池绑定事件循环，两种模式需在同一个事件循环内运行
+        return [
+            await run(build_pool(servers, hedge), args.requests, args.concurrency)
+            for hedge in (False, True)
+        ]
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        for server in servers.values():
+            server.stop()
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+服务端到端的离线压测，不消耗真实token。
+
+流程：
+1. 以子进程启动本地LLM桩服务（见 ``bench.stub_llm``），并通过 ``LLM_ENDPOINTS``
+   把所有生成阶段指向它；
+2. 在本地数据库（默认临时SQLite文件）建表并写入若干播客记录；
+3. 在后台线程中用uvicorn启动本服务；
+4. 按配置的并发分别压测 ``/podcast/generate_script``、``/podcast/list``、``/podcast/detail``。
+
+输出JSON，包括每个场景的TTFB、首段文本时间、总延迟分位数、吞吐量、错误数，
+进程内存高水位以及数据库连接池占用，便于不同版本之间对比：
+
+    python -m bench.run_bench --scenarios generate,list,detail --requests 50 --concurrency 10 \\
+        --ttft 0.3 --tokens-per-second 200 --output result.json
+
+使用SQLite时需要安装aiosqlite；也可用 ``--database-dsn`` 指向本地MySQL。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+SCENARIOS = ("generate", "list", "detail")
+ROLES = ("analyzer", "content_generator", "script_generator", "translator")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 4)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "p99": percentile(values, 0.99),
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+def start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    """以子进程启动桩服务，避免其内存计入被测进程"""
+    process = subprocess.Popen([
+        sys.executable, "-m", "bench.stub_llm",
+        "--port", str(args.stub_port),
+        "--latency-median", str(args.ttft),
+        "--latency-sigma", str(args.ttft_sigma),
+        "--error-rate", str(args.error_rate),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--reply-chars", str(args.reply_chars),
+    ])
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.stub_port}/v1/models", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("桩服务启动超时")
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    """导入app之前设置环境变量，使配置指向桩服务与本地数据库"""
+    stub_url = f"http://127.0.0.1:{args.stub_port}/v1"
+    os.environ["DATABASE_DSN"] = args.database_dsn
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("LLM_WARMUP", "false")
+    os.environ["LLM_ENDPOINTS"] = json.dumps({
+        role: [{"base_url": stub_url, "model": "stub", "api_key": "stub"}] for role in ROLES
+    })
+
+
+async def prepare_database(rows: int) -> List[int]:
+    """建表并写入压测用的播客记录，返回记录ID"""
+    from app.db.database import AsyncSessionLocal, engine
+    from app.models.podcast import Base, Podcast
+    # 注册其余表
+    from app.models import generation_cache, generation_session, job, search, transcript  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    paragraph = "主持人A：欢迎收听本期节目。\n\n主持人B：今天我们聊聊人工智能。\n\n"
+    async with AsyncSessionLocal() as db:
+        podcasts = [
+            Podcast(
+                content=f"压测主题{i}",
+                voice_ids="voice-a,voice-b",
+                content_type="对话",
+                transcript=paragraph * 20,
+                title=f"压测播客{i}",
+            )
+            for i in range(rows)
+        ]
+        db.add_all(podcasts)
+        await db.commit()
+        ids = [podcast.id for podcast in podcasts]
+    # 连接绑定当前事件循环，服务在另一个事件循环中运行
+    await engine.dispose()
+    return ids
+
+
+class AppServer:
+    """在后台线程中运行的被测服务"""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from app.main import app
+
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "AppServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+class PoolSampler:
+    """定期采样数据库连接池的签出连接数"""
+
+    def __init__(self, interval: float = 0.05):
+        from app.db.database import engine
+
+        self.pool = engine.sync_engine.pool
+        self.interval = interval
+        self.samples: List[int] = []
+
+    async def run(self) -> None:
+        checkedout = getattr(self.pool, "checkedout", None)
+        if checkedout is None:
+            return
+        while True:
+            self.samples.append(checkedout())
+            await asyncio.sleep(self.interval)
+
+    def result(self) -> Dict[str, Any]:
+        size = getattr(self.pool, "size", None)
+        return {
+            "pool_class": type(self.pool).__name__,
+            "pool_size": size() if callable(size) else None,
+            "max_checked_out": max(self.samples) if self.samples else None,
+            "avg_checked_out": round(sum(self.samples) / len(self.samples), 3) if self.samples else None,
+        }
+
+
+def parse_sse(message: str) -> Tuple[str, Any]:
+    """解析一条SSE消息（可能带 ``id:`` 行），返回 (事件类型, data的JSON)，没有event行时类型为text"""
+    event_type, data = "text", []
+    for line in message.splitlines():
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event_type = value
+        elif field == "data":
+            data.append(value)
+    return event_type, json.loads("\n".join(data)) if data else None
+
+
+async def sse_messages(response: httpx.Response) -> AsyncIterator[Tuple[str, Any]]:
+    """逐条读取SSE响应，产出 (事件类型, data的JSON)"""
+    buffer = ""
+    async for chunk in response.aiter_text():
+        buffer += chunk
+        while "\n\n" in buffer:
+            message, buffer = buffer.split("\n\n", 1)
+            yield parse_sse(message)
+
+
+async def generate_once(client: httpx.AsyncClient, index: int, run_id: str) -> Dict[str, Any]:
+    payload = {
+        "content": f"压测请求{run_id}-{index}：人工智能对教育的影响",
+        "language": "中文",
+        "voices": ["voice-a", "voice-b"],
+        "contentType": "对话",
+        "timestamp": datetime.now().isoformat(),
+        # 每个请求内容不同且跳过缓存，保证每次都完整走一遍生成流程
+        "bypassCache": True,
+    }
+    start = time.monotonic()
+    ttfb = first_text = None
+    error = False
+    buffer = ""
+    async with client.stream("POST", "/podcast/generate_script", json=payload) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {"ttfb": time.monotonic() - start, "latency": time.monotonic() - start,
+                    "error": True, "status": response.status_code}
+        async for chunk in response.aiter_text():
+            now = time.monotonic()
+            if ttfb is None:
+                ttfb = now - start
+            buffer += chunk
+            while "\n\n" in buffer:
+                message, buffer = buffer.split("\n\n", 1)
+                event_type, _ = parse_sse(message)
+                if event_type == "error":
+                    error = True
+                elif event_type == "text" and first_text is None:
+                    first_text = now - start
+    return {"ttfb": ttfb, "first_text": first_text, "latency": time.monotonic() - start,
+            "error": error, "status": 200}
+
+
+async def get_once(client: httpx.AsyncClient, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.monotonic()
+    async with client.stream("GET", url, params=params) as response:
+        ttfb = None
+        async for _ in response.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.monotonic() - start
+    latency = time.monotonic() - start
+    return {"ttfb": ttfb if ttfb is not None else latency, "latency": latency,
+            "error": response.status_code != 200, "status": response.status_code}
+
+
+async def run_scenario(
+    name: str, base_url: str, requests: int, concurrency: int, podcast_ids: List[int]
+) -> Dict[str, Any]:
+    run_id = f"{os.getpid()}-{int(time.time())}"
+
+    async def one(client: httpx.AsyncClient, index: int) -> Dict[str, Any]:
+        if name == "generate":
+            return await generate_once(client, index, run_id)
+        if name == "list":
+            return await get_once(client, "/podcast/list", {"limit": 20, "fields": "summary", "excerpt_length": 80})
+        return await get_once(client, "/podcast/detail", {"podcast_id": random.choice(podcast_ids)})
+
+    results: List[Dict[str, Any]] = []
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def worker() -> None:
+            while not queue.empty():
+                index = queue.get_nowait()
+                try:
+                    results.append(await one(client, index))
+                except httpx.HTTPError as e:
+                    results.append({"latency": None, "error": True, "status": type(e).__name__})
+
+        sampler = PoolSampler()
+        sampling = asyncio.create_task(sampler.run())
+        start = time.monotonic()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        wall = time.monotonic() - start
+        sampling.cancel()
+
+    ok = [r for r in results if not r["error"]]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    report = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(results) - len(ok),
+        "statuses": statuses,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall > 0 else None,
+        "ttfb": summarize([r["ttfb"] for r in ok if r.get("ttfb") is not None]),
+        "latency": summarize([r["latency"] for r in ok]),
+        "db_pool": sampler.result(),
+    }
+    if name == "generate":
+        report["first_text"] = summarize([r["first_text"] for r in ok if r.get("first_text") is not None])
+    return report
+
+
+def max_rss_mb() -> float:
+    # Linux上ru_maxrss单位为KB，macOS上为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="播客服务离线压测")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔：generate,list,detail")
+    parser.add_argument("--requests", type=int, default=50, help="每个场景的请求数")
+    parser.add_argument("--generate-requests", type=int, default=None, help="generate场景的请求数，默认同--requests")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--ttft", type=float, default=0.3, help="桩服务首token延迟中位数（秒）")
+    parser.add_argument("--ttft-sigma", type=float, default=0.0, help="首token延迟对数正态分布的sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reply-chars", type=int, default=900)
+    parser.add_argument("--seed-rows", type=int, default=200, help="预先写入的播客记录数")
+    parser.add_argument("--database-dsn", default=None, help="默认使用临时目录下的SQLite文件")
+    parser.add_argument("--stub-port", type=int, default=9201)
+    parser.add_argument("--app-port", type=int, default=9200)
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知场景: {', '.join(sorted(unknown))}")
+    if args.database_dsn is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="podcast-bench-"), "bench.db")
+        args.database_dsn = f"sqlite+aiosqlite:///{path}"
+
+    stub = start_stub(args)
+    try:
+        configure_env(args)
+
+        podcast_ids = asyncio.run(prepare_database(args.seed_rows))
+        baseline_rss = max_rss_mb()
+        server = AppServer(args.app_port).start()
+        try:
+            results = {}
+            for name in scenarios:
+                requests = args.generate_requests if name == "generate" and args.generate_requests else args.requests
+                results[name] = asyncio.run(
+                    run_scenario(name, server.base_url, requests, args.concurrency, podcast_ids)
+                )
+        finally:
+            server.stop()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "scenarios": results,
+        "memory": {
+            # 压测客户端与被测服务在同一进程，baseline为服务启动前的高水位
+            "baseline_max_rss_mb": baseline_rss,
+            "max_rss_mb": max_rss_mb(),
+        },
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+脚本压缩存储的基准测试：对比迁移前（脚本内联在 ``podcast.transcript``）与迁移后
+（``transcript_blob`` 中的压缩数据）的存储大小，以及列表、详情查询的延迟。
+迁移后的大小按MySQL部署计入 ``podcast_search_text`` 中的检索明文（与迁移脚本一样补建）。
+
+    python -m bench.storage_bench --rows 2000 --queries 200 --output storage.json
+
+默认使用临时目录下的SQLite文件（需要aiosqlite），此时还会报告VACUUM后的数据库文件大小；
+也可用 ``--database-dsn`` 指向一个空的本地MySQL库。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.run_bench import summarize
+
+SPEAKERS = ["主持人A", "主持人B", "嘉宾"]
+OPENINGS = [
+    "欢迎收听本期节目，我是今天的主持人。",
+    "大家好，欢迎回到我们的节目，今天的话题非常有意思。",
+]
+CLOSINGS = [
+    "感谢大家的收听，如果喜欢本期节目，欢迎订阅和分享，我们下期再见。",
+    "今天的讨论就到这里，感谢嘉宾的分享，我们下期节目再见。",
+]
+PHRASES = [
+    "这个问题其实可以从几个方面来看。",
+    "我非常同意你刚才的观点。",
+    "举一个具体的例子来说明一下。",
+    "很多听众可能会关心这一点。",
+    "从长远来看，这会带来深远的影响。",
+    "我们不妨换一个角度思考。",
+    "数据显示，这一趋势在过去几年里越来越明显。",
+    "这也是我们今天邀请嘉宾的原因。",
+]
+TOPICS = ["人工智能", "城市交通", "睡眠健康", "量子计算", "咖啡文化", "远程办公", "新能源汽车", "古典音乐"]
+
+
+def make_transcript(rng: random.Random, turns: int) -> str:
+    """生成带有大量套话、又各不相同的对话脚本"""
+    topic = rng.choice(TOPICS)
+    lines = [f"{SPEAKERS[0]}：{rng.choice(OPENINGS)}今天我们聊聊{topic}。"]
+    for turn in range(turns):
+        speaker = SPEAKERS[turn % len(SPEAKERS)]
+        sentences = rng.sample(PHRASES, 3)
+        sentences.insert(rng.randrange(4), f"关于{topic}，第{rng.randint(1, 99)}个值得注意的细节是{rng.random():.6f}。")
+        lines.append(f"{speaker}：{''.join(sentences)}")
+    lines.append(f"{SPEAKERS[0]}：{rng.choice(CLOSINGS)}")
+    return "\n\n".join(lines)
+
+
+async def seed(rows: int, turns: int, seed_value: int) -> None:
+    """建表并按迁移前的方式写入内联脚本"""
+    from app.db.database import AsyncSessionLocal, engine
+    from app.models.podcast import Base, Podcast
+    from app.models import search, transcript  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rng = random.Random(seed_value)
+    for start in range(0, rows, 500):
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                Podcast(
+                    content=f"基准主题{i}",
+                    voice_ids="voice-a,voice-b",
+                    content_type="对话",
+                    transcript=make_transcript(rng, turns),
+                    title=f"基准播客{i}"
+                )
+                for i in range(start, min(rows, start + 500))
+            ])
+            await db.commit()
+
+
+async def storage() -> Dict[str, Any]:
+    """统计脚本及其检索明文占用的字节数"""
+    from sqlalchemy import LargeBinary, cast, func, select
+    from app.db.database import AsyncSessionLocal
+    from app.models.podcast import Podcast
+    from app.models.search import PodcastSearchText
+    from app.models.transcript import TranscriptBlob, TranscriptDictionary
+
+    def octets(column):
+        # length()对TEXT在SQLite中按字符计算，转为二进制后两种数据库都按字节计算
+        return func.coalesce(func.sum(func.length(cast(column, LargeBinary))), 0)
+
+    async with AsyncSessionLocal() as db:
+        inline = (await db.execute(select(octets(Podcast.transcript)))).scalar_one()
+        raw, compressed, blobs = (await db.execute(select(
+            func.coalesce(func.sum(TranscriptBlob.raw_size), 0),
+            func.coalesce(func.sum(func.length(TranscriptBlob.data)), 0),
+            func.count()
+        ))).one()
+        dictionaries = (await db.execute(
+            select(func.coalesce(func.sum(func.length(TranscriptDictionary.data)), 0))
+        )).scalar_one()
+        search_text, search_rows = (await db.execute(select(
+            octets(PodcastSearchText.body),
+            func.count()
+        ))).one()
+    return {
+        "inline_transcript_bytes": int(inline),
+        "blob_count": int(blobs),
+        "blob_raw_bytes": int(raw),
+        "blob_compressed_bytes": int(compressed),
+        "dictionary_bytes": int(dictionaries),
+        "search_text_count": int(search_rows),
+        "search_text_bytes": int(search_text)
+    }
+
+
+def sqlite_file_size(dsn: str) -> Optional[int]:
+    """VACUUM后SQLite文件的大小"""
+    if not dsn.startswith("sqlite"):
+        return None
+    path = dsn.split("///", 1)[1]
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    return os.path.getsize(path)
+
+
+async def measure(queries: int, ids: List[int], seed_value: int) -> Dict[str, Any]:
+    """依次测量各种列表查询与详情查询的延迟（秒）"""
+    from app.db.database import AsyncSessionLocal
+    from app.services.podcast_service import get_podcast_detail, list_generated_podcasts
+
+    rng = random.Random(seed_value)
+    cases = {
+        "list_full": lambda db: list_generated_podcasts(db, limit=20, fields="full"),
+        "list_summary": lambda db: list_generated_podcasts(db, limit=20, fields="summary"),
+        "list_excerpt": lambda db: list_generated_podcasts(db, limit=20, fields="summary", excerpt_length=100),
+        "detail": lambda db: get_podcast_detail(db, rng.choice(ids))
+    }
+    results = {}
+    for name, query in cases.items():
+        durations = []
+        for _ in range(queries):
+            async with AsyncSessionLocal() as db:
+                start = time.perf_counter()
+                await query(db)
+                durations.append(time.perf_counter() - start)
+        results[name] = summarize(durations)
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from sqlalchemy import select
+    from app.db.database import AsyncSessionLocal, engine
+    from app.db.migrate_transcripts import backfill_search_text, migrate
+    from app.models.podcast import Podcast
+    from app.services.transcripts import transcript_codec
+
+    try:
+        await seed(args.rows, args.turns, args.seed)
+        async with AsyncSessionLocal() as db:
+            ids = list((await db.execute(select(Podcast.id))).scalars())
+        before = {
+            "storage": await storage(),
+            "file_bytes": sqlite_file_size(args.database_dsn),
+            "latency": await measure(args.queries, ids, args.seed)
+        }
+        start = time.perf_counter()
+        migrated = await migrate(batch_size=args.batch_size, samples=args.samples)
+        await backfill_search_text(batch_size=args.batch_size)
+        migration_seconds = time.perf_counter() - start
+        after = {
+            "storage": await storage(),
+            "file_bytes": sqlite_file_size(args.database_dsn),
+            "latency": await measure(args.queries, ids, args.seed)
+        }
+    finally:
+        await engine.dispose()
+
+    raw = after["storage"]["blob_raw_bytes"]
+    compressed = after["storage"]["blob_compressed_bytes"] + after["storage"]["dictionary_bytes"]
+    # 迁移后实际多存的是压缩脚本、字典与检索明文，与迁移前内联的脚本比较
+    stored = compressed + after["storage"]["search_text_bytes"]
+    inline = before["storage"]["inline_transcript_bytes"]
+    return {
+        "config": {
+            "rows": args.rows,
+            "turns": args.turns,
+            "codec": transcript_codec.codec,
+            "level": transcript_codec.level,
+            "database": engine.dialect.name
+        },
+        "migration": {"rows": migrated, "seconds": round(migration_seconds, 3)},
+        "compression_ratio": round(raw / compressed, 2) if compressed else None,
+        "storage_ratio": round(inline / stored, 2) if stored else None,
+        "before": before,
+        "after": after
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="脚本压缩存储基准测试")
+    parser.add_argument("--rows", type=int, default=2000, help="写入的播客记录数")
+    parser.add_argument("--turns", type=int, default=30, help="每份脚本的对话轮数")
+    parser.add_argument("--queries", type=int, default=200, help="每种查询的执行次数")
+    parser.add_argument("--batch-size", type=int, default=200, help="迁移时每批的记录数")
+    parser.add_argument("--samples", type=int, default=500, help="训练字典使用的脚本数")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-dsn", default=None, help="默认使用临时目录下的SQLite文件")
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+    if args.database_dsn is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="podcast-storage-"), "bench.db")
+        args.database_dsn = f"sqlite+aiosqlite:///{path}"
+    # 须在导入app模块之前设置
+    os.environ["DATABASE_DSN"] = args.database_dsn
+
+    result = json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(result)
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+本地OpenAI兼容的LLM桩服务，用于离线测试与压测，不消耗真实token。
+
+支持 ``POST /v1/chat/completions``（含 ``stream=true``）与 ``GET /v1/models``。
+首token延迟（TTFT）服从对数正态分布，之后按配置的速度逐token输出；可配置错误率，遵守请求的 ``max_tokens``。
+非流式请求在TTFT加上全部token的生成时间后一次性返回。回复内容根据提示词粗略模拟各阶段输出。
+
+可选模拟预填充耗时与服务商的提示词前缀缓存：提示词按固定大小的块计算前缀哈希，
+与之前请求相同的前缀块视为命中缓存，不计预填充耗时，并在 ``usage.prompt_tokens_details.cached_tokens``
+中返回命中的token数。token数按字符数近似。
+
+命令行启动：
+    python -m bench.stub_llm --port 9001 --latency-median 0.3 --latency-sigma 0.5 --error-rate 0.05
+
+代码中启动（后台线程）：
+    server = start_stub_server(StubConfig(latency_median=0.2), port=9001)
+    ...
+    server.stop()
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SCRIPT_PARAGRAPH = (
+    "人工智能正在改变我们的工作方式。最明显的变化是自动化程度的提升，"
+    "重复性的工作会逐渐交给机器完成，而人需要把精力放在判断和创造上。"
+)
+
+# 以“发言人：内容”开头的行
+_SPEAKER_LINE = re.compile(r"^[^\n:：]{1,20}[:：].+$", re.MULTILINE)
+
+
+@dataclass
+class StubConfig:
+    # 首token延迟：对数正态分布的中位数与sigma（秒）
+    latency_median: float = 0.3
+    latency_sigma: float = 0.0
+    # 返回500的概率
+    error_rate: float = 0.0
+    # 流式输出速度
+    tokens_per_second: float = 200.0
+    # 生成类回复的字数
+    reply_chars: int = 900
+    # 预填充速度（提示词token/秒），0表示不计预填充耗时
+    prefill_tokens_per_second: float = 0.0
+    # 是否模拟提示词前缀缓存，以及缓存的粒度（token）
+    prefix_cache: bool = False
+    prefix_cache_block: int = 64
+    # 上下文长度（提示词token数）上限，超出时返回400，0表示不限制
+    max_context_tokens: int = 0
+
+    def sample_latency(self) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_median
+        return random.lognormvariate(0, self.latency_sigma) * self.latency_median
+
+
+def _reply_for(messages: list, config: StubConfig) -> str:
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if "precise" in prompt and "vague" in prompt:
+        # 内容分析：待分析的内容有多行“发言人：内容”时视为精确脚本
+        content = str(messages[-1].get("content", "")) if messages else ""
+        return "precise" if len(_SPEAKER_LINE.findall(content)) >= 2 else "vague"
+    repeats = config.reply_chars // len(SCRIPT_PARAGRAPH) + 1
+    return "\n\n".join([SCRIPT_PARAGRAPH] * repeats)[:config.reply_chars]
+
+
+def _usage(messages: list, reply: str, cached_tokens: int = 0) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(reply),
+        "total_tokens": prompt_tokens + len(reply),
+        "prompt_tokens_details": {"cached_tokens": cached_tokens}
+    }
+
+
+class PrefixCache:
+    """按块记录见过的提示词前缀哈希，返回与之前请求相同的最长前缀长度"""
+
+    def __init__(self, block: int, max_entries: int = 100000):
+        self.block = block
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[bytes, None]" = OrderedDict()
+
+    def lookup_and_store(self, messages: list) -> int:
+        prompt = "".join(f"{m.get('role')}\n{m.get('content', '')}\n" for m in messages)
+        digest = hashlib.sha256()
+        cached = 0
+        hit = True
+        for start in range(0, len(prompt) - self.block + 1, self.block):
+            digest.update(prompt[start:start + self.block].encode("utf-8"))
+            key = digest.copy().digest()
+            if hit and key in self._seen:
+                cached = start + self.block
+                self._seen.move_to_end(key)
+            else:
+                hit = False
+                self._seen[key] = None
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        # 只计入消息内容部分，与usage中的prompt_tokens口径一致
+        return min(cached, sum(len(str(m.get("content", ""))) for m in messages))
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="stub-llm")
+    app.state.config = config
+    app.state.requests = 0
+    app.state.prefix_cache = PrefixCache(config.prefix_cache_block)
+    # in_flight为正在处理的请求数；aborted为客户端在回复完成前断开的请求数，completion_chars为已发出的回复字数
+    app.state.stats = {
+        "prompt_tokens": 0, "max_prompt_tokens": 0, "context_exceeded": 0,
+        "in_flight": 0, "aborted": 0, "completion_chars": 0
+    }
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.stats["in_flight"] += 1
+        streaming = False
+        try:
+            response = await complete(request)
+            # 流式回复在发送完毕或客户端断开时才结束
+            streaming = isinstance(response, StreamingResponse)
+            return response
+        except asyncio.CancelledError:
+            app.state.stats["aborted"] += 1
+            raise
+        finally:
+            if not streaming:
+                app.state.stats["in_flight"] -= 1
+
+    async def complete(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        cfg: StubConfig = app.state.config
+        await asyncio.sleep(cfg.sample_latency())
+        if random.random() < cfg.error_rate:
+            return JSONResponse(status_code=500, content={"error": {"message": "stub error"}})
+
+        model = body.get("model", "stub")
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages)
+        stats = app.state.stats
+        stats["prompt_tokens"] += prompt_tokens
+        stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], prompt_tokens)
+        if cfg.max_context_tokens and prompt_tokens > cfg.max_context_tokens:
+            stats["context_exceeded"] += 1
+            return JSONResponse(status_code=400, content={"error": {
+                "message": f"prompt is {prompt_tokens} tokens, exceeds {cfg.max_context_tokens}",
+                "code": "context_length_exceeded"
+            }})
+        cached_tokens = app.state.prefix_cache.lookup_and_store(messages) if cfg.prefix_cache else 0
+        if cfg.prefill_tokens_per_second > 0:
+            await asyncio.sleep((prompt_tokens - cached_tokens) / cfg.prefill_tokens_per_second)
+        reply = _reply_for(messages, cfg)
+        # 以2个字符近似一个token，超出max_tokens的部分截断
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        finish_reason = "stop"
+        if max_tokens and len(reply) > max_tokens * 2:
+            reply = reply[:max_tokens * 2]
+            finish_reason = "length"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            if cfg.tokens_per_second > 0:
+                await asyncio.sleep(len(reply) / 2 / cfg.tokens_per_second)
+            app.state.stats["completion_chars"] += len(reply)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": finish_reason
+                }],
+                "usage": _usage(messages, reply, cached_tokens)
+            }
+
+        async def event_stream():
+            interval = 1.0 / cfg.tokens_per_second if cfg.tokens_per_second > 0 else 0
+            finished = False
+            try:
+                # 以2个字符近似一个token
+                for i in range(0, len(reply), 2):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": reply[i:i + 2]}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    app.state.stats["completion_chars"] += len(reply[i:i + 2])
+                    if interval:
+                        await asyncio.sleep(interval)
+                last = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                    "usage": _usage(messages, reply, cached_tokens)
+                }
+                yield f"data: {json.dumps(last, ensure_ascii=False)}\n\n"
+                yield "data: [DONE]\n\n"
+                finished = True
+            finally:
+                app.state.stats["in_flight"] -= 1
+                if not finished:
+                    app.state.stats["aborted"] += 1
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+
+class StubServer:
+    """在后台线程中运行的桩服务"""
+
+    def __init__(self, config: StubConfig, port: int, host: str = "127.0.0.1"):
+        self.config = config
+        self.base_url = f"http://{host}:{port}/v1"
+        self.app = create_app(config)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.requests
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, **self.app.state.stats}
+
+    def reset_stats(self) -> None:
+        self.app.state.requests = 0
+        # 正在处理的请求数不清零，避免这些请求结束后变为负数
+        self.app.state.stats = {
+            key: value if key == "in_flight" else 0 for key, value in self.app.state.stats.items()
+        }
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def start_stub_server(config: StubConfig, port: int, host: str = "127.0.0.1") -> StubServer:
+    return StubServer(config, port, host).start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容LLM桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency-median", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--reply-chars", type=int, default=900)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--prefix-cache", action="store_true", help="模拟提示词前缀缓存")
+    parser.add_argument("--prefix-cache-block", type=int, default=64)
+    parser.add_argument("--max-context-tokens", type=int, default=0, help="上下文长度上限，0表示不限制")
+    args = parser.parse_args()
+    config = StubConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        tokens_per_second=args.tokens_per_second,
+        reply_chars=args.reply_chars,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        prefix_cache=args.prefix_cache,
+        prefix_cache_block=args.prefix_cache_block,
+        max_context_tokens=args.max_context_tokens
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
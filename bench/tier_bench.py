@@ -0,0 +1,199 @@
+"""
+按阶段分档使用模型的基准测试，不消耗真实token。
+
+启动两个本地桩服务分别模拟小模型（首token快、输出快）与大模型，按以下档位配置运行同一组请求：
+- ``single_large``：所有阶段使用大模型（此前的行为）；
+- ``tiered``：默认的 ``LLM_STAGE_TIERS``，内容分析与语言检查（翻译）用小模型，详细内容与脚本用大模型；
+- ``tiered_short_input``：在 ``tiered`` 的基础上，输入不超过 ``--short-input-tokens`` 的
+  详细内容与脚本生成也改用小模型（``LLM_SHORT_INPUT_TIERS``）。
+
+请求混合了简短的主题描述、简短的精确脚本与较长的精确脚本，目标语言一半为中文、一半为英文（需要翻译）。
+输出每种配置的延迟分位数、各档位的调用数与token数（按桩服务usage的口径，1字符计1token），
+以及按 ``--prices`` 计算的费用（JSON）：
+
+    python -m bench.tier_bench --requests 40 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from bench.run_bench import summarize
+from bench.stub_llm import StubConfig, start_stub_server
+
+ROLES = ["analyzer", "content_generator", "script_generator", "translator"]
+CONFIGURATIONS = {
+    "single_large": {
+        "llm_stage_tiers": {role: "large" for role in ROLES},
+        "short_input": False
+    },
+    "tiered": {
+        "llm_stage_tiers": {
+            "analyzer": "small", "content_generator": "large", "script_generator": "large", "translator": "small"
+        },
+        "short_input": False
+    },
+    "tiered_short_input": {
+        "llm_stage_tiers": {
+            "analyzer": "small", "content_generator": "large", "script_generator": "large", "translator": "small"
+        },
+        "short_input": True
+    },
+}
+TOPICS = ["人工智能对教育的影响", "远程办公的利与弊", "城市骑行的兴起", "咖啡文化的变迁", "睡眠与记忆"]
+LINES = [
+    "欢迎收听本期节目，今天我们聊一个很多人关心的话题。",
+    "我最近读到一份报告，数据相当有意思。",
+    "确实如此，不过我觉得还有另一种解释。",
+    "那我们先从最基本的概念说起吧。",
+    "这一点我完全同意，而且身边就有不少例子。",
+]
+
+
+def make_inputs(count: int, seed: int) -> List[Dict[str, str]]:
+    """简短主题、简短精确脚本、较长精确脚本轮流出现，目标语言中英交替"""
+    rng = random.Random(seed)
+    inputs = []
+    for i in range(count):
+        kind = ("topic", "short_script", "long_script")[i % 3]
+        if kind == "topic":
+            content = f"{i}：聊聊{rng.choice(TOPICS)}"
+        else:
+            lines = 4 if kind == "short_script" else 60
+            content = "\n".join(f"{'AB'[j % 2]}：{rng.choice(LINES)}（{i}-{j}）" for j in range(lines))
+        inputs.append({"kind": kind, "content": content, "language": "中文" if i % 2 == 0 else "English"})
+    return inputs
+
+
+async def run_configuration(name: str, inputs: List[Dict[str, str]], args: argparse.Namespace, stubs: Dict[str, Any]):
+    from app.core.config import settings
+    from app.llm_providers.base import generate_text_stream
+
+    configuration = CONFIGURATIONS[name]
+    settings.llm_stage_tiers = configuration["llm_stage_tiers"]
+    settings.llm_short_input_tiers = {
+        role: {"max_input_tokens": args.short_input_tokens, "tier": "small"}
+        for role in ("content_generator", "script_generator")
+    } if configuration["short_input"] else {}
+    for stub in stubs.values():
+        stub.reset_stats()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+
+    async def run_one(item: Dict[str, str]) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            async for event in generate_text_stream(
+                item["content"], "科技", ["A", "B"], target_language=item["language"], use_cache=False
+            ):
+                if event["event"] == "error":
+                    errors += 1
+            latencies.setdefault(item["kind"], []).append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run_one(item) for item in inputs])
+    elapsed = time.perf_counter() - started
+
+    tiers = {}
+    total_cost = 0.0
+    for tier, stub in stubs.items():
+        stats = stub.stats()
+        input_price, output_price = args.prices[tier]
+        cost = stats["prompt_tokens"] / 1000 * input_price + stats["completion_chars"] / 1000 * output_price
+        total_cost += cost
+        tiers[tier] = {
+            "requests": stats["requests"],
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_chars"],
+            "cost": round(cost, 4)
+        }
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "latency": {"mean": round(sum(everything) / len(everything), 4), **summarize(everything)},
+        "latency_by_kind": {
+            kind: {"mean": round(sum(values) / len(values), 4), **summarize(values)}
+            for kind, values in sorted(latencies.items())
+        },
+        "tiers": tiers,
+        "cost": round(total_cost, 4),
+        "cost_per_request": round(total_cost / len(inputs), 6)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按阶段分档使用模型的基准测试")
+    parser.add_argument("--configurations", default=",".join(CONFIGURATIONS))
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--small-ttft", type=float, default=0.1, help="小模型桩服务首token延迟（秒）")
+    parser.add_argument("--small-tokens-per-second", type=float, default=300.0)
+    parser.add_argument("--large-ttft", type=float, default=0.4, help="大模型桩服务首token延迟（秒）")
+    parser.add_argument("--large-tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--reply-chars", type=int, default=600)
+    parser.add_argument("--short-input-tokens", type=int, default=300, help="tiered_short_input配置的短输入上限")
+    parser.add_argument(
+        "--prices", type=json.loads, default={"small": [0.0003, 0.0006], "large": [0.0008, 0.002]},
+        help="各档位每千token的输入、输出价格，JSON格式"
+    )
+    parser.add_argument("--stub-port", type=int, default=9241, help="小模型桩服务端口，大模型使用下一个端口")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="结果JSON写入的文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    stubs = {
+        "small": start_stub_server(StubConfig(
+            latency_median=args.small_ttft,
+            tokens_per_second=args.small_tokens_per_second,
+            reply_chars=args.reply_chars
+        ), port=args.stub_port),
+        "large": start_stub_server(StubConfig(
+            latency_median=args.large_ttft,
+            tokens_per_second=args.large_tokens_per_second,
+            reply_chars=args.reply_chars
+        ), port=args.stub_port + 1),
+    }
+    # 须在导入app模块之前设置
+    os.environ.setdefault("DATABASE_DSN", "sqlite+aiosqlite:///:memory:")
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_WARMUP"] = "false"
+    os.environ["GENERATION_CACHE_PERSIST"] = "false"
+    os.environ.pop("LLM_ENDPOINTS", None)
+    os.environ["LLM_TIERS"] = json.dumps({
+        tier: {"model": f"stub-{tier}", "base_url": stub.base_url, "api_key": "stub"} for tier, stub in stubs.items()
+    })
+    inputs = make_inputs(args.requests, args.seed)
+
+    async def run_all() -> Dict[str, Any]:
+        # 共享的LLM连接池绑定事件循环，所有配置使用同一个事件循环
+        return {
+            name: await run_configuration(name, inputs, args, stubs)
+            for name in args.configurations.split(",")
+        }
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+    output = json.dumps({
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results
+    }, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -57,17 +57,22 @@ export default function Home() {
   const [listError, setListError] = useState<string | null>(null)
   const [detailDialogOpen, setDetailDialogOpen] = useState(false)
   const [selectedPodcast, setSelectedPodcast] = useState<any>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
 
-  // 获取播客列表
-  const fetchPodcastList = async () => {
+  // 获取播客列表：每次一页，只取摘要字段与脚本开头；传入游标时追加下一页
+  const fetchPodcastList = async (cursor: string | null = null) => {
     setIsLoadingList(true)
     setListError(null)
     try {
-      const res = await fetch(getApiUrl('/podcast/list'))
+      const params = new URLSearchParams({ limit: '20', fields: 'summary', excerpt_length: '80' })
+      if (cursor) params.set('cursor', cursor)
+      const res = await fetch(getApiUrl(`/podcast/list?${params.toString()}`))
       if (!res.ok) throw new Error('获取播客列表失败')
       const data = await res.json()
-      setPodcastList(Array.isArray(data.items) ? data.items : [])
+      const items = Array.isArray(data.items) ? data.items : []
+      setPodcastList(prev => cursor ? [...prev, ...items] : items)
+      setNextCursor(data.next_cursor || null)
     } catch (e: any) {
       setListError(e.message || '获取失败')
     } finally {
@@ -75,6 +80,20 @@ export default function Home() {
     }
   }
 
+  // 打开详情时再获取完整内容与脚本
+  const openPodcastDetail = async (item: any) => {
+    setSelectedPodcast(item)
+    setDetailDialogOpen(true)
+    try {
+      const res = await fetch(getApiUrl(`/podcast/detail?podcast_id=${item.id}`))
+      if (!res.ok) throw new Error('获取播客详情失败')
+      const detail = await res.json()
+      setSelectedPodcast((prev: any) => prev && prev.id === item.id ? { ...item, ...detail } : prev)
+    } catch (e) {
+      console.warn('获取详情失败:', e)
+    }
+  }
+
   // 页面加载时获取列表
   useEffect(() => {
     fetchPodcastList()
@@ -115,6 +134,7 @@ export default function Home() {
       const reader = response.body.getReader()
       const decoder = new TextDecoder('utf-8')
       let buffer = ''
+      let eventType = 'text'
   
       while (true) {
         const { value, done } = await reader.read()
@@ -126,11 +146,18 @@ export default function Home() {
         buffer = lines.pop() || ''
   
         for (const line of lines) {
-          if (line.startsWith('data:')) {
+          if (line === '') {
+            eventType = 'text'
+          } else if (line.startsWith('event:')) {
+            eventType = line.replace(/^event:\s*/, '')
+          } else if (line.startsWith('data:')) {
             const jsonStr = line.replace(/^data:\s*/, '')
             try {
               const parsed = JSON.parse(jsonStr)
-              if (parsed.text) {
+              if (eventType === 'reset') {
+                // 已收到的脚本原文需要翻译，丢弃后接收译文
+                setGeneratedText("")
+              } else if (parsed.text) {
                 setGeneratedText(prev => prev + parsed.text)
               }
             } catch (e) {
@@ -684,7 +711,7 @@ export default function Home() {
       <div className="w-full max-w-4xl mx-auto mt-12">
         <div className="flex items-center justify-between mb-2">
           <h2 className="text-lg font-bold text-slate-800">已创建播客</h2>
-          <Button size="sm" variant="outline" onClick={fetchPodcastList} disabled={isLoadingList}>
+          <Button size="sm" variant="outline" onClick={() => fetchPodcastList()} disabled={isLoadingList}>
             {isLoadingList ? <Loader2 className="w-4 h-4 animate-spin" /> : '刷新'}
           </Button>
         </div>
@@ -702,14 +729,24 @@ export default function Home() {
               <div
                 key={item.id || idx}
                 className="bg-white border border-slate-200 rounded-xl p-4 shadow-sm hover:shadow-md transition cursor-pointer"
-                onClick={() => { setSelectedPodcast(item); setDetailDialogOpen(true); }}
+                onClick={() => openPodcastDetail(item)}
               >
                 <div className="font-medium text-blue-700 truncate max-w-xs">{title}</div>
+                {item.excerpt && (
+                  <div className="text-sm text-slate-500 mt-1 line-clamp-2">{item.excerpt}</div>
+                )}
                 <div className="text-xs text-slate-400 mt-2">{createdAt ? new Date(createdAt).toLocaleString() : ''}</div>
               </div>
             )
           })}
         </div>
+        {nextCursor && (
+          <div className="flex justify-center mt-4">
+            <Button size="sm" variant="outline" onClick={() => fetchPodcastList(nextCursor)} disabled={isLoadingList}>
+              {isLoadingList ? <Loader2 className="w-4 h-4 animate-spin" /> : '加载更多'}
+            </Button>
+          </div>
+        )}
       </div>
       {/* 详情弹窗 */}
       <Dialog open={detailDialogOpen} onOpenChange={setDetailDialogOpen}>
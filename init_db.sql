@@ -9,9 +9,85 @@ CREATE TABLE IF NOT EXISTS podcast (
     content TEXT NOT NULL COMMENT '播客内容摘要',
     voice_ids VARCHAR(255) NOT NULL COMMENT '播客音色素材ID列表，逗号分隔',
     content_type VARCHAR(255) NOT NULL COMMENT '播客内容标签',
-    transcript TEXT COMMENT '播客完整脚本',
+    transcript TEXT COMMENT '播客完整脚本（旧记录，新记录存于transcript_blob）',
+    transcript_hash CHAR(64) NULL COMMENT '压缩脚本的SHA-256，对应transcript_blob.hash',
     title VARCHAR(255) NOT NULL COMMENT '播客标题',
+    content_signature VARBINARY(2048) NULL COMMENT '完整输入的MinHash签名（近似重复检测用）',
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    KEY idx_podcast_created_at_id (created_at, id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- 已有库补建分页索引与脚本哈希列，并删除旧的全文索引（已改为podcast_search_text表）：
+-- ALTER TABLE podcast ADD INDEX idx_podcast_created_at_id (created_at, id);
+-- ALTER TABLE podcast DROP INDEX ft_podcast_search;
+-- ALTER TABLE podcast ADD COLUMN transcript_hash CHAR(64) NULL AFTER transcript;
+-- ALTER TABLE podcast ADD COLUMN content_signature VARBINARY(2048) NULL AFTER title;
+-- ALTER TABLE podcast_job ADD COLUMN owner VARCHAR(64) NULL, ADD COLUMN heartbeat_at DATETIME NULL;
+-- 之后运行 python -m app.db.migrate_transcripts 把已有脚本迁移为压缩存储，
+-- 并为已有记录补建podcast_search_text（也会自动补建表、列与全文索引）
+
+
+-- 全文检索用的明文（标题、内容摘要与脚本开头SEARCH_TRANSCRIPT_CHARS字，默认500），脚本压缩存储后仍可检索；
+-- SEARCH_BACKEND=mysql（MySQL上的默认值）时使用，ngram解析器（ngram_token_size默认为2）支持中文分词
+CREATE TABLE IF NOT EXISTS podcast_search_text (
+    podcast_id INT PRIMARY KEY COMMENT '播客ID',
+    body MEDIUMTEXT NOT NULL COMMENT '标题、内容摘要与脚本开头的明文',
+    FULLTEXT KEY ft_podcast_search_text (body) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
+-- 压缩脚本表（按内容寻址，相同脚本只存一份）
+CREATE TABLE IF NOT EXISTS transcript_blob (
+    hash CHAR(64) PRIMARY KEY COMMENT '脚本原文的SHA-256',
+    codec VARCHAR(16) NOT NULL COMMENT '压缩算法：zlib/zstd',
+    dictionary_id INT NULL COMMENT '压缩使用的字典ID',
+    raw_size INT NOT NULL COMMENT '原文字节数',
+    data MEDIUMBLOB NOT NULL COMMENT '压缩数据',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 脚本压缩字典（用已有脚本训练）
+CREATE TABLE IF NOT EXISTS transcript_dictionary (
+    id INT AUTO_INCREMENT PRIMARY KEY COMMENT '字典ID',
+    codec VARCHAR(16) NOT NULL COMMENT '字典适用的压缩算法',
+    data MEDIUMBLOB NOT NULL COMMENT '字典内容',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
+-- 生成结果缓存表（按阶段缓存LLM输出）
+CREATE TABLE IF NOT EXISTS generation_cache (
+    cache_key CHAR(64) PRIMARY KEY COMMENT '生成输入的SHA-256哈希',
+    stage VARCHAR(32) NOT NULL COMMENT '阶段名称',
+    payload MEDIUMTEXT NOT NULL COMMENT '阶段输出（JSON）',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    expires_at DATETIME NOT NULL COMMENT '过期时间',
+    KEY idx_generation_cache_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 生成会话的事件记录（SSE_REPLAY_PERSIST开启时写入，供断线的客户端续传）
+CREATE TABLE IF NOT EXISTS generation_session (
+    session_id CHAR(32) PRIMARY KEY COMMENT '会话ID',
+    first_event_id INT NOT NULL COMMENT '保留的首个事件编号',
+    last_event_id INT NOT NULL COMMENT '最后一个事件编号',
+    events MEDIUMBLOB NOT NULL COMMENT 'zlib压缩的事件列表（JSON）',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    expires_at DATETIME NOT NULL COMMENT '过期时间',
+    KEY idx_generation_session_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 异步生成任务表
+CREATE TABLE IF NOT EXISTS podcast_job (
+    id INT AUTO_INCREMENT PRIMARY KEY COMMENT '任务ID',
+    status VARCHAR(32) NOT NULL COMMENT '任务状态：queued/running/succeeded/failed',
+    request TEXT NOT NULL COMMENT '生成请求（JSON）',
+    podcast_id INT NULL COMMENT '生成的播客ID',
+    error TEXT NULL COMMENT '失败原因',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    started_at DATETIME NULL COMMENT '开始执行时间',
+    finished_at DATETIME NULL COMMENT '结束时间',
+    owner VARCHAR(64) NULL COMMENT '负责执行的进程',
+    heartbeat_at DATETIME NULL COMMENT 'owner最近一次心跳时间，过期后由其他进程认领',
+    KEY idx_podcast_job_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
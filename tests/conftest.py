@@ -0,0 +1,65 @@
+"""
+测试公共配置：使用内存SQLite与本地LLM桩服务，不访问真实数据库与服务商。
+环境变量须在导入app模块之前设置。
+"""
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+STUB_PORT = _free_port()
+STUB_BASE_URL = f"http://127.0.0.1:{STUB_PORT}/v1"
+
+os.environ["DATABASE_DSN"] = "sqlite+aiosqlite:///:memory:"
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ["LLM_WARMUP"] = "false"
+os.environ["GENERATION_CACHE_PERSIST"] = "false"
+os.environ.pop("LLM_ENDPOINTS", None)
+os.environ["LLM_TIERS"] = json.dumps({
+    tier: {"model": f"stub-{tier}", "base_url": STUB_BASE_URL, "api_key": "stub"} for tier in ("small", "large")
+})
+
+
+@pytest.fixture(scope="session")
+def stub_llm():
+    """会话内共享的LLM桩服务（快速、无错误）"""
+    from bench.stub_llm import StubConfig, start_stub_server
+
+    server = start_stub_server(StubConfig(latency_median=0.01, tokens_per_second=5000, reply_chars=120), STUB_PORT)
+    yield server
+    server.stop()
+
+
+def run(coroutine):
+    """
+    在新的事件循环中运行协程（测试不依赖pytest的异步插件）。
+    结束后释放数据库连接：连接绑定事件循环，内存SQLite随之清空，每个测试使用独立的数据库
+    """
+    from app.db.database import engine
+
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def create_tables() -> None:
+    from app.db.database import engine
+    from app.models.podcast import Base
+    # 注册其余表
+    from app.models import generation_cache, generation_session, job, search, transcript  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
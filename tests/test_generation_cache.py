@@ -0,0 +1,79 @@
+"""生成结果缓存的批量读写与过期清理"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.db.database import AsyncSessionLocal
+from app.llm_providers.cache import GenerationCache, LRUCache, cache_key
+from app.models.generation_cache import GenerationCacheEntry
+from tests.conftest import create_tables, run
+
+
+def test_cache_key_is_stable():
+    assert cache_key("a", {"x": 1, "y": 2}) == cache_key("a", {"y": 2, "x": 1})
+    assert cache_key("a", 1) != cache_key("a", 2)
+
+
+def test_lru_evicts_and_expires():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None and cache.get("a") == {"v": 1}
+
+    expired = LRUCache(maxsize=2, ttl=-1)
+    expired.set("a", {"v": 1})
+    assert expired.get("a") is None
+
+
+def test_set_many_writes_one_batch_and_get_many_reads_from_db():
+    async def scenario():
+        await create_tables()
+        writer = GenerationCache(maxsize=16, ttl=60)
+        writer.set_many([("k1", "analyze_content", {"is_precise": True}), ("k2", "generate_script", {"script": "s"})])
+        await writer.aclose()
+
+        # 新实例的内存层为空，从持久层一次读取
+        reader = GenerationCache(maxsize=16, ttl=60)
+        found = await reader.get_many(["k1", "k2", "k3"])
+        assert found == {"k1": {"is_precise": True}, "k2": {"script": "s"}}
+        assert reader.memory.get("k1") == {"is_precise": True}
+
+        # 覆盖写
+        writer.set_many([("k1", "analyze_content", {"is_precise": False})])
+        await writer.aclose()
+        assert await GenerationCache(maxsize=16, ttl=60).get("k1") == {"is_precise": False}
+
+    run(scenario())
+
+
+def test_expired_rows_are_ignored_and_purged():
+    async def scenario():
+        await create_tables()
+        async with AsyncSessionLocal() as session:
+            session.add(GenerationCacheEntry(
+                cache_key="old", stage="generate_script", payload="{}",
+                expires_at=datetime.now() - timedelta(seconds=1)
+            ))
+            await session.commit()
+
+        cache = GenerationCache(maxsize=16, ttl=60, purge_interval=0)
+        assert await cache.get("old") is None
+        cache.set_many([("new", "generate_script", {"script": "s"})])
+        await cache.aclose()
+        async with AsyncSessionLocal() as session:
+            keys = (await session.execute(select(GenerationCacheEntry.cache_key))).scalars().all()
+        assert keys == ["new"]
+
+        # 未到清理间隔时不删除
+        cache = GenerationCache(maxsize=16, ttl=-1, purge_interval=3600)
+        cache._last_purge = time.monotonic()
+        cache.set_many([("expired", "generate_script", {"script": "s"})])
+        await cache.aclose()
+        async with AsyncSessionLocal() as session:
+            count = (await session.execute(select(func.count()).select_from(GenerationCacheEntry))).scalar()
+        assert count == 2
+
+    run(scenario())
@@ -0,0 +1,49 @@
+"""异步任务的认领：多个进程不重复执行同一任务"""
+import asyncio
+from datetime import datetime
+
+from app.db.database import AsyncSessionLocal
+from app.models.job import PodcastJob
+from app.tasks.jobs import QUEUED, RUNNING, JobManager
+from tests.conftest import create_tables, run
+
+
+async def add_job(status: str, owner=None, heartbeat_at=None) -> int:
+    async with AsyncSessionLocal() as db:
+        job = PodcastJob(status=status, request="{}", owner=owner, heartbeat_at=heartbeat_at)
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+def test_orphaned_job_is_claimed_by_one_process():
+    async def scenario():
+        await create_tables()
+        # 上次运行中、owner已退出的任务，以及另一进程正在负责（心跳未过期）的任务
+        orphan = await add_job(RUNNING)
+        alive = await add_job(RUNNING, owner="other", heartbeat_at=datetime.now())
+        first, second = JobManager(1, 10), JobManager(1, 10)
+        claims = await asyncio.gather(first._claim_orphans(), second._claim_orphans())
+        async with AsyncSessionLocal() as db:
+            return orphan, alive, claims, await db.get(PodcastJob, orphan), first, second
+
+    orphan, alive, claims, job, first, second = run(scenario())
+    assert sorted(claims, key=len) == [[], [orphan]]
+    assert job.status == QUEUED and job.owner in (first.owner, second.owner)
+    assert alive not in claims[0] + claims[1]
+
+
+def test_stopped_process_releases_jobs_for_restart():
+    async def scenario():
+        await create_tables()
+        previous = JobManager(1, 10)
+        job_id = await add_job(RUNNING, owner=previous.owner, heartbeat_at=datetime.now())
+        # 正常停止时释放任务，重启后的进程无需等待心跳过期
+        await previous.stop()
+        claimed = await JobManager(1, 10)._claim_orphans()
+        # 执行前再次确认owner，已被其他进程认领的任务不再更新
+        updated = await previous._set_status(job_id, status=RUNNING)
+        return job_id, claimed, updated
+
+    job_id, claimed, updated = run(scenario())
+    assert claimed == [job_id] and not updated
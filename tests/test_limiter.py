@@ -0,0 +1,85 @@
+"""LLM调用限流：令牌桶与endpoint限流器"""
+import asyncio
+
+import pytest
+
+from app.llm_providers.limiter import ProviderLimiter, RateLimitExceeded, TokenBucket
+from tests.conftest import run
+
+
+def limiter(**overrides) -> ProviderLimiter:
+    options = {"max_concurrency": 1, "rpm": 6000, "tpm": 1_000_000, "max_queue": 1, "max_wait": 5.0, **overrides}
+    return ProviderLimiter("http://test/v1", "stub", **options)
+
+
+def test_token_bucket_delay_and_overdraft():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.delay(1) == 0
+    bucket.consume(60)
+    assert bucket.delay(1) == pytest.approx(1.0, abs=0.05)
+    # 透支后需要等到补回透支的部分
+    bucket.consume(30)
+    assert bucket.delay(1) == pytest.approx(31.0, abs=0.05)
+    # 超过容量的请求按容量计算，不会永远等待
+    assert TokenBucket(per_minute=60).delay(1000) == 0
+
+
+def test_queues_then_rejects_when_queue_full():
+    async def scenario():
+        provider = limiter()
+        order = []
+
+        async def call(name, hold):
+            async with provider.slot(10):
+                order.append(name)
+                await hold.wait()
+
+        first_done, second_done = asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(call("first", first_done))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(call("second", second_done))
+        await asyncio.sleep(0.01)
+        assert provider.active == 1 and provider.waiting == 1 and provider.saturated()
+        with pytest.raises(RateLimitExceeded) as error:
+            async with provider.slot(10):
+                pass
+        assert error.value.retry_after >= 1.0
+        first_done.set()
+        await first
+        await asyncio.sleep(0.01)
+        assert order == ["first", "second"] and provider.waiting == 0
+        second_done.set()
+        await second
+        return provider.state()
+
+    state = run(scenario())
+    assert state["active"] == 0 and state["admitted"] == 2
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        provider = limiter(max_wait=0.05)
+        async with provider.slot(10):
+            with pytest.raises(RateLimitExceeded, match="超时"):
+                async with provider.slot(10):
+                    pass
+            return provider.waiting
+
+    assert run(scenario()) == 0
+
+
+def test_waits_for_rate_and_corrects_token_usage():
+    async def scenario():
+        provider = limiter(max_concurrency=4, rpm=600, tpm=6000)
+        provider.requests.tokens = 0
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with provider.slot(100):
+            waited = loop.time() - start
+        provider.record_usage(100, 1100)
+        return waited, provider.tokens.tokens
+
+    waited, tokens = run(scenario())
+    # 每秒补充10个请求名额
+    assert 0.05 <= waited < 0.5
+    assert tokens == pytest.approx(6000 - 1100, abs=5)
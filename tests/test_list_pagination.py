@@ -0,0 +1,52 @@
+"""/podcast/list 的键集分页游标"""
+from datetime import datetime
+
+import pytest
+
+from app.db.database import AsyncSessionLocal
+from app.models.podcast import Podcast
+from app.services.podcast_service import decode_cursor, encode_cursor, list_generated_podcasts
+from tests.conftest import create_tables, run
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_pages_cover_all_rows_once_with_tied_timestamps():
+    async def scenario():
+        await create_tables()
+        async with AsyncSessionLocal() as db:
+            # 每3条共用一个时间戳，检验按id打破并列
+            db.add_all([
+                Podcast(
+                    content=f"主题{i}", voice_ids="a,b", content_type="科技", title=f"标题{i}",
+                    created_at=datetime(2024, 1, 1, 0, 0, i // 3)
+                )
+                for i in range(10)
+            ])
+            await db.commit()
+
+            seen, cursor, pages = [], None, 0
+            while True:
+                page = await list_generated_podcasts(db, limit=4, cursor=cursor, fields="summary")
+                # 总数只在第一页返回
+                assert page.total == (10 if cursor is None else None)
+                seen += [item.id for item in page.items]
+                pages += 1
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+        return seen, pages
+
+    seen, pages = run(scenario())
+    assert pages == 3
+    # (created_at, id) 倒序，不重复、不遗漏
+    assert seen == sorted(seen, key=lambda i: ((i - 1) // 3, i), reverse=True)
+    assert sorted(seen) == list(range(1, 11))
@@ -0,0 +1,96 @@
+"""近似重复主题检测（MinHash LSH）"""
+import asyncio
+import os
+import subprocess
+import sys
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.writer import podcast_writer
+from app.llm_providers.base import generate_text_stream
+from app.models.podcast import Podcast
+from app.services import near_duplicate
+from app.services.near_duplicate import NearDuplicateIndex, content_signature, decode_signature, signature
+from tests.conftest import create_tables, run
+
+TEXT = "人工智能对教育的影响以及未来课堂的变化"
+
+
+def test_signature_is_stable_across_hash_seeds():
+    code = "from app.services.near_duplicate import signature; print(signature('人工智能对教育的影响', 64))"
+    outputs = {
+        subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": seed}
+        ).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outputs) == 1
+    assert outputs.pop().strip() == str(signature("人工智能对教育的影响", 64))
+
+
+def test_lookup_finds_near_duplicates_only():
+    index = NearDuplicateIndex(["content"], num_perm=64, bands=16)
+    index.add(1, TEXT, None)
+    index.add(2, "周末去郊外爬山露营的装备清单", None)
+
+    matches = run(index.lookup(TEXT + "吗", 0.6))
+    assert [podcast_id for podcast_id, _ in matches] == [1] and matches[0][1] > 0.6
+    assert run(index.lookup("完全无关的烹饪话题", 0.6)) == []
+    assert signature("!!!", 64) is None
+
+
+def test_lookup_offloads_long_transcript_queries(monkeypatch):
+    monkeypatch.setattr(settings, "near_duplicate_offload_chars", 50)
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def spy(func, *args):
+        offloaded.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(near_duplicate.asyncio, "to_thread", spy)
+    index = NearDuplicateIndex(["content", "transcript"], num_perm=64, bands=16)
+    script = TEXT * 10
+    index.add(1, TEXT, script)
+
+    assert run(index.lookup(TEXT, 0.9))[0][0] == 1
+    assert offloaded == []
+    assert run(index.lookup(script, 0.9))[0][0] == 1
+    assert offloaded == ["signature"]
+
+
+def test_long_inputs_with_the_same_opening_are_not_duplicates():
+    opening = "聊聊" + TEXT * 6
+    first = opening + "第一部分讲在线课程平台的兴起与学生自学能力的培养" * 5
+    second = opening + "第二部分讨论医院里的影像诊断系统与医生的工作方式" * 5
+    summary = opening[:100] + "..."
+    index = NearDuplicateIndex(["content"], num_perm=64, bands=16)
+    index.add_records([{"id": 1, "content": summary, "content_signature": run(content_signature(first))}])
+    # 旧记录没有完整输入的签名，摘要被截断时不建立索引
+    index.add(2, summary, None)
+
+    assert decode_signature(run(content_signature(first)), 64) == signature(first, 64)
+    assert [podcast_id for podcast_id, _ in run(index.lookup(first, 0.7))] == [1]
+    assert run(index.lookup(second, 0.7)) == []
+    assert run(index.lookup(opening[:100], 0.7)) == []
+
+
+def test_saved_podcast_keeps_full_input_signature(stub_llm):
+    content = "A：" + TEXT * 8 + "\nB：好的，我们开始吧。"
+
+    async def scenario():
+        await create_tables()
+        events = [
+            event async for event in generate_text_stream(
+                content, "科技", ["A", "B"], target_language="中文", persist=True, use_cache=False
+            )
+        ]
+        await podcast_writer.stop()
+        podcast_id = next(event["podcast_id"] for event in events if event["event"] == "saved")
+        async with AsyncSessionLocal() as db:
+            row = await db.get(Podcast, podcast_id)
+            return row.content, await db.run_sync(lambda _: row.content_signature)
+
+    summary, stored = run(scenario())
+    assert summary.endswith("...") and decode_signature(stored, 64) == signature(content, 64)
@@ -0,0 +1,85 @@
+"""熔断器与可重试错误的判断"""
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.llm_providers.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, breaker_state, get_breaker, is_retryable
+)
+from app.llm_providers.routing import Endpoint
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def breaker(monkeypatch) -> CircuitBreaker:
+    monkeypatch.setattr(settings, "llm_breaker_min_calls", 4)
+    monkeypatch.setattr(settings, "llm_breaker_error_rate", 0.5)
+    monkeypatch.setattr(settings, "llm_breaker_open_seconds", 0.05)
+    return CircuitBreaker("http://breaker/v1", "stub")
+
+
+def test_opens_at_error_rate_after_min_calls(monkeypatch):
+    circuit = breaker(monkeypatch)
+    for failed in (True, True, False):
+        circuit.record(failed)
+    assert circuit.state == CLOSED and circuit.allow()
+    circuit.record(True)
+    assert circuit.state == OPEN and not circuit.allow()
+    assert 0 < circuit.retry_after() <= 0.05
+
+
+def test_half_open_allows_one_probe(monkeypatch):
+    circuit = breaker(monkeypatch)
+    for _ in range(4):
+        circuit.record(True)
+    time.sleep(0.06)
+    assert circuit.allow() and circuit.state == HALF_OPEN
+    circuit.acquire()
+    assert not circuit.allow()
+    # 取消的探测归还名额
+    circuit.release()
+    assert circuit.allow()
+    circuit.acquire()
+    circuit.record(False)
+    assert circuit.state == CLOSED and circuit.snapshot()["recent_error_rate"] == 0.0
+
+
+def test_failed_probe_reopens(monkeypatch):
+    circuit = breaker(monkeypatch)
+    for _ in range(4):
+        circuit.record(True, timed_out=True)
+    time.sleep(0.06)
+    assert circuit.allow()
+    circuit.acquire()
+    circuit.record(True)
+    assert circuit.state == OPEN and circuit.snapshot()["timeouts"] == 4
+
+
+def test_retryable_errors():
+    assert is_retryable(StatusError(429)) and is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(httpx.ConnectError("refused"))
+    # 已开始流式输出时只重试错误状态码
+    assert not is_retryable(asyncio.TimeoutError(), streamed=True)
+    assert is_retryable(StatusError(502), streamed=True)
+    assert not is_retryable(ValueError("bad"))
+
+
+def test_endpoints_of_one_upstream_share_a_breaker(monkeypatch):
+    monkeypatch.setattr(settings, "llm_breaker_min_calls", 4)
+    # 两个阶段使用同一上游（如都使用small档位）
+    analyzer = Endpoint("http://shared-breaker/v1/", "small", llm=None)
+    for _ in range(4):
+        analyzer.breaker.record(True)
+    translator = Endpoint("http://shared-breaker/v1", "small", llm=None)
+    assert translator.breaker is analyzer.breaker and not translator.breaker.allow()
+    # 创建第二个endpoint不会把状态指标重置为关闭
+    assert breaker_state._values[("http://shared-breaker/v1", "small")] == 2
+    assert get_breaker("http://shared-breaker/v1", "large") is not analyzer.breaker
@@ -0,0 +1,101 @@
+"""endpoint池的路由、重试与对冲请求"""
+import asyncio
+import itertools
+
+import pytest
+
+from app.llm_providers.routing import Endpoint, EndpointPool
+from tests.conftest import run
+
+_urls = itertools.count()
+
+
+class FakeLLM:
+    """按给定延迟返回固定内容，记录调用与取消次数"""
+
+    def __init__(self, delay: float, reply: str = "ok", error: Exception = None):
+        self.delay = delay
+        self.reply = reply
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return FakeMessage(self.reply)
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.usage_metadata = None
+
+
+def endpoint(llm: FakeLLM) -> Endpoint:
+    # 每个endpoint使用独立的限流器（限流器按base_url与模型区分）
+    return Endpoint(f"http://test-{next(_urls)}/v1", "fake", llm)
+
+
+def test_hedge_returns_faster_endpoint_and_cancels_the_other(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "llm_hedge_default_delay", 0.05)
+    slow, fast = FakeLLM(5.0, "slow"), FakeLLM(0.01, "fast")
+    pool = EndpointPool("analyzer", [endpoint(slow), endpoint(fast)], hedge=True)
+    # 主请求固定选中慢的endpoint
+    monkeypatch.setattr(pool, "choose", lambda exclude=(): pool.endpoints[1] if exclude else pool.endpoints[0])
+
+    async def scenario():
+        response = await pool.ainvoke(["hi"])
+        await asyncio.sleep(0.01)
+        assert slow.cancelled == 1
+        assert all(e.limiter.active == 0 for e in pool.endpoints)
+        return response
+
+    assert run(scenario()).content == "fast"
+
+
+def test_cancelling_caller_during_hedge_delay_cancels_primary(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "llm_hedge_default_delay", 1.0)
+    primary, other = FakeLLM(5.0), FakeLLM(5.0)
+    pool = EndpointPool("analyzer", [endpoint(primary), endpoint(other)], hedge=True)
+
+    async def scenario():
+        caller = asyncio.create_task(pool.ainvoke(["hi"]))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.01)
+        # 在事件循环结束（会取消所有剩余任务）之前检查
+        assert primary.calls + other.calls == 1
+        assert primary.cancelled + other.cancelled == 1
+        assert all(e.limiter.active == 0 for e in pool.endpoints)
+
+    run(scenario())
+
+
+def test_retryable_error_fails_over_to_another_endpoint(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "llm_retry_backoff_base", 0.001)
+    broken, healthy = FakeLLM(0, error=ConnectionError("reset")), FakeLLM(0, "ok")
+    pool = EndpointPool("content_generator", [endpoint(broken), endpoint(healthy)])
+    monkeypatch.setattr(pool, "choose", lambda exclude=(): pool.endpoints[1] if exclude else pool.endpoints[0])
+
+    assert run(pool.ainvoke(["hi"])).content == "ok"
+    assert broken.calls == 1 and healthy.calls == 1
+
+
+def test_non_retryable_error_is_raised():
+    broken = FakeLLM(0, error=ValueError("bad request"))
+    pool = EndpointPool("content_generator", [endpoint(broken)])
+    with pytest.raises(ValueError):
+        run(pool.ainvoke(["hi"]))
+    assert broken.calls == 1
@@ -0,0 +1,87 @@
+"""全文搜索：切词、进程内BM25索引与MySQL检索明文"""
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.migrate_transcripts import backfill_search_text
+from app.db.writer import BatchWriter
+from app.models.podcast import Podcast
+from app.models.search import PodcastSearchText
+from app.services.search import BigramIndex, search_backend, search_body, store_search_text, tokenize
+from app.services.transcripts import prepare_podcast_rows
+from tests.conftest import create_tables, run
+
+
+def record(title: str, transcript: str):
+    return {"content": "摘要", "voice_ids": "a", "content_type": "科技", "title": title, "transcript": transcript}
+
+
+def test_tokenize_splits_cjk_into_bigrams_and_words():
+    assert tokenize("人工智能 GPT-4") == ["人工", "工智", "智能", "gpt", "4"]
+    assert tokenize("猫") == ["猫"]
+    assert tokenize(None) == []
+
+
+def test_bm25_ranks_title_hits_first_and_pages():
+    index = BigramIndex()
+    index.add(1, "烹饪入门", "讲讲家常菜", "今天聊聊人工智能")
+    index.add(2, "人工智能的未来", "科技", "")
+    index.add(3, "旅行", "游记", "路上的风景")
+    total, hits = index.search("人工智能", limit=1)
+    assert total == 2 and [podcast_id for podcast_id, _ in hits] == [2]
+    total, hits = index.search("人工智能", limit=1, offset=1)
+    assert [podcast_id for podcast_id, _ in hits] == [1]
+    assert index.search("不存在的词", limit=5) == (0, [])
+
+
+def test_auto_backend_is_memory_off_mysql(monkeypatch):
+    monkeypatch.setattr(settings, "search_backend", "auto")
+    assert search_backend() == "memory"
+    monkeypatch.setattr(settings, "search_backend", "mysql")
+    assert search_backend() == "mysql"
+
+
+def test_mysql_backend_stores_search_text_with_transcript(monkeypatch):
+    monkeypatch.setattr(settings, "search_backend", "mysql")
+
+    async def scenario():
+        await create_tables()
+        writer = BatchWriter(Podcast, batch_size=10, flush_interval=0.01, prepare=prepare_podcast_rows)
+        writer.add_insert_hook(store_search_text)
+        podcast_id = await writer.insert(record("标题", "脚本里的人工智能"))
+        await writer.stop()
+        async with AsyncSessionLocal() as db:
+            return podcast_id, await db.get(PodcastSearchText, podcast_id)
+
+    podcast_id, row = run(scenario())
+    # 脚本已压缩存储，检索明文仍包含脚本开头
+    assert row is not None and row.podcast_id == podcast_id
+    assert "标题" in row.body and "人工智能" in row.body
+
+
+def test_backfill_search_text_skips_existing_rows(monkeypatch):
+    monkeypatch.setattr(settings, "search_backend", "memory")
+
+    async def scenario():
+        await create_tables()
+        writer = BatchWriter(Podcast, batch_size=10, flush_interval=0.01, prepare=prepare_podcast_rows)
+        writer.add_insert_hook(store_search_text)
+        for i in range(3):
+            await writer.insert(record(f"标题{i}", f"脚本{i}"))
+        await writer.stop()
+        filled = await backfill_search_text(batch_size=2)
+        again = await backfill_search_text(batch_size=2)
+        async with AsyncSessionLocal() as db:
+            bodies = (await db.execute(select(PodcastSearchText.body).order_by(PodcastSearchText.podcast_id))).scalars()
+            return filled, again, list(bodies)
+
+    filled, again, bodies = run(scenario())
+    assert filled == 3 and again == 0
+    assert bodies[0] == "标题0\n摘要\n脚本0"
+
+
+def test_search_text_keeps_only_transcript_opening(monkeypatch):
+    monkeypatch.setattr(settings, "search_transcript_chars", 4)
+    assert search_body("标题", "摘要", "一二三四五六") == "标题\n摘要\n一二三四"
+    monkeypatch.setattr(settings, "search_transcript_chars", 0)
+    assert search_body("标题", "摘要", "一二三四五六") == "标题\n摘要"
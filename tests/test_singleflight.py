@@ -0,0 +1,92 @@
+"""单飞合并与可续传的生成会话"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import singleflight
+from app.services.singleflight import EventBuffer, EventsEvicted
+from tests.conftest import run
+
+
+def events(n: int):
+    return [{"event": "text", "text": str(i)} for i in range(n)]
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def test_replays_from_start_with_event_ids():
+    async def scenario():
+        buffer = EventBuffer()
+        for event in events(3):
+            await buffer.append(event)
+        await buffer.close()
+        return await collect(buffer.follow(1, numbered=True))
+
+    assert run(scenario()) == [{"event": "text", "text": "1", "id": 2}, {"event": "text", "text": "2", "id": 3}]
+
+
+def test_lagging_reader_ends_with_error_event():
+    async def scenario():
+        buffer = EventBuffer(max_events=2)
+        reader = buffer.follow(numbered=True)
+        await buffer.append({"event": "text", "text": "0"})
+        first = await reader.__anext__()
+        # 读者停在第1个事件时，缓冲已丢弃第2、3个事件
+        for event in events(4)[1:]:
+            await buffer.append(event)
+        await buffer.close()
+        return first, await collect(reader)
+
+    first, rest = run(scenario())
+    assert first["id"] == 1
+    assert len(rest) == 1 and rest[0]["event"] == "error" and "id" not in rest[0]
+
+
+def test_resume_after_last_event_id(monkeypatch):
+    monkeypatch.setattr(settings, "sse_replay_max_events", 3)
+
+    async def source():
+        for event in events(5):
+            yield event
+
+    async def scenario():
+        flight = singleflight.acquire("resume", source)
+        await collect(flight.subscribe())
+        await asyncio.sleep(0)
+        replayed = await collect(await singleflight.resume(flight.session_id, 3))
+        with pytest.raises(EventsEvicted):
+            await singleflight.resume(flight.session_id, 1)
+        with pytest.raises(ValueError):
+            await singleflight.resume(flight.session_id, 6)
+        missing = await singleflight.resume("0" * 32)
+        return replayed, missing
+
+    replayed, missing = run(scenario())
+    assert [event["id"] for event in replayed] == [4, 5] and missing is None
+
+
+def test_unstarted_subscription_does_not_keep_flight_alive():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def source():
+            yield {"event": "text", "text": "0"}
+            await gate.wait()
+            yield {"event": "text", "text": "1"}
+
+        flight = singleflight.acquire("unstarted", source)
+        first = flight.subscribe()
+        # 创建后从未迭代的订阅不计入订阅者
+        flight.subscribe()
+        assert flight.subscribers == 0
+        await first.__anext__()
+        assert flight.subscribers == 1
+        await first.aclose()
+        await asyncio.gather(flight._task, return_exceptions=True)
+        return flight.subscribers, flight._task.cancelled(), singleflight.in_flight()
+
+    subscribers, cancelled, running = run(scenario())
+    assert subscribers == 0 and cancelled and running == 0
@@ -0,0 +1,41 @@
+"""投机执行：分析内容的同时生成详细内容"""
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.llm_providers.base import get_generator
+from tests.conftest import run
+
+
+def analyze(generator, delays, analysis: str):
+    """各阶段按delays中的秒数返回，分析结果为analysis"""
+    async def fake_ainvoke(role, messages, streamed=False):
+        await asyncio.sleep(delays[role])
+        return AIMessage(content=analysis if role == "analyzer" else "详细内容")
+
+    generator._ainvoke = fake_ainvoke
+    events = []
+    state = {"content": "聊聊咖啡", "content_type": "生活", "voices": ["A", "B"], "messages": []}
+    result = run(generator._analyze_content_precision(state, events.append))
+    del generator._ainvoke
+    return result, events[0]
+
+
+@pytest.mark.parametrize("analyzer_delay, detailed_delay", [(0.2, 0.05), (0.05, 0.2)])
+def test_saved_seconds_is_the_shorter_branch(analyzer_delay, detailed_delay):
+    generator = get_generator()
+    result, speculation = analyze(
+        generator, {"analyzer": analyzer_delay, "content_generator": detailed_delay}, "vague"
+    )
+    assert result["detailed_content"] == "详细内容"
+    assert speculation["outcome"] == "used"
+    # 串行执行需要两者之和，投机执行只需较长的一个，节省的是较短的一个
+    assert speculation["saved_seconds"] == pytest.approx(min(analyzer_delay, detailed_delay), abs=0.03)
+
+
+def test_precise_content_cancels_speculation():
+    generator = get_generator()
+    result, speculation = analyze(generator, {"analyzer": 0.01, "content_generator": 1.0}, "precise")
+    assert result["is_precise"] is True and result["detailed_content"] is None
+    assert speculation["outcome"] == "wasted" and speculation["saved_seconds"] == 0.0
@@ -0,0 +1,15 @@
+"""SSE消息的格式化与压测脚本的解析"""
+from app.api.podcast import format_sse
+from bench.run_bench import parse_sse
+
+
+def test_bench_parses_numbered_messages():
+    assert parse_sse(format_sse({"event": "text", "text": "你好", "id": 3}).rstrip("\n")) == ("text", {"text": "你好"})
+    message = format_sse({"event": "error", "text": "出错", "id": 7}).rstrip("\n")
+    assert message.startswith("id: 7\n")
+    assert parse_sse(message) == ("error", {"text": "出错"})
+
+
+def test_bench_parses_unnumbered_messages():
+    assert parse_sse(format_sse({"event": "stage", "stage": "analyze"}).rstrip("\n")) == ("stage", {"stage": "analyze"})
+    assert parse_sse(": keep-alive") == ("text", None)
@@ -0,0 +1,79 @@
+"""generate_text_stream 的逐token输出"""
+from app.core.config import settings
+from app.llm_providers import base
+from app.llm_providers.base import generate_text_stream
+from tests.conftest import run
+
+# 两行以上“发言人：内容”，桩服务的内容分析判定为精确内容，不生成详细内容
+SCRIPT = "A：今天聊聊人工智能。\nB：好的，我们开始吧。"
+
+
+async def collect(target_language: str):
+    return [
+        event async for event in generate_text_stream(
+            SCRIPT, "科技", ["A", "B"], target_language=target_language, use_cache=False
+        )
+    ]
+
+
+def stage_index(events, stage: str, status: str) -> int:
+    return next(
+        i for i, event in enumerate(events)
+        if event["event"] == "stage" and event["stage"] == stage and event["status"] == status
+    )
+
+
+def text_indexes(events):
+    return [i for i, event in enumerate(events) if event["event"] == "text"]
+
+
+def test_skip_translation_streams_script_tokens_live(stub_llm, monkeypatch):
+    monkeypatch.setattr(settings, "language_probe_chars", 30)
+    events = run(collect("中文"))
+    assert not any(event["event"] == "reset" for event in events)
+    assert not any(event["event"] == "stage" and event["stage"] == "check_language" for event in events)
+    texts = text_indexes(events)
+    # 脚本开头已是目标语言，脚本生成节点的token边生成边转发
+    assert len(texts) > 2
+    assert min(texts) > stage_index(events, "generate_script", "start")
+    assert min(texts) < stage_index(events, "generate_script", "end")
+    assert max(texts) < stage_index(events, "detect_language", "end")
+
+
+def test_short_script_is_released_when_translation_is_skipped(stub_llm, monkeypatch):
+    # 脚本未达到预判字数：缓存到语言识别确认跳过翻译后立即转发
+    monkeypatch.setattr(settings, "language_probe_chars", 10_000)
+    events = run(collect("中文"))
+    texts = text_indexes(events)
+    assert len(texts) > 2
+    assert min(texts) > stage_index(events, "generate_script", "end")
+    assert max(texts) < stage_index(events, "detect_language", "end")
+
+
+def test_wrong_probe_resets_before_translation(stub_llm, monkeypatch):
+    monkeypatch.setattr(settings, "language_probe_chars", 30)
+    detect = base.detect_language
+    # 开头被误判为英文，整篇识别为中文，需要翻译
+    monkeypatch.setattr(base, "detect_language", lambda text: ("en", 1.0) if len(text) < 60 else detect(text))
+    events = run(collect("English"))
+    reset = next(i for i, event in enumerate(events) if event["event"] == "reset")
+    texts = text_indexes(events)
+    assert min(texts) < stage_index(events, "generate_script", "end") < reset
+    after = [i for i in texts if i > reset]
+    assert after and min(after) > stage_index(events, "check_language", "start")
+
+
+def test_translation_streams_translator_tokens(stub_llm):
+    events = run(collect("English"))
+    texts = text_indexes(events)
+    assert len(texts) > 2
+    # 只转发翻译节点的token，不重复输出脚本生成节点的token
+    assert min(texts) > stage_index(events, "check_language", "start")
+    assert max(texts) < stage_index(events, "check_language", "end")
+
+
+def test_streamed_text_matches_final_script(stub_llm):
+    events = run(collect("中文"))
+    text = "".join(event["text"] for event in events if event["event"] == "text")
+    assert "人工智能" in text
+    assert not any(event["event"] == "error" for event in events)
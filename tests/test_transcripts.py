@@ -0,0 +1,65 @@
+"""脚本的压缩存储"""
+from sqlalchemy import func, select
+
+from app.db.database import AsyncSessionLocal
+from app.models.podcast import Podcast
+from app.models.transcript import TranscriptBlob
+from app.services.transcripts import (
+    TranscriptCodec, load_transcript, prepare_podcast_rows, store_transcripts, transcript_hash
+)
+from tests.conftest import create_tables, run
+
+SCRIPT = "主持人A：大家好，欢迎收听本期节目。\n\n主持人B：今天我们聊聊人工智能对教育的影响。\n\n" * 20
+
+
+def test_zlib_round_trip_with_and_without_dictionary():
+    codec = TranscriptCodec("zlib", 9)
+    plain = codec.compress(SCRIPT)
+    assert plain[:2] == ("zlib", None)
+    assert codec.decompress(*plain) == SCRIPT
+
+    codec.add_dictionary(1, "zlib", codec.train([SCRIPT, "主持人A：下期再见。"]))
+    assert codec.active == 1
+    name, dictionary_id, data = codec.compress(SCRIPT)
+    assert (name, dictionary_id) == ("zlib", 1) and len(data) <= len(plain[2])
+    assert codec.decompress(name, dictionary_id, data) == SCRIPT
+    # 其他编码的字典不会成为当前字典
+    codec.add_dictionary(2, "zstd", b"x")
+    assert codec.active == 1
+
+
+def test_stores_identical_transcripts_once_and_loads_them():
+    async def scenario():
+        await create_tables()
+        async with AsyncSessionLocal() as db:
+            hashes = await store_transcripts(db, [SCRIPT, None, SCRIPT])
+            rows = await prepare_podcast_rows(db, [
+                {"content": "摘要", "voice_ids": "a", "content_type": "科技", "title": "标题", "transcript": SCRIPT}
+            ])
+            await db.commit()
+            blobs = (await db.execute(select(func.count()).select_from(TranscriptBlob))).scalar_one()
+        return hashes, rows, blobs
+
+    hashes, rows, blobs = run(scenario())
+    assert hashes == [transcript_hash(SCRIPT), None, transcript_hash(SCRIPT)] and blobs == 1
+    assert "transcript" not in rows[0] and rows[0]["transcript_hash"] == transcript_hash(SCRIPT)
+
+
+def test_load_transcript_reads_compressed_and_inline_rows():
+    async def scenario():
+        await create_tables()
+        async with AsyncSessionLocal() as db:
+            [values] = await prepare_podcast_rows(db, [
+                {"content": "摘要", "voice_ids": "a", "content_type": "科技", "title": "新", "transcript": SCRIPT}
+            ])
+            compressed = Podcast(**values)
+            inline = Podcast(content="摘要", voice_ids="a", content_type="科技", title="旧", transcript="旧脚本")
+            db.add_all([compressed, inline])
+            await db.commit()
+            return (
+                await load_transcript(db, compressed.id),
+                await load_transcript(db, inline.id),
+                await load_transcript(db, 999)
+            )
+
+    assert run(scenario()) == (SCRIPT, "旧脚本", None)
@@ -0,0 +1,90 @@
+"""批量写入队列"""
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db.database import AsyncSessionLocal
+from app.db.writer import BatchWriter
+from app.models.podcast import Podcast
+from tests.conftest import create_tables, run
+
+
+def record(i: int, **overrides):
+    return {"content": f"主题{i}", "voice_ids": "a", "content_type": "科技", "title": f"标题{i}", **overrides}
+
+
+async def count_rows() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(Podcast))).scalar_one()
+
+
+def test_batches_rows_and_notifies_listeners():
+    async def scenario():
+        await create_tables()
+        writer = BatchWriter(Podcast, batch_size=10, flush_interval=0.01)
+        seen = []
+        writer.add_listener(seen.append)
+        ids = await asyncio.gather(*[writer.insert(record(i)) for i in range(5)])
+        await writer.stop()
+        return ids, seen, await count_rows()
+
+    ids, seen, rows = run(scenario())
+    assert sorted(ids) == [1, 2, 3, 4, 5] and rows == 5
+    # 5条在同一批写入
+    assert len(seen) == 1 and [item["id"] for item in seen[0]] == ids
+
+
+def test_stop_waits_for_in_flight_write_and_flushes_queue():
+    async def scenario():
+        await create_tables()
+        writing = asyncio.Event()
+
+        async def slow_prepare(db, records):
+            writing.set()
+            await asyncio.sleep(0.1)
+            return records
+
+        writer = BatchWriter(Podcast, batch_size=2, flush_interval=0.01, prepare=slow_prepare)
+        inserts = [asyncio.create_task(writer.insert(record(i))) for i in range(5)]
+        await writing.wait()
+        # 第一批正在写入时停止
+        await writer.stop()
+        done, pending = await asyncio.wait(inserts, timeout=1)
+        return [task.result() for task in inserts], pending, await count_rows()
+
+    ids, pending, rows = run(scenario())
+    assert not pending
+    assert sorted(ids) == [1, 2, 3, 4, 5] and rows == 5
+
+
+def test_bad_row_only_fails_its_own_caller():
+    async def scenario():
+        await create_tables()
+        writer = BatchWriter(Podcast, batch_size=3, flush_interval=0.05)
+        results = await asyncio.gather(
+            writer.insert(record(1)),
+            writer.insert(record(2, content=None)),
+            writer.insert(record(3)),
+            return_exceptions=True
+        )
+        await writer.stop()
+        return results, await count_rows()
+
+    results, rows = run(scenario())
+    assert isinstance(results[0], int) and isinstance(results[2], int)
+    assert isinstance(results[1], Exception)
+    assert rows == 2
+
+
+def test_insert_after_stop_restarts_writer():
+    async def scenario():
+        await create_tables()
+        writer = BatchWriter(Podcast, batch_size=10, flush_interval=0.01)
+        await writer.insert(record(1))
+        await writer.stop()
+        second = await asyncio.wait_for(writer.insert(record(2)), timeout=1)
+        await writer.stop()
+        return second
+
+    assert run(scenario()) == 2